@@ -0,0 +1,139 @@
+"""
+Anomalies - Vectorized outlier checks over daily active-user series
+"""
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from config import ANOMALY_CONFIG
+from sources import SOURCES
+
+# Scales the median absolute deviation to a standard deviation for normal data
+MAD_SCALE = 1.4826
+
+# Most to least severe; a day gets the first kind it qualifies for
+KINDS = ("zero", "spike", "dip", "week_over_week")
+
+
+def series_matrix(trends: Dict, start: date, end: date) -> Tuple[List[str], List[date], np.ndarray]:
+    """
+    Daily series of every available system as one (systems x days) array
+
+    ``trends`` is shaped like get_daily_trends; days without a point count
+    as zero users. Unavailable systems are left out rather than read as zero.
+    """
+    unavailable = trends.get("unavailable", {})
+    systems = [system for system in SOURCES if system in trends and system not in unavailable]
+    days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    matrix = np.zeros((len(systems), len(days)))
+    for row, system in enumerate(systems):
+        for point in trends[system]:
+            offset = (date.fromisoformat(point['date']) - start).days
+            if 0 <= offset < len(days):
+                matrix[row, offset] = point['unique_users']
+    return systems, days, matrix
+
+
+def score_series(matrix: np.ndarray, window: int = None, z_threshold: float = None,
+                 week_over_week_change: float = None, min_users: int = None) -> Dict[str, np.ndarray]:
+    """
+    Flag every day of every series in one pass over the whole array
+
+    Each day is compared with the median of the ``window`` days before it:
+    a robust z-score beyond ``z_threshold`` is a spike or dip, and zero users
+    against a baseline of at least ``min_users`` is a drop to zero. The
+    z-score divides by the scaled MAD, but never by less than the counting
+    noise of the baseline (its square root), which a couple of weeks of small
+    daily counts tend to underestimate. A week-over-week break is the first
+    day on which the last seven days' total differs by at least
+    ``week_over_week_change`` (relative) from the seven days before; weekly
+    totals keep single noisy days from triggering it. Days without enough
+    history are never flagged.
+
+    Returns:
+        Arrays shaped like ``matrix``: a boolean mask per kind in KINDS plus
+        "baseline", "z" and the week-over-week "change" (NaN where undefined)
+    """
+    window = window or ANOMALY_CONFIG["window_days"]
+    z_threshold = z_threshold or ANOMALY_CONFIG["z_threshold"]
+    week_over_week_change = week_over_week_change or ANOMALY_CONFIG["week_over_week_change"]
+    min_users = ANOMALY_CONFIG["min_users"] if min_users is None else min_users
+
+    baseline = np.full(matrix.shape, np.nan)
+    spread = np.full(matrix.shape, np.nan)
+    if matrix.shape[1] > window:
+        # Trailing windows ending the day before each scored day
+        history = sliding_window_view(matrix, window, axis=1)[:, :-1]
+        median = np.median(history, axis=2)
+        baseline[:, window:] = median
+        spread[:, window:] = np.median(np.abs(history - median[..., None]), axis=2)
+
+    # Totals of the seven days ending on each day, and of the seven before
+    this_week = np.full(matrix.shape, np.nan)
+    last_week = np.full(matrix.shape, np.nan)
+    if matrix.shape[1] >= 14:
+        totals = sliding_window_view(matrix, 7, axis=1).sum(axis=2)
+        this_week[:, 13:] = totals[:, 7:]
+        last_week[:, 13:] = totals[:, :-7]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = (matrix - baseline) / np.maximum(MAD_SCALE * spread, np.sqrt(np.maximum(baseline, 1.0)))
+        change = this_week / last_week - 1
+        judged = baseline >= min_users
+        zero = judged & (matrix == 0)
+        spike = judged & (z >= z_threshold)
+        dip = judged & (z <= -z_threshold) & ~zero
+        broken = (last_week >= 7 * min_users) & (np.abs(change) >= week_over_week_change)
+    week_over_week = broken.copy()
+    week_over_week[:, 1:] &= ~broken[:, :-1]
+
+    return {
+        "zero": zero, "spike": spike, "dip": dip, "week_over_week": week_over_week,
+        "baseline": baseline, "z": z, "change": change
+    }
+
+
+def detect_anomalies(trends: Dict, start: date = None, end: date = None, **thresholds) -> List[Dict]:
+    """
+    Flagged days of a get_daily_trends result, oldest first
+
+    ``end`` defaults to yesterday so today's partial count is never taken
+    for a dip; ``start`` to the earliest point. Keyword thresholds override
+    ANOMALY_CONFIG (see score_series).
+
+    Returns:
+        [{"system", "date", "kind", "unique_users", "expected", "z", "change"}]
+    """
+    end = end or date.today() - timedelta(days=1)
+    if start is None:
+        dates = [point['date'] for system in SOURCES for point in trends.get(system, [])]
+        if not dates:
+            return []
+        start = date.fromisoformat(min(dates))
+    if start > end:
+        return []
+
+    systems, days, matrix = series_matrix(trends, start, end)
+    scores = score_series(matrix, **thresholds)
+    kind = np.full(matrix.shape, "", dtype=object)
+    for name in reversed(KINDS):
+        kind[scores[name]] = name
+
+    def value(array, row, col):
+        return None if np.isnan(array[row, col]) else float(array[row, col])
+
+    rows, cols = np.nonzero(kind != "")
+    return [
+        {
+            "system": systems[row],
+            "date": days[col],
+            "kind": kind[row, col],
+            "unique_users": int(matrix[row, col]),
+            "expected": value(scores["baseline"], row, col),
+            "z": value(scores["z"], row, col),
+            "change": value(scores["change"], row, col)
+        }
+        for col, row in sorted(zip(cols, rows))
+    ]
@@ -0,0 +1,442 @@
+"""
+Async Data Collector - asyncio version of DataCollector for the bot handlers
+"""
+import asyncio
+import logging
+from datetime import date, timedelta
+from functools import partial
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from config import (
+    COLLECTION_CONFIG, ROLLUP_CONFIG, APPROX_DISTINCT_CONFIG, RESULT_CACHE_CONFIG, CIRCUIT_BREAKER_CONFIG
+)
+from circuit_breaker import SourceUnavailable, get_breaker, get_all_breaker_stats
+from connection_pool import create_async_pool, fetch_batch_async, fold_stream_async, open_stream_async
+from schema_registry import schema_registry
+from result_cache import get_result_cache
+from sources import SOURCES, POOL_NAMES
+from rollup_store import (
+    get_rollup_store, rollup_period_stats, rollup_retention, rollup_trend_points, rollup_window_stats
+)
+from data_collector import (
+    PERIOD_QUERIES, TREND_QUERIES, HOURLY_USERS_QUERIES, TOTAL_QUERIES, SYSTEMS,
+    period_params, trend_params, span_query, streams_span, hour_spans, combine_stats, combine_trends,
+    daily_users_to_report,
+    _period_row_to_stats, _trend_rows_to_points
+)
+
+logger = logging.getLogger(__name__)
+
+EMPTY_STATS = {"today": 0, "week": 0, "month": 0}
+
+
+class AsyncDataCollector:
+    """
+    Same API as DataCollector, but every method is a coroutine running on
+    psycopg's AsyncConnection (PostgreSQL) and aiomysql (MySQL), so bot
+    handlers can await collection without blocking the update loop.
+    """
+
+    def __init__(self, source_deadline: float = None, overall_deadline: float = None,
+                 use_rollups: bool = None, approximate: bool = None, use_cache: bool = None):
+        self.source_deadline = source_deadline or COLLECTION_CONFIG["source_deadline"]
+        self.overall_deadline = overall_deadline or COLLECTION_CONFIG["overall_deadline"]
+        self.sources = SOURCES
+        self.configs = {system: spec.db_config for system, spec in SOURCES.items()}
+        # Pools bind to the running event loop, so they are created on first use
+        self.pools = {}
+        use_rollups = ROLLUP_CONFIG["enabled"] if use_rollups is None else use_rollups
+        self.rollups = get_rollup_store() if use_rollups else None
+        # Opt-in HyperLogLog estimates for the rollup-served counts
+        approximate = APPROX_DISTINCT_CONFIG["enabled"] if approximate is None else approximate
+        if approximate and not self.rollups:
+            logger.warning("Approximate distinct counts need the rollup store, using exact counts")
+        self.hll_precision = APPROX_DISTINCT_CONFIG["precision"] if approximate and self.rollups else None
+        use_cache = RESULT_CACHE_CONFIG["enabled"] if use_cache is None else use_cache
+        self.cache = get_result_cache() if use_cache else None
+        # Breakers are shared with the threaded collector and the pools
+        self.breakers = (
+            {system: get_breaker(system) for system in SOURCES} if CIRCUIT_BREAKER_CONFIG["enabled"] else {}
+        )
+
+    def _pool(self, system: str):
+        # Keyed by pool name: MySQL sources on one server share a pool
+        name = POOL_NAMES[system]
+        pool = self.pools.get(name)
+        if pool is None:
+            pool = self.pools[name] = create_async_pool(name, self.configs[system])
+        return pool
+
+    def get_pool_stats(self) -> Dict:
+        """Get connection pool statistics (checkouts, waits, creation latency) per source"""
+        return {name: pool.stats() for name, pool in self.pools.items()}
+
+    def get_cache_stats(self) -> Dict:
+        """Result cache hit / miss counters"""
+        return self.cache.stats() if self.cache else {}
+
+    def get_breaker_stats(self) -> Dict:
+        """Circuit state, trips and fast-failed calls per source"""
+        return get_all_breaker_stats()
+
+    async def close(self) -> None:
+        """Close every pool opened by this collector"""
+        for pool in self.pools.values():
+            await pool.close()
+        self.pools = {}
+
+    async def _schema_ok(self, system: str, cur) -> Optional[Dict]:
+        """Cached schema capabilities for a source, or None if required columns are missing"""
+        schema = await schema_registry.ensure_async(system, cur)
+        return None if schema["missing"] else schema
+
+    async def get_source_stats(self, system: str, target_date: date = None) -> Dict:
+        """Get today / week / month unique users from one source"""
+        if target_date is None:
+            target_date = date.today()
+        try:
+            return await self._query_source_stats(system, target_date)
+        except Exception as e:
+            logger.error(f"Error getting {system} stats: {e}")
+            schema_registry.invalidate(system)
+            return dict(EMPTY_STATS)
+
+    async def get_source_daily_trends(self, system: str, start_date: date, end_date: date) -> List[Dict]:
+        """Get unique users per day from one source"""
+        try:
+            return await self._query_source_trends(system, start_date, end_date)
+        except Exception as e:
+            logger.error(f"Error getting {system} daily trends: {e}")
+            schema_registry.invalidate(system)
+            return []
+
+    async def _query_source_stats(self, system: str, target_date: date) -> Dict:
+        async with self._pool(system).connection() as conn, conn.cursor() as cur:
+            schema = await self._schema_ok(system, cur)
+            if not schema:
+                return dict(EMPTY_STATS)
+            if all(schema["optional"].values()):
+                await cur.execute(PERIOD_QUERIES[system], period_params(target_date))
+                return _period_row_to_stats(await cur.fetchone())
+
+            # Without its time column the table can only give an all-time total
+            await cur.execute(TOTAL_QUERIES[system])
+            result = await cur.fetchone()
+            total_users = result[0] if result else 0
+            return {"today": total_users, "week": total_users, "month": total_users}
+
+    async def _query_source_trends(self, system: str, start_date: date, end_date: date) -> List[Dict]:
+        async with self._pool(system).connection() as conn, conn.cursor() as cur:
+            schema = await self._schema_ok(system, cur)
+            if not schema or not all(schema["optional"].values()):
+                return []
+            await cur.execute(TREND_QUERIES[system], trend_params(start_date, end_date))
+            return _trend_rows_to_points(await cur.fetchall())
+
+    async def get_combined_stats(self, target_date: date = None) -> Dict:
+        """Get combined statistics from all systems (see DataCollector.get_combined_stats)"""
+        if target_date is None:
+            target_date = date.today()
+
+        results, unavailable = await self._collect({
+            system: (lambda system=system: self._cached(
+                ("stats", system, target_date, self.hll_precision),
+                lambda: self._guarded(system, lambda: self._load_stats(system, target_date)),
+                target_date
+            ))
+            for system in SYSTEMS
+        })
+        return combine_stats(results, unavailable, self.hll_precision)
+
+    async def get_daily_trends(self, days: int = 30) -> Dict:
+        """Get daily trends for all systems (see DataCollector.get_daily_trends)"""
+        end_date = date.today()
+        start_date = end_date - timedelta(days=days)
+
+        trends_for = self._get_rollup_trends if self.rollups else self._query_source_trends
+        results, unavailable = await self._collect({
+            system: (lambda system=system: self._guarded(system, lambda: trends_for(system, start_date, end_date)))
+            for system in SYSTEMS
+        })
+        return combine_trends(results, unavailable)
+
+    async def get_report_data(self, target_date: date = None, days: int = 30) -> Tuple[Dict, Dict]:
+        """Combined stats and daily trends in one collection pass (see DataCollector.get_report_data)"""
+        if target_date is None:
+            target_date = date.today()
+        start_date = target_date - timedelta(days=days)
+
+        results, unavailable = await self._collect({
+            system: (lambda system=system: self._cached(
+                ("report", system, target_date, days, self.hll_precision),
+                lambda: self._guarded(system, lambda: self._load_report_data(system, target_date, start_date)),
+                target_date
+            ))
+            for system in SYSTEMS
+        })
+        stats = combine_stats({system: result[0] for system, result in results.items()}, unavailable, self.hll_precision)
+        trends = combine_trends({system: result[1] for system, result in results.items()}, unavailable)
+        return stats, trends
+
+    async def get_window_stats(self, window: str = "week", target_date: date = None,
+                               start: date = None, end: date = None) -> Dict[str, Dict]:
+        """Exact unique users per system for any window, from the rollup store only"""
+        if not self.rollups:
+            logger.warning("Window stats need the rollup store (ROLLUP_ENABLED=false)")
+            return {}
+        if target_date is None:
+            target_date = date.today()
+        return await asyncio.to_thread(lambda: {
+            system: rollup_window_stats(self.rollups, system, window, target_date, start, end, self.hll_precision)
+            for system in SYSTEMS
+        })
+
+    async def get_range_stats(self, systems: List[str] = None, start: date = None, end: date = None,
+                              grain: str = "day") -> Dict[str, List[Dict]]:
+        """Unique users per day / week / month / quarter bucket, from the rollup store only"""
+        if not self.rollups:
+            logger.warning("Range stats need the rollup store (ROLLUP_ENABLED=false)")
+            return {}
+        end = end or date.today()
+        start = start or end
+        return await asyncio.to_thread(lambda: {
+            system: self.rollups.bucket_counts(system, start, end, grain)
+            for system in systems or SYSTEMS
+        })
+
+    async def get_retention(self, weeks: int = 12, horizon: int = 8, target_date: date = None) -> Dict[str, Dict]:
+        """Weekly retention cohorts per system, from the rollup store only"""
+        if not self.rollups:
+            logger.warning("Retention cohorts need the rollup store (ROLLUP_ENABLED=false)")
+            return {}
+        target_date = target_date or date.today()
+        return await asyncio.to_thread(lambda: {
+            system: rollup_retention(self.rollups, system, target_date, weeks, horizon)
+            for system in SYSTEMS
+        })
+
+    async def get_intraday(self, target_date: date = None) -> Dict[str, Dict[int, int]]:
+        """Unique users per hour of target_date, from the rollup store only"""
+        if not self.rollups:
+            return {}
+        target_date = target_date or date.today()
+        return await asyncio.to_thread(lambda: {
+            system: self.rollups.hourly_counts(system, target_date)
+            for system in SYSTEMS if self._hourly(system)
+        })
+
+    async def get_hourly_profile(self, days: int = 30) -> Dict[str, List[float]]:
+        """Average unique users per hour of the day over the last ``days`` days, from the rollup store only"""
+        if not self.rollups:
+            return {}
+        end = date.today() - timedelta(days=1)
+        start = end - timedelta(days=days - 1)
+        return await asyncio.to_thread(lambda: {
+            system: self.rollups.hour_of_day_profile(system, start, end)
+            for system in SYSTEMS if self._hourly(system)
+        })
+
+    async def _rollup_capable(self, system: str, cur) -> bool:
+        schema = await self._schema_ok(system, cur)
+        return schema is not None and all(schema["optional"].values())
+
+    async def _daily_users_report(self, conn, system: str, params: Dict, first_day: date,
+                                  start_date: date, end_date: date) -> Tuple[Dict, List[Dict]]:
+        """
+        daily_users_to_report over the (day, user) rows from first_day, folded
+        in a thread; long windows are streamed (see DataCollector._fetch_spans)
+        """
+        sql, query_params = span_query(system, first_day, end_date)
+        if not streams_span(first_day, end_date):
+            rows = (await fetch_batch_async(conn, [(sql, query_params)]))[0]
+            return await asyncio.to_thread(daily_users_to_report, rows, params, start_date, end_date)
+        async with open_stream_async(conn, sql, query_params) as cur:
+            return await fold_stream_async(cur, daily_users_to_report, params, start_date, end_date)
+
+    async def _sync_rollups(self, system: str, conn, start_date: date, end_date: date,
+                            fresh_day: date = None) -> Tuple[int, Optional[int]]:
+        """
+        Ingest missing closed days (and hours) plus read fresh_day in one batch
+        (see DataCollector._sync_rollups)
+
+        Only the database reads run on the event loop. Store lookups, ingests
+        and set work go to a thread: they take the store's lock, which a
+        scheduled ingest can hold for a whole backfill. Long spans are
+        streamed into that thread through a server-side cursor, batch by batch.
+        """
+        ranges, spans, hourly = await asyncio.to_thread(self._plan_spans, system, start_date, end_date, fresh_day)
+        streamed = {index for index, (start, end) in enumerate(spans) if streams_span(start, end)}
+        batched = [index for index in range(len(spans)) if index not in streamed]
+        fetched = dict(zip(batched, await fetch_batch_async(
+            conn, [span_query(system, *spans[index]) for index in batched]
+        ))) if batched else {}
+
+        ingested = 0
+        fresh = None
+        for index, span in enumerate(spans):
+            store = partial(self._store_span, system, spans, index, len(ranges), hourly, fresh_day)
+            if index in fetched:
+                days, live = await asyncio.to_thread(store, fetched[index])
+            else:
+                async with open_stream_async(conn, *span_query(system, *span)) as cur:
+                    days, live = await fold_stream_async(cur, store)
+            ingested += days
+            fresh = live if live is not None else fresh
+        return ingested, fresh
+
+    def _plan_spans(self, system: str, start_date: date, end_date: date,
+                    fresh_day: Optional[date]) -> Tuple[List[Tuple], List[Tuple], bool]:
+        """(missing closed-day ranges, every span to read, whether today is read by the hour)"""
+        end_date = min(end_date, date.today() - timedelta(days=1))
+        ranges = self.rollups.missing_ranges(system, start_date, end_date)
+        spans = list(ranges)
+        hourly = fresh_day == date.today() and self._hourly(system)
+        if hourly:
+            spans += hour_spans(self.rollups, system, fresh_day)
+        elif fresh_day:
+            spans.append((fresh_day, fresh_day))
+        return ranges, spans, hourly
+
+    def _store_span(self, system: str, spans: List[Tuple], index: int, closed: int, hourly: bool,
+                    fresh_day: Optional[date], rows) -> Tuple[int, Optional[int]]:
+        """
+        Store the rows of spans[index] read by _sync_rollups: the first
+        ``closed`` spans are closed days, then the live day's hours or the
+        live day itself. Returns (days ingested, live users or None).
+        """
+        start, end = spans[index]
+        if index < closed:
+            return self.rollups.ingest(system, rows, start, end), None
+        if not hourly:
+            return 0, len(self.rollups.set_fresh(system, fresh_day, [row[-1] for row in rows]))
+        if index < len(spans) - 1:
+            self.rollups.ingest_hours(system, rows, start, end)
+            return 0, None
+        self.rollups.set_fresh_hour(system, start, [row[-1] for row in rows])
+        return 0, len(self.rollups.set_fresh_from_hours(system, fresh_day))
+
+    def _hourly(self, system: str) -> bool:
+        return self.rollups is not None and ROLLUP_CONFIG["hourly_days"] > 0 and system in HOURLY_USERS_QUERIES
+
+    async def _guarded(self, system: str, loader: Callable[[], Awaitable]):
+        """Await a raising per-source loader behind its circuit breaker (see DataCollector._guarded)"""
+        breaker = self.breakers.get(system)
+        if breaker is None:
+            return await loader()
+        if not breaker.allow():
+            raise SourceUnavailable(system, breaker.retry_in())
+        try:
+            result = await loader()
+        except SourceUnavailable:
+            raise
+        except (Exception, asyncio.CancelledError):
+            # Cancellation here means the source missed its deadline
+            breaker.record_failure()
+            raise
+        breaker.record_success()
+        return result
+
+    async def _cached(self, key: Tuple, loader: Callable[[], Awaitable], target_date: date):
+        """Serve a per-source result through the result cache (past dates never expire)"""
+        if self.cache is None:
+            return await loader()
+        return await self.cache.get_or_load_async(key, loader, immutable=target_date < date.today())
+
+    async def _load_stats(self, system: str, target_date: date) -> Dict:
+        """Period stats for one source, raising on failure (see DataCollector._load_stats)"""
+        try:
+            if not self.rollups:
+                return await self._query_source_stats(system, target_date)
+
+            params = period_params(target_date)
+            async with self._pool(system).connection() as conn, conn.cursor() as cur:
+                capable = await self._rollup_capable(system, cur)
+                if capable:
+                    fresh_day = target_date if target_date >= date.today() else None
+                    await self._sync_rollups(system, conn, params["scan_start"], target_date, fresh_day)
+            if not capable:
+                return await self._query_source_stats(system, target_date)
+            return await asyncio.to_thread(rollup_period_stats, self.rollups, system, params,
+                                           precision=self.hll_precision)
+        except Exception:
+            schema_registry.invalidate(system)
+            raise
+
+    async def _get_rollup_trends(self, system: str, start_date: date, end_date: date) -> List[Dict]:
+        """Daily trends from the rollup store plus a live count for end_date if it is today (raises on failure)"""
+        fresh_count = None
+        try:
+            async with self._pool(system).connection() as conn, conn.cursor() as cur:
+                capable = await self._rollup_capable(system, cur)
+                if capable:
+                    fresh_day = end_date if end_date >= date.today() else None
+                    _, fresh_count = await self._sync_rollups(system, conn, start_date, end_date, fresh_day)
+            if not capable:
+                return await self._query_source_trends(system, start_date, end_date)
+        except Exception:
+            schema_registry.invalidate(system)
+            raise
+
+        return await asyncio.to_thread(rollup_trend_points, self.rollups, system, start_date, end_date, fresh_count)
+
+    async def _load_report_data(self, system: str, target_date: date, start_date: date) -> Tuple[Dict, List[Dict]]:
+        """One source's stats and trend points from a single daily-grain read (raises on failure)"""
+        params = period_params(target_date)
+        first_day = min(params["scan_start"], start_date)
+        result = None
+        fresh_count = None
+        try:
+            async with self._pool(system).connection() as conn, conn.cursor() as cur:
+                capable = await self._rollup_capable(system, cur)
+                if capable and self.rollups:
+                    fresh_day = target_date if target_date >= date.today() else None
+                    _, fresh_count = await self._sync_rollups(system, conn, first_day, target_date, fresh_day)
+                elif capable:
+                    result = await self._daily_users_report(conn, system, params, first_day, start_date, target_date)
+
+            if not capable:
+                result = (await self._query_source_stats(system, target_date),
+                          await self._query_source_trends(system, start_date, target_date))
+            elif result is None:
+                result = await asyncio.to_thread(lambda: (
+                    rollup_period_stats(self.rollups, system, params, precision=self.hll_precision),
+                    rollup_trend_points(self.rollups, system, start_date, target_date, fresh_count)
+                ))
+        except Exception:
+            schema_registry.invalidate(system)
+            raise
+
+        if self.cache is not None:
+            self.cache.store(("stats", system, target_date, self.hll_precision), result[0],
+                             immutable=target_date < date.today())
+        return result
+
+    async def _collect(self, tasks: Dict[str, Callable[[], Awaitable]]) -> Tuple[Dict, Dict[str, str]]:
+        """
+        Run one collection coroutine per source concurrently
+
+        Each source is bounded by its own deadline (capped by the overall one);
+        unlike the threaded collector, a source that misses it is cancelled
+        outright and its connection is discarded rather than reused.
+        """
+        deadline = min(self.source_deadline, self.overall_deadline)
+        names = [system for system in SYSTEMS if system in tasks]
+        outcomes = await asyncio.gather(
+            *(asyncio.wait_for(tasks[system](), deadline) for system in names),
+            return_exceptions=True
+        )
+
+        results = {}
+        unavailable = {}
+        for system, outcome in zip(names, outcomes):
+            if isinstance(outcome, asyncio.TimeoutError):
+                unavailable[system] = f"timed out after {deadline:.1f}s"
+                logger.warning(f"{system} collection missed its deadline after {deadline:.1f}s, returning partial results")
+            elif isinstance(outcome, SourceUnavailable):
+                unavailable[system] = str(outcome)
+            elif isinstance(outcome, BaseException):
+                unavailable[system] = f"error: {outcome}"
+                logger.error(f"{system} collection failed: {outcome}")
+            else:
+                results[system] = outcome
+        return results, unavailable
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Benchmark pipelined PostgreSQL query batches against sequential execution
+
+Runs a PostgreSQL source's collection batch (schema probe plus three
+per-day user queries) once query-by-query on a cursor and once through
+connection_pool.fetch_batch, which sends it as prepared statements in a
+single psycopg pipeline. Traffic goes through a local TCP proxy that delays
+every packet by --delay milliseconds each way, so a local database behaves
+like one across a real network link.
+
+Usage: python benchmark_pipeline.py [--system dockify] [--delay 25] [--iterations N]
+                                    [--upstream HOST:PORT] [--date YYYY-MM-DD]
+"""
+import argparse
+import queue
+import socket
+import statistics
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+# Add current directory to Python path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from connection_pool import connect_postgres, fetch_batch
+from data_collector import DAILY_USERS_QUERIES, trend_params
+from schema_registry import schema_registry
+from sources import SOURCES
+
+POSTGRES_SOURCES = [name for name, spec in SOURCES.items() if spec.db_type == "postgresql"]
+
+
+class DelayProxy:
+    """
+    TCP proxy adding a fixed one-way delay to every chunk in both directions
+
+    Chunks are queued with their due time instead of sleeping before each
+    read, so pipelined traffic keeps flowing the way it would over a slow link.
+    """
+
+    def __init__(self, upstream_host: str, upstream_port: int, delay_ms: float):
+        self.upstream = (upstream_host, upstream_port)
+        self.delay = delay_ms / 1000
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen()
+        self.port = self.listener.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self) -> None:
+        while True:
+            client, _ = self.listener.accept()
+            server = socket.create_connection(self.upstream)
+            for sock in (client, server):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._relay(client, server)
+            self._relay(server, client)
+
+    def _relay(self, source: socket.socket, sink: socket.socket) -> None:
+        chunks = queue.Queue()
+
+        def read():
+            while True:
+                data = source.recv(65536)
+                chunks.put((time.monotonic() + self.delay, data))
+                if not data:
+                    return
+
+        def write():
+            while True:
+                due, data = chunks.get()
+                time.sleep(max(0.0, due - time.monotonic()))
+                if not data:
+                    sink.shutdown(socket.SHUT_WR)
+                    return
+                sink.sendall(data)
+
+        threading.Thread(target=read, daemon=True).start()
+        threading.Thread(target=write, daemon=True).start()
+
+
+def collection_batch(system: str, target_date: date):
+    """The queries one rollup-backed collection sends: probe, two catch-up ranges and today"""
+    probe = schema_registry.probe_query(system)
+    spans = [
+        (target_date - timedelta(days=14), target_date - timedelta(days=8)),
+        (target_date - timedelta(days=7), target_date - timedelta(days=1)),
+        (target_date, target_date)
+    ]
+    return [probe] + [(DAILY_USERS_QUERIES[system], trend_params(start, end)) for start, end in spans]
+
+
+def run_sequential(conn, batch) -> None:
+    with conn.cursor() as cur:
+        for sql, params in batch:
+            cur.execute(sql, params)
+            cur.fetchall()
+
+
+def median_ms(run, conn, batch, iterations: int) -> float:
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        run(conn, batch)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def benchmark(system: str, delay_ms: float, iterations: int, upstream: str, target_date: date):
+    config = SOURCES[system].db_config
+    host, port = (upstream.rsplit(":", 1) if upstream else (config["host"], config["port"]))
+    proxy = DelayProxy(host, int(port), delay_ms)
+    conn = connect_postgres(dict(config, host="127.0.0.1", port=proxy.port))
+    batch = collection_batch(system, target_date)
+
+    try:
+        # Warm up both paths so connection setup and statement preparation are excluded
+        run_sequential(conn, batch)
+        fetch_batch(conn, batch)
+        sequential = median_ms(run_sequential, conn, batch, iterations)
+        pipelined = median_ms(fetch_batch, conn, batch, iterations)
+    finally:
+        conn.close()
+
+    print(f"Pipeline benchmark for {system} via {host}:{port}, +{delay_ms:.0f}ms each way "
+          f"({len(batch)} queries, {iterations} iterations)")
+    print("=" * 60)
+    print(f"{'Sequential':<12} {sequential:>10.1f} ms  (~{sequential / (2 * delay_ms):.1f} round-trips)")
+    print(f"{'Pipelined':<12} {pipelined:>10.1f} ms  (~{pipelined / (2 * delay_ms):.1f} round-trips)")
+    print(f"{'Speedup':<12} {sequential / pipelined:>10.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--system", choices=POSTGRES_SOURCES, default=POSTGRES_SOURCES[0])
+    parser.add_argument("--delay", type=float, default=25, help="one-way delay in milliseconds")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--upstream", help="HOST:PORT of the database (defaults to the source config)")
+    parser.add_argument("--date", type=date.fromisoformat, default=date.today())
+    args = parser.parse_args()
+    benchmark(args.system, args.delay, args.iterations, args.upstream, args.date)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark report rendering with the compiled template against rebuilt styles
+
+Renders the consolidated PDF from synthetic inputs shaped like the
+collectors' results (no database needed), once with every page and table
+rebuilding its styles the way the report did before report_template, and
+once with the process-wide compiled template. Both runs produce the same
+bytes; only the per-report render time differs.
+
+Usage: python benchmark_report_render.py [--iterations N] [--report-type weekly] [--days N]
+"""
+import argparse
+import io
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+# Add current directory to Python path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+import report_generator
+from config import TREND_CONFIG
+from anomalies import detect_anomalies
+from data_collector import SYSTEMS
+from report_template import compile_template, report_template
+
+
+def synthetic_inputs(days: int, seed: int = 7):
+    """(stats, trends, hourly, retention) with the shapes the collectors return"""
+    rng = random.Random(seed)
+    end = date.today()
+    stats = {system: {"today": rng.randint(0, 50), "week": rng.randint(50, 200), "month": rng.randint(200, 800)}
+             for system in SYSTEMS}
+    stats["total"] = {period: sum(stats[system][period] for system in SYSTEMS) for period in ("today", "week", "month")}
+    stats.update(partial=False, unavailable={}, error_bound=None)
+
+    trends = {
+        system: [{"date": (end - timedelta(days=offset)).isoformat(), "unique_users": rng.randint(20, 60)}
+                 for offset in range(days, 0, -1)]
+        for system in SYSTEMS
+    }
+    trends.update(partial=False, unavailable={})
+
+    hourly = {system: [rng.uniform(0, 10) for _ in range(24)] for system in SYSTEMS[2:]}
+    retention = {
+        system: {
+            "cohorts": [{"cohort": f"W{week:02d}", "start": None, "users": 100,
+                         "retained": [rng.randint(0, 60) for _ in range(min(8, 11 - week))] + [None] * max(0, week - 3)}
+                        for week in range(12)],
+            "horizon": 8,
+            "complete": True
+        }
+        for system in SYSTEMS
+    }
+    return stats, trends, hourly, retention
+
+
+def median_ms(render, iterations: int) -> float:
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        render()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def benchmark(iterations: int, days: int, report_type: str):
+    stats, trends, hourly, retention = synthetic_inputs(days)
+    anomalies = detect_anomalies(trends)
+    generator = report_generator.ConsolidatedReportGenerator(use_cache=False)
+
+    def render() -> bytes:
+        buffer = io.BytesIO()
+        generator._render(buffer, report_type, stats, trends, hourly, retention, anomalies)
+        return buffer.getvalue()
+
+    compiled_pdf = render()  # warm-up: imports, fonts and the compiled template
+    compiled = median_ms(render, iterations)
+
+    # Every builder compiles its styles again, as each report used to
+    report_generator.report_template = compile_template
+    try:
+        rebuilt_pdf = render()
+        rebuilt = median_ms(render, iterations)
+    finally:
+        report_generator.report_template = report_template
+
+    print(f"Report render benchmark: {report_type}, {days} days of trends "
+          f"({len(compiled_pdf)} bytes, {iterations} iterations)")
+    print("=" * 60)
+    print(f"{'Rebuilt styles':<18} {rebuilt:>10.1f} ms")
+    print(f"{'Compiled template':<18} {compiled:>10.1f} ms")
+    print(f"{'Speedup':<18} {rebuilt / compiled:>10.2f}x")
+    print(f"{'Identical output':<18} {str(rebuilt_pdf == compiled_pdf):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--report-type", choices=sorted(TREND_CONFIG["days"]), default="weekly")
+    parser.add_argument("--days", type=int, help="days of trend data per system (defaults to the report type's)")
+    args = parser.parse_args()
+    benchmark(args.iterations, args.days or report_generator.trend_days(args.report_type), args.report_type)
+
+
+if __name__ == "__main__":
+    main()
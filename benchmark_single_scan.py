@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Benchmark the single-scan period queries against the legacy three-query path
+
+For every source this runs the old today/week/month COUNT(DISTINCT ...)
+queries and the new single-scan query from data_collector.PERIOD_QUERIES,
+and reports the median latency and the number of rows the server read.
+
+Rows read are taken from EXPLAIN (ANALYZE, FORMAT JSON) on PostgreSQL and
+from the session Handler_read_* counters on MySQL.
+
+Usage: python benchmark_single_scan.py [--iterations N] [--date YYYY-MM-DD]
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+# Add current directory to Python path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from data_collector import DataCollector, PERIOD_QUERIES, period_params
+from sources import SOURCES
+
+# The three-query path the collectors used before the single-scan rewrite. {table}
+# is the source's qualified table: MySQL sources share a connection per server.
+LEGACY_QUERIES = {
+    "dockify": [
+        "SELECT COUNT(DISTINCT telegram_id) FROM {table} WHERE activity_date = %(today)s",
+        "SELECT COUNT(DISTINCT telegram_id) FROM {table} WHERE activity_date >= %(week_start)s AND activity_date <= %(today)s",
+        "SELECT COUNT(DISTINCT telegram_id) FROM {table} WHERE activity_date >= %(month_start)s AND activity_date <= %(today)s",
+    ],
+    "tel_bot": [
+        "SELECT COUNT(DISTINCT telegram_id) FROM {table} WHERE activity_date = %(today)s",
+        "SELECT COUNT(DISTINCT telegram_id) FROM {table} WHERE activity_date >= %(week_start)s AND activity_date <= %(today)s",
+        "SELECT COUNT(DISTINCT telegram_id) FROM {table} WHERE YEAR(activity_date) = YEAR(%(today)s) AND MONTH(activity_date) = MONTH(%(today)s)",
+    ],
+    "invoice": [
+        "SELECT COUNT(DISTINCT manager_info_id) FROM {table} WHERE DATE(date) = %(today)s AND manager_info_id IS NOT NULL",
+        "SELECT COUNT(DISTINCT manager_info_id) FROM {table} WHERE DATE(date) >= %(week_start)s AND DATE(date) <= %(today)s AND manager_info_id IS NOT NULL",
+        "SELECT COUNT(DISTINCT manager_info_id) FROM {table} WHERE YEAR(DATE(date)) = YEAR(%(today)s) AND MONTH(DATE(date)) = MONTH(%(today)s) AND manager_info_id IS NOT NULL",
+    ],
+    "travel": [
+        "SELECT COUNT(DISTINCT emp_uid) FROM {table} WHERE DATE(start_time) = %(today)s AND emp_uid IS NOT NULL",
+        "SELECT COUNT(DISTINCT emp_uid) FROM {table} WHERE DATE(start_time) >= %(week_start)s AND DATE(start_time) <= %(today)s AND emp_uid IS NOT NULL",
+        "SELECT COUNT(DISTINCT emp_uid) FROM {table} WHERE YEAR(DATE(start_time)) = YEAR(%(today)s) AND MONTH(DATE(start_time)) = MONTH(%(today)s) AND emp_uid IS NOT NULL",
+    ],
+    "document": [
+        "SELECT COUNT(DISTINCT user_id) FROM {table} WHERE DATE(created_at) = %(today)s",
+        "SELECT COUNT(DISTINCT user_id) FROM {table} WHERE DATE(created_at) >= %(week_start)s AND DATE(created_at) <= %(today)s",
+        "SELECT COUNT(DISTINCT user_id) FROM {table} WHERE DATE(created_at) >= %(month_start)s AND DATE(created_at) <= %(today)s",
+    ],
+}
+
+HANDLER_READ_COUNTERS = (
+    "Handler_read_first", "Handler_read_key", "Handler_read_last", "Handler_read_next",
+    "Handler_read_prev", "Handler_read_rnd", "Handler_read_rnd_next"
+)
+
+
+def _postgres_rows_read(plan: dict) -> int:
+    """Rows produced or filtered out by every scan node of an EXPLAIN ANALYZE plan"""
+    rows = 0
+    if "Scan" in plan.get("Node Type", ""):
+        rows += (plan.get("Actual Rows", 0) + plan.get("Rows Removed by Filter", 0)) * plan.get("Actual Loops", 1)
+    for child in plan.get("Plans", []):
+        rows += _postgres_rows_read(child)
+    return rows
+
+
+def _mysql_handler_reads(cur) -> int:
+    cur.execute("SHOW SESSION STATUS LIKE 'Handler_read%'")
+    return sum(int(value) for name, value in cur.fetchall() if name in HANDLER_READ_COUNTERS)
+
+
+def rows_read(cur, db_type: str, queries, params) -> int:
+    """Total rows the server read to answer a batch of queries"""
+    total = 0
+    for sql in queries:
+        if db_type == "postgresql":
+            cur.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + sql, params)
+            plan = cur.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            total += _postgres_rows_read(plan[0]["Plan"])
+        else:
+            before = _mysql_handler_reads(cur)
+            cur.execute(sql, params)
+            cur.fetchall()
+            after = _mysql_handler_reads(cur)
+            # SHOW STATUS reads a few rows itself; subtract one call's worth
+            overhead = _mysql_handler_reads(cur) - after
+            total += after - before - overhead
+    return max(total, 0)
+
+
+def median_latency(cur, queries, params, iterations: int) -> float:
+    """Median wall-clock time in milliseconds to run a batch of queries"""
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        for sql in queries:
+            cur.execute(sql, params)
+            cur.fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def benchmark(iterations: int, target_date: date):
+    collector = DataCollector()
+    params = period_params(target_date)
+
+    print(f"Single-scan benchmark for {target_date} ({iterations} iterations)")
+    print("=" * 78)
+    print(f"{'Source':<10} {'Legacy ms':>10} {'Single ms':>10} {'Legacy rows':>13} {'Single rows':>13} {'Speedup':>9}")
+    print("-" * 78)
+
+    for system, legacy in LEGACY_QUERIES.items():
+        config = collector.configs[system]
+        legacy = [sql.format(table=SOURCES[system].qualified_table) for sql in legacy]
+        single = [PERIOD_QUERIES[system]]
+        try:
+            with collector.pools[system].connection() as conn, conn.cursor() as cur:
+                legacy_ms = median_latency(cur, legacy, params, iterations)
+                single_ms = median_latency(cur, single, params, iterations)
+                legacy_rows = rows_read(cur, config["db_type"], legacy, params)
+                single_rows = rows_read(cur, config["db_type"], single, params)
+        except Exception as e:
+            print(f"{system:<10} skipped: {e}")
+            continue
+
+        speedup = legacy_ms / single_ms if single_ms else 0.0
+        print(f"{system:<10} {legacy_ms:>10.2f} {single_ms:>10.2f} {legacy_rows:>13} {single_rows:>13} {speedup:>8.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--date", type=date.fromisoformat, default=date.today())
+    args = parser.parse_args()
+    benchmark(args.iterations, args.date)
+
+
+if __name__ == "__main__":
+    main()
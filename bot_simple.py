@@ -3,18 +3,26 @@ Simplified Monitoring Report Bot - Main bot application
 """
 import logging
 import asyncio
+import sys
 import schedule
 import time
-from datetime import datetime, date
-from pathlib import Path
+from datetime import datetime, date, timedelta
 import threading
 
 from telegram import Update
 from telegram.ext import Application, CommandHandler, ContextTypes
+from telegram.helpers import escape_markdown
 
-from config import BOT_TOKEN, ADMIN_CHAT_ID, SCHEDULE_CONFIG, SYSTEM_NAMES
-from report_generator import generate_consolidated_report
-from data_collector import DataCollector
+from config import BOT_TOKEN, ADMIN_CHAT_ID, SCHEDULE_CONFIG, ROLLUP_CONFIG, ANOMALY_CONFIG
+from report_generator import (
+    render_consolidated_report, render_consolidated_report_async, format_count, describe_unavailable,
+    describe_error_bound, describe_anomaly, system_name
+)
+from anomalies import detect_anomalies
+from render_service import get_render_service, close_render_service
+from data_collector import DataCollector, SYSTEMS
+from user_sets import GRAINS
+from async_data_collector import AsyncDataCollector
 
 # Setup logging
 logging.basicConfig(
@@ -23,9 +31,18 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Stay under Telegram's 4096-character message limit
+MAX_MESSAGE_CHARS = 3500
+# Longer /range answers ask for a coarser grain instead
+MAX_RANGE_BUCKETS = 120
+# Intraday activity line in /stats, lowest to highest hour
+SPARK_BLOCKS = "▁▂▃▄▅▆▇█"
+
 class MonitoringReportBot:
     def __init__(self):
         self.data_collector = DataCollector()
+        # Handlers await this one so long collections don't block other updates
+        self.async_collector = AsyncDataCollector()
         self.application = None
         
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -43,7 +60,10 @@ This bot generates consolidated reports for your Telegram bots.
 /start - Show this help message
 /weekly - Generate weekly report
 /monthly - Generate monthly report
+/quarterly - Generate quarterly report
+/yearly - Generate yearly report
 /stats - Show current statistics
+/range - Users per day/week/month/quarter, e.g. /range 2026-01-01 2026-03-31 week
 /schedule - Show scheduled reports info
 
 *Scheduled Reports:*
@@ -56,40 +76,37 @@ Reports are automatically sent to administrators.
     
     async def weekly_report_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /weekly command"""
-        if not self._is_admin(update.effective_user.id):
-            await update.message.reply_text("❌ Access denied. This bot is for administrators only.")
-            return
-        
-        await update.message.reply_text("📊 Generating weekly report...")
-        
-        try:
-            # Generate report
-            report_path = generate_consolidated_report("weekly")
-            
-            # Send PDF to admin
-            await self._send_report(update, context, report_path, "Weekly")
-            
-        except Exception as e:
-            logger.error(f"Error generating weekly report: {e}")
-            await update.message.reply_text(f"❌ Error generating report: {str(e)}")
+        await self._report_command(update, context, "weekly")
     
     async def monthly_report_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /monthly command"""
+        await self._report_command(update, context, "monthly")
+    
+    async def quarterly_report_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /quarterly command"""
+        await self._report_command(update, context, "quarterly")
+    
+    async def yearly_report_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /yearly command"""
+        await self._report_command(update, context, "yearly")
+    
+    async def _report_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE, report_type: str):
+        """Generate a report of the given type and send it to the admin who asked"""
         if not self._is_admin(update.effective_user.id):
             await update.message.reply_text("❌ Access denied. This bot is for administrators only.")
             return
         
-        await update.message.reply_text("📊 Generating monthly report...")
+        await update.message.reply_text(f"📊 Generating {report_type} report...")
         
         try:
             # Generate report
-            report_path = generate_consolidated_report("monthly")
+            pdf = await render_consolidated_report_async(report_type, self.async_collector)
             
             # Send PDF to admin
-            await self._send_report(update, context, report_path, "Monthly")
+            await self._send_report(update, context, pdf, report_type.title())
             
         except Exception as e:
-            logger.error(f"Error generating monthly report: {e}")
+            logger.error(f"Error generating {report_type} report: {e}")
             await update.message.reply_text(f"❌ Error generating report: {str(e)}")
     
     async def stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -102,35 +119,27 @@ Reports are automatically sent to administrators.
         
         try:
             # Get current stats
-            stats = self.data_collector.get_combined_stats()
+            stats = await self.async_collector.get_combined_stats()
+            bound = stats.get("error_bound")
+            logger.debug(f"Result cache: {self.async_collector.get_cache_stats()}")
             
-            stats_text = f"""
-📊 *Current Statistics*
-
-*Today:*
-• {SYSTEM_NAMES['dockify']}: {stats['dockify']['today']} users
-• {SYSTEM_NAMES['tel_bot']}: {stats['tel_bot']['today']} users
-• {SYSTEM_NAMES['invoice']}: {stats['invoice']['today']} users
-• {SYSTEM_NAMES['travel']}: {stats['travel']['today']} users
-• {SYSTEM_NAMES['document']}: {stats['document']['today']} users
-• **Total**: {stats['total']['today']} users
-
-*This Week:*
-• {SYSTEM_NAMES['dockify']}: {stats['dockify']['week']} users
-• {SYSTEM_NAMES['tel_bot']}: {stats['tel_bot']['week']} users
-• {SYSTEM_NAMES['invoice']}: {stats['invoice']['week']} users
-• {SYSTEM_NAMES['travel']}: {stats['travel']['week']} users
-• {SYSTEM_NAMES['document']}: {stats['document']['week']} users
-• **Total**: {stats['total']['week']} users
-
-*This Month:*
-• {SYSTEM_NAMES['dockify']}: {stats['dockify']['month']} users
-• {SYSTEM_NAMES['tel_bot']}: {stats['tel_bot']['month']} users
-• {SYSTEM_NAMES['invoice']}: {stats['invoice']['month']} users
-• {SYSTEM_NAMES['travel']}: {stats['travel']['month']} users
-• {SYSTEM_NAMES['document']}: {stats['document']['month']} users
-• **Total**: {stats['total']['month']} users
-            """
+            sections = []
+            for period, heading in (("today", "Today"), ("week", "This Week"), ("month", "This Month")):
+                lines = [f"*{heading}:*"]
+                lines += [
+                    f"• {system_name(system)}: {format_count(stats[system][period], bound)} users"
+                    for system in SYSTEMS
+                ]
+                lines.append(f"• **Total**: {format_count(stats['total'][period], bound)} users")
+                sections.append("\n".join(lines))
+            stats_text = "\n📊 *Current Statistics*\n\n" + "\n\n".join(sections) + "\n"
+            if stats.get("partial"):
+                stats_text += f"\n⚠️ *Partial results:* {escape_markdown(describe_unavailable(stats['unavailable']))}\n"
+            if bound:
+                stats_text += f"\nℹ️ {describe_error_bound(bound)}\n"
+            intraday = self._intraday_text(await self.async_collector.get_intraday())
+            if intraday:
+                stats_text += f"\n{intraday}\n"
             
             await update.message.reply_text(stats_text, parse_mode='Markdown')
             
@@ -138,6 +147,84 @@ Reports are automatically sent to administrators.
             logger.error(f"Error fetching stats: {e}")
             await update.message.reply_text(f"❌ Error fetching statistics: {str(e)}")
     
+    def _intraday_text(self, intraday) -> str:
+        """Sparkline of today's hourly active users (summed over systems) with the peak hour"""
+        hours = datetime.now().hour + 1
+        counts = [sum(system_hours.get(hour, 0) for system_hours in intraday.values()) for hour in range(hours)]
+        if not any(counts):
+            return ""
+        top = max(counts)
+        spark = "".join(SPARK_BLOCKS[count * (len(SPARK_BLOCKS) - 1) // top] for count in counts)
+        peak = counts.index(top)
+        return (f"*Today by Hour* (00:00–{hours - 1:02d}:59)\n`{spark}`\n"
+                f"Peak {peak:02d}:00 with {top} users")
+    
+    async def range_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /range START END [day|week|month|quarter]"""
+        if not self._is_admin(update.effective_user.id):
+            await update.message.reply_text("❌ Access denied. This bot is for administrators only.")
+            return
+        
+        usage = f"Usage: /range YYYY-MM-DD YYYY-MM-DD [{'|'.join(GRAINS)}]"
+        args = context.args or []
+        if len(args) not in (2, 3):
+            await update.message.reply_text(usage)
+            return
+        try:
+            start, end = date.fromisoformat(args[0]), date.fromisoformat(args[1])
+            grain = args[2].lower() if len(args) == 3 else "day"
+            ranges = await self.async_collector.get_range_stats(start=start, end=end, grain=grain)
+        except ValueError as e:
+            await update.message.reply_text(f"❌ {e}\n{usage}")
+            return
+        except Exception as e:
+            logger.error(f"Error fetching range stats: {e}")
+            await update.message.reply_text(f"❌ Error fetching statistics: {str(e)}")
+            return
+        
+        if not ranges:
+            await update.message.reply_text("❌ Range statistics need the rollup store (ROLLUP_ENABLED=true)")
+            return
+        buckets = len(next(iter(ranges.values())))
+        if buckets > MAX_RANGE_BUCKETS:
+            await update.message.reply_text(
+                f"❌ {buckets} {grain} buckets is too many to list (max {MAX_RANGE_BUCKETS}), try a coarser grain"
+            )
+            return
+        for chunk in self._range_tables(ranges, start, end, grain):
+            await update.message.reply_text(chunk, parse_mode='Markdown')
+    
+    def _range_tables(self, ranges, start: date, end: date, grain: str):
+        """Monospace bucket-by-system tables for /range, split to fit Telegram messages"""
+        # Registry keys keep the columns narrow enough for a phone screen
+        systems = list(ranges)
+        widths = [max(len(system), 6) for system in systems]
+        header = f"{'Bucket':<10} " + " ".join(f"{system:>{width}}" for system, width in zip(systems, widths))
+        rows = []
+        incomplete = False
+        for index, bucket in enumerate(ranges[systems[0]]):
+            cells = []
+            for system, width in zip(systems, widths):
+                entry = ranges[system][index]
+                mark = "" if entry["complete"] else "*"
+                incomplete = incomplete or not entry["complete"]
+                cells.append(f"{str(entry['unique_users']) + mark:>{width}}")
+            rows.append(f"{bucket['bucket']:<10} " + " ".join(cells))
+        
+        title = f"📆 *Unique users by {grain}, {start} to {end}*\n"
+        footer = "\n\\* some days not collected yet" if incomplete else ""
+        chunks, lines = [], []
+        for row in rows:
+            if lines and sum(len(line) + 1 for line in lines) + len(row) > MAX_MESSAGE_CHARS:
+                chunks.append(lines)
+                lines = []
+            lines.append(row)
+        chunks.append(lines)
+        messages = ["```\n" + "\n".join([header] + lines) + "\n```" for lines in chunks]
+        messages[0] = title + messages[0]
+        messages[-1] += footer
+        return messages
+    
     async def schedule_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /schedule command"""
         if not self._is_admin(update.effective_user.id):
@@ -156,28 +243,24 @@ Reports are automatically sent to administrators.
 • Time: {SCHEDULE_CONFIG['monthly_time']}
 
 Reports are automatically generated and sent to administrators.
-You can also generate reports manually using /weekly or /monthly commands.
+You can also generate reports manually using /weekly, /monthly, /quarterly or /yearly.
         """
         
         await update.message.reply_text(schedule_text, parse_mode='Markdown')
     
-    async def _send_report(self, update: Update, context: ContextTypes.DEFAULT_TYPE, report_path: str, report_type: str):
-        """Send generated report to admin"""
+    async def _send_report(self, update: Update, context: ContextTypes.DEFAULT_TYPE, pdf: bytes, report_type: str):
+        """Send a report rendered in memory to admin"""
         try:
-            with open(report_path, 'rb') as pdf_file:
-                caption = f"📊 {report_type} Monitoring Report\nGenerated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-                await context.bot.send_document(
-                    chat_id=update.effective_chat.id,
-                    document=pdf_file,
-                    filename=f"{report_type.lower()}_monitoring_report.pdf",
-                    caption=caption
-                )
+            caption = f"📊 {report_type} Monitoring Report\nGenerated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+            await context.bot.send_document(
+                chat_id=update.effective_chat.id,
+                document=pdf,
+                filename=f"{report_type.lower()}_monitoring_report.pdf",
+                caption=caption
+            )
             
             await update.message.reply_text(f"✅ {report_type} report generated and sent successfully!")
             
-            # Clean up the file
-            Path(report_path).unlink(missing_ok=True)
-            
         except Exception as e:
             logger.error(f"Error sending report: {e}")
             await update.message.reply_text(f"❌ Error sending report: {str(e)}")
@@ -191,7 +274,7 @@ You can also generate reports manually using /weekly or /monthly commands.
         """Send scheduled report to all admins (synchronous version)"""
         try:
             # Generate report
-            report_path = generate_consolidated_report(report_type)
+            pdf = render_consolidated_report(report_type)
             
             # Send to all admins using the bot instance
             admin_ids = [int(id.strip()) for id in ADMIN_CHAT_ID.split(',') if id.strip()]
@@ -204,14 +287,13 @@ You can also generate reports manually using /weekly or /monthly commands.
                 try:
                     async def send_to_admin(admin_id):
                         try:
-                            with open(report_path, 'rb') as pdf_file:
-                                caption = f"📊 Scheduled {report_type.title()} Monitoring Report\nGenerated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-                                await self.application.bot.send_document(
-                                    chat_id=admin_id,
-                                    document=pdf_file,
-                                    filename=f"scheduled_{report_type.lower()}_report.pdf",
-                                    caption=caption
-                                )
+                            caption = f"📊 Scheduled {report_type.title()} Monitoring Report\nGenerated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+                            await self.application.bot.send_document(
+                                chat_id=admin_id,
+                                document=pdf,
+                                filename=f"scheduled_{report_type.lower()}_report.pdf",
+                                caption=caption
+                            )
                             logger.info(f"Scheduled {report_type} report sent to admin {admin_id}")
                         except Exception as e:
                             logger.error(f"Error sending scheduled report to admin {admin_id}: {e}")
@@ -223,12 +305,48 @@ You can also generate reports manually using /weekly or /monthly commands.
                 finally:
                     loop.close()
             
-            # Clean up the file
-            Path(report_path).unlink(missing_ok=True)
-            
         except Exception as e:
             logger.error(f"Error generating scheduled {report_type} report: {e}")
     
+    def send_anomaly_alerts_sync(self):
+        """Alert all admins about unusual activity yesterday (synchronous version)"""
+        try:
+            yesterday = date.today() - timedelta(days=1)
+            trends = self.data_collector.get_daily_trends(ANOMALY_CONFIG["history_days"])
+            anomalies = [
+                anomaly for anomaly in detect_anomalies(trends, end=yesterday)
+                if anomaly["date"] == yesterday
+            ]
+            if not anomalies:
+                logger.info(f"Anomaly check: nothing unusual on {yesterday}")
+                return
+            
+            text = f"🚨 Unusual activity on {yesterday}\n\n" + "\n".join(
+                f"• {system_name(anomaly['system'])}: {describe_anomaly(anomaly)}" for anomaly in anomalies
+            )
+            admin_ids = [int(id.strip()) for id in ADMIN_CHAT_ID.split(',') if id.strip()]
+            
+            if self.application and self.application.bot:
+                loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(loop)
+                
+                try:
+                    async def send_to_admin(admin_id):
+                        try:
+                            await self.application.bot.send_message(chat_id=admin_id, text=text)
+                            logger.info(f"Anomaly alert sent to admin {admin_id}")
+                        except Exception as e:
+                            logger.error(f"Error sending anomaly alert to admin {admin_id}: {e}")
+                    
+                    for admin_id in admin_ids:
+                        loop.run_until_complete(send_to_admin(admin_id))
+                
+                finally:
+                    loop.close()
+            
+        except Exception as e:
+            logger.error(f"Error checking for anomalies: {e}")
+    
     def setup_scheduler(self):
         """Setup scheduled report generation"""
         # Weekly reports (Mondays at 9:00 AM)
@@ -243,24 +361,50 @@ You can also generate reports manually using /weekly or /monthly commands.
         
         schedule.every().day.at(SCHEDULE_CONFIG['monthly_time']).do(monthly_job)
         
+        # Proactive alert when yesterday's activity breaks from the usual pattern
+        if ANOMALY_CONFIG['alerts_enabled']:
+            schedule.every().day.at(ANOMALY_CONFIG['check_time']).do(self.send_anomaly_alerts_sync)
+        
+        # Keep the rollup store current so reports only read today's rows live
+        if self.data_collector.rollups:
+            schedule.every(ROLLUP_CONFIG['ingest_interval_minutes']).minutes.do(self.data_collector.ingest_rollups)
+        
         logger.info("Scheduler setup completed")
     
     def run_scheduler(self):
         """Run the scheduler in a separate thread"""
+        # Catch up on closed days missed while the bot was down
+        self.data_collector.ingest_rollups()
+        
         while True:
             schedule.run_pending()
             time.sleep(60)  # Check every minute
     
+    async def _close_collectors(self, application: Application):
+        """Close the async collector's connection pools and the render workers on shutdown"""
+        await self.async_collector.close()
+        close_render_service()
+    
     def run(self):
         """Run the bot"""
+        # psycopg's async connections need a selector event loop on Windows
+        if sys.platform == "win32":
+            asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+        
+        # Start the report render workers now so the first /weekly does not pay for it
+        get_render_service()
+        
         # Create application
-        self.application = Application.builder().token(BOT_TOKEN).build()
+        self.application = Application.builder().token(BOT_TOKEN).post_shutdown(self._close_collectors).build()
         
         # Add command handlers
         self.application.add_handler(CommandHandler("start", self.start_command))
         self.application.add_handler(CommandHandler("weekly", self.weekly_report_command))
         self.application.add_handler(CommandHandler("monthly", self.monthly_report_command))
+        self.application.add_handler(CommandHandler("quarterly", self.quarterly_report_command))
+        self.application.add_handler(CommandHandler("yearly", self.yearly_report_command))
         self.application.add_handler(CommandHandler("stats", self.stats_command))
+        self.application.add_handler(CommandHandler("range", self.range_command))
         self.application.add_handler(CommandHandler("schedule", self.schedule_command))
         
         # Setup scheduler
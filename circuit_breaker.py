@@ -0,0 +1,131 @@
+"""
+Circuit Breaker - Fail fast on sources that keep failing or timing out
+"""
+import logging
+import threading
+import time
+from typing import Dict
+
+from config import CIRCUIT_BREAKER_CONFIG
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class SourceUnavailable(Exception):
+    """Raised instead of querying a source whose circuit is open"""
+
+    def __init__(self, system: str, retry_in: float):
+        self.system = system
+        self.retry_in = retry_in
+        super().__init__(f"source unavailable (circuit open, retry in {retry_in:.0f}s)")
+
+
+class CircuitBreaker:
+    """
+    Closed: calls go through and consecutive failures are counted.
+    Open: after ``failure_threshold`` failures every call is refused for
+    ``reset_timeout`` seconds.
+    Half-open: then up to ``half_open_max_calls`` trial calls are let
+    through; a success closes the circuit, a failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = None, reset_timeout: float = None,
+                 half_open_max_calls: int = None):
+        self.name = name
+        self.failure_threshold = failure_threshold or CIRCUIT_BREAKER_CONFIG["failure_threshold"]
+        self.reset_timeout = reset_timeout or CIRCUIT_BREAKER_CONFIG["reset_timeout"]
+        self.half_open_max_calls = half_open_max_calls or CIRCUIT_BREAKER_CONFIG["half_open_max_calls"]
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trials = 0
+        self.rejected = 0
+        self.trips = 0
+
+    def _current_state(self) -> str:
+        """State, moving open to half-open once the reset timeout has passed (lock held)"""
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._trials = 0
+        return self._state
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def retry_in(self) -> float:
+        """Seconds until an open circuit lets a trial call through"""
+        with self._lock:
+            if self._current_state() != OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def is_open(self) -> bool:
+        """True while the circuit is open and not yet due for a trial call"""
+        with self._lock:
+            return self._current_state() == OPEN
+
+    def allow(self) -> bool:
+        """Whether a call may go through now (takes a trial slot when half-open)"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._trials < self.half_open_max_calls:
+                self._trials += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info(f"{self.name}: circuit closed again")
+            self._state = CLOSED
+            self._failures = 0
+            self._trials = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            state = self._current_state()
+            self._failures += 1
+            if state == HALF_OPEN or (state == CLOSED and self._failures >= self.failure_threshold):
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self.trips += 1
+                logger.warning(
+                    f"{self.name}: circuit opened after {self._failures} consecutive failures, "
+                    f"failing fast for {self.reset_timeout:.0f}s"
+                )
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "consecutive_failures": self._failures,
+                "trips": self.trips,
+                "rejected": self.rejected
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Process-wide breaker for a source, shared by pools and collectors"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name)
+        return breaker
+
+
+def get_all_breaker_stats() -> Dict[str, Dict]:
+    with _breakers_lock:
+        breakers = list(_breakers.items())
+    return {name: breaker.stats() for name, breaker in breakers}
@@ -56,6 +56,131 @@ DOCUMENT_DB_CONFIG = {
     "db_type": "postgresql"
 }
 
+# Connection pooling (one pool per source, shared by every DataCollector)
+DB_POOL_CONFIG = {
+    "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "1")),
+    "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "5")),
+    "max_idle": float(os.getenv("DB_POOL_MAX_IDLE", "300")),  # seconds before an idle connection is recycled
+    "max_lifetime": float(os.getenv("DB_POOL_MAX_LIFETIME", "3600")),  # seconds before any connection is recycled
+    "check_after": float(os.getenv("DB_POOL_CHECK_AFTER", "30")),  # idle seconds before a checkout is health-checked
+    "checkout_timeout": float(os.getenv("DB_POOL_CHECKOUT_TIMEOUT", "10"))
+}
+
+DB_TIMEOUT_CONFIG = {
+    "connect_timeout": int(os.getenv("DB_CONNECT_TIMEOUT", "3")),
+    # Client-side socket timeout for MySQL reads and writes
+    "read_timeout": int(os.getenv("DB_READ_TIMEOUT", "15")),
+    # Server-side limit per PostgreSQL statement
+    "statement_timeout": int(os.getenv("DB_STATEMENT_TIMEOUT", "10"))
+}
+
+# Per-source circuit breakers: after failure_threshold consecutive failures or
+# missed deadlines a source is skipped for reset_timeout seconds, then
+# half_open_max_calls trial calls decide whether it is back
+CIRCUIT_BREAKER_CONFIG = {
+    "enabled": os.getenv("CIRCUIT_BREAKER_ENABLED", "true").lower() == "true",
+    "failure_threshold": int(os.getenv("CIRCUIT_BREAKER_FAILURES", "3")),
+    "reset_timeout": float(os.getenv("CIRCUIT_BREAKER_RESET_TIMEOUT", "30")),
+    "half_open_max_calls": int(os.getenv("CIRCUIT_BREAKER_HALF_OPEN_CALLS", "1"))
+}
+
+# Concurrent collection: every source is queried at once, each with its own
+# deadline (seconds), and the whole fan-out is capped by the overall deadline
+COLLECTION_CONFIG = {
+    "parallel": os.getenv("COLLECTION_PARALLEL", "true").lower() == "true",
+    "max_workers": int(os.getenv("COLLECTION_MAX_WORKERS", "10")),
+    "source_deadline": float(os.getenv("COLLECTION_SOURCE_DEADLINE", "10")),
+    "overall_deadline": float(os.getenv("COLLECTION_OVERALL_DEADLINE", "15")),
+    # Send each PostgreSQL source's query batch as one psycopg pipeline
+    "pg_pipeline": os.getenv("PG_PIPELINE", "true").lower() == "true",
+    # MySQL sources on the same host, port and account share one pool
+    "share_mysql_connections": os.getenv("MYSQL_SHARED_CONNECTIONS", "true").lower() == "true",
+    # Day ranges longer than this are read through server-side cursors, stream_batch_rows at a time
+    "stream_after_days": int(os.getenv("STREAM_AFTER_DAYS", "7")),
+    "stream_batch_rows": int(os.getenv("STREAM_BATCH_ROWS", "5000"))
+}
+
+# Result cache for collected stats (TTL + stale-while-revalidate). Results for
+# past dates never expire; stale results are served while a refresh runs.
+RESULT_CACHE_CONFIG = {
+    "enabled": os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true",
+    "ttl": float(os.getenv("RESULT_CACHE_TTL", "60")),
+    "max_stale": float(os.getenv("RESULT_CACHE_MAX_STALE", "3600")),
+    "max_entries": int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "512"))
+}
+
+# Rendered PDFs keyed by a hash of their inputs, in REPORTS_DIR/cache; least
+# recently used reports are deleted beyond max_mb
+REPORT_CACHE_CONFIG = {
+    "enabled": os.getenv("REPORT_CACHE_ENABLED", "true").lower() == "true",
+    "max_mb": int(os.getenv("REPORT_CACHE_MAX_MB", "50"))
+}
+
+# Reports are rendered in memory and sent from there; enable the archive to
+# also keep a timestamped copy of every report on disk
+REPORT_ARCHIVE_CONFIG = {
+    "enabled": os.getenv("REPORT_ARCHIVE_ENABLED", "false").lower() == "true",
+    "dir": os.getenv("REPORT_ARCHIVE_DIR", "reports/archive")
+}
+
+# Worker processes that lay out PDF reports (0 renders in the bot process)
+RENDER_CONFIG = {
+    "processes": int(os.getenv("RENDER_PROCESSES", "2"))
+}
+
+# Seconds before cached table/column capabilities are re-probed
+SCHEMA_CACHE_TTL = float(os.getenv("SCHEMA_CACHE_TTL", "3600"))
+
+# Local rollup store of per-day activity (closed days only; today is read live)
+ROLLUP_CONFIG = {
+    "enabled": os.getenv("ROLLUP_ENABLED", "true").lower() == "true",
+    "path": os.getenv("ROLLUP_DB_PATH", "data/rollups.sqlite3"),
+    "backfill_days": int(os.getenv("ROLLUP_BACKFILL_DAYS", "120")),
+    "ingest_interval_minutes": int(os.getenv("ROLLUP_INGEST_INTERVAL_MINUTES", "15")),
+    # Days of per-hour user sets kept for sources with timestamps (0 disables hourly rollups)
+    "hourly_days": int(os.getenv("ROLLUP_HOURLY_DAYS", "35")),
+    # Decoded per-day user-ID arrays kept in memory (per system and day)
+    "set_cache_days": int(os.getenv("ROLLUP_SET_CACHE_DAYS", "1024"))
+}
+
+# Approximate distinct counts (HyperLogLog sketches over the rollup store)
+APPROX_DISTINCT_CONFIG = {
+    "enabled": os.getenv("APPROX_DISTINCT", "false").lower() == "true",
+    # 2**precision registers per sketch; 14 gives about 1.6% error at 95% confidence
+    "precision": int(os.getenv("HLL_PRECISION", "14"))
+}
+
+# Anomaly checks on the daily active-user series (report section and alerts)
+ANOMALY_CONFIG = {
+    "alerts_enabled": os.getenv("ANOMALY_ALERTS_ENABLED", "true").lower() == "true",
+    # Daily alert about the previous day, checked against this many days of history
+    "check_time": os.getenv("ANOMALY_CHECK_TIME", "08:30"),
+    "history_days": int(os.getenv("ANOMALY_HISTORY_DAYS", "90")),
+    # Trailing days the rolling median / MAD baseline is taken over
+    "window_days": int(os.getenv("ANOMALY_WINDOW_DAYS", "14")),
+    "z_threshold": float(os.getenv("ANOMALY_Z_THRESHOLD", "3.5")),
+    # Relative change against the same weekday a week earlier
+    "week_over_week_change": float(os.getenv("ANOMALY_WOW_CHANGE", "0.5")),
+    # Baselines below this many users are too small to judge
+    "min_users": int(os.getenv("ANOMALY_MIN_USERS", "5"))
+}
+
+# Trend charts: days of daily history per report type and how they are drawn.
+# Windows longer than week_after_days are charted as weekly averages, longer
+# than month_after_days as monthly ones; series still above max_points are
+# thinned with LTTB, which keeps peaks and dips
+TREND_CONFIG = {
+    "days": {
+        "weekly": int(os.getenv("TREND_DAYS_WEEKLY", "30")),
+        "monthly": int(os.getenv("TREND_DAYS_MONTHLY", "30")),
+        "quarterly": int(os.getenv("TREND_DAYS_QUARTERLY", "91")),
+        "yearly": int(os.getenv("TREND_DAYS_YEARLY", "365"))
+    },
+    "max_points": int(os.getenv("TREND_CHART_MAX_POINTS", "60")),
+    "week_after_days": int(os.getenv("TREND_WEEKLY_AFTER_DAYS", "92")),
+    "month_after_days": int(os.getenv("TREND_MONTHLY_AFTER_DAYS", "730"))
+}
+
 # System Names for Reports
 SYSTEM_NAMES = {
     "dockify": os.getenv("DOCKFIY_BOT_NAME", "@DOCKFIY-PART 3"),
@@ -65,6 +190,28 @@ SYSTEM_NAMES = {
     "document": os.getenv("DOCUMENT_BOT_NAME", "Document Bot (File Uploads)")
 }
 
+# What each system measures: the table, the user-ID column and the activity
+# date/timestamp column (time_is_date when it is a DATE, so no DATE() cast is
+# needed). "filters" are extra SQL predicates ANDed into every query and
+# "time_optional" lets a table without the time column fall back to all-time
+# totals. Adding a system takes a *_DB_CONFIG, a SYSTEM_NAMES entry and one
+# entry here; queries, pooling and parallel collection follow automatically.
+SOURCE_DEFINITIONS = {
+    "dockify": {"db_config": DOCKFIY_DB_CONFIG, "table": "user_activity",
+                "user_column": "telegram_id", "time_column": "activity_date", "time_is_date": True},
+    "tel_bot": {"db_config": TEL_BOT_DB_CONFIG, "table": "user_activity",
+                "user_column": "telegram_id", "time_column": "activity_date", "time_is_date": True},
+    # Managers and admins who used the system
+    "invoice": {"db_config": INVOICE_DB_CONFIG, "table": "history_log",
+                "user_column": "manager_info_id", "time_column": "date"},
+    # Employees who submitted vehicle forms
+    "travel": {"db_config": TRAVEL_DB_CONFIG, "table": "journeys",
+               "user_column": "emp_uid", "time_column": "start_time"},
+    # Users who started upload sessions
+    "document": {"db_config": DOCUMENT_DB_CONFIG, "table": "upload_sessions",
+                 "user_column": "user_id", "time_column": "created_at", "time_optional": True},
+}
+
 # Report Configuration
 REPORTS_DIR = "reports"
 SCHEDULE_CONFIG = {
@@ -0,0 +1,779 @@
+"""
+Connection Pool - Long-lived, health-checked database connections per source
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from itertools import count
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import aiomysql
+import psycopg
+import pymysql
+from pymysql.constants import CLIENT
+
+from circuit_breaker import CircuitBreaker, SourceUnavailable, get_breaker
+from config import DB_POOL_CONFIG, DB_TIMEOUT_CONFIG, CIRCUIT_BREAKER_CONFIG, COLLECTION_CONFIG
+from sources import SOURCES, POOL_NAMES
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out before the wait timeout"""
+
+
+def connect_postgres(config: Dict):
+    """Open a PostgreSQL connection for a source config (raises on failure)"""
+    conn_str = f"postgresql://{config['user']}:{config['password']}@{config['host']}:{config['port']}/{config['database']}"
+    # Autocommit keeps pooled connections out of idle-in-transaction state;
+    # statement_timeout makes the server cancel runaway queries
+    return psycopg.connect(
+        conn_str,
+        connect_timeout=DB_TIMEOUT_CONFIG["connect_timeout"],
+        options=f"-c statement_timeout={DB_TIMEOUT_CONFIG['statement_timeout'] * 1000}",
+        autocommit=True
+    )
+
+
+def connect_mysql(config: Dict, multi_statements: bool = False):
+    """Open a MySQL connection for a source config (raises on failure)"""
+    # Autocommit matters for pooled MySQL connections: with REPEATABLE READ an
+    # open transaction would keep serving the same snapshot on every checkout.
+    # Multi-statements let fetch_batch send a whole batch in one round-trip;
+    # only the collectors' pools ask for them (see _sends_batches).
+    return pymysql.connect(
+        host=config['host'],
+        port=int(config['port']),
+        user=config['user'],
+        password=config['password'],
+        database=config['database'],
+        charset='utf8mb4',
+        connect_timeout=DB_TIMEOUT_CONFIG["connect_timeout"],
+        read_timeout=DB_TIMEOUT_CONFIG["read_timeout"],
+        write_timeout=DB_TIMEOUT_CONFIG["read_timeout"],
+        client_flag=CLIENT.MULTI_STATEMENTS if multi_statements else 0,
+        autocommit=True
+    )
+
+
+async def connect_postgres_async(config: Dict):
+    """Open an asyncio PostgreSQL connection for a source config (raises on failure)"""
+    conn_str = f"postgresql://{config['user']}:{config['password']}@{config['host']}:{config['port']}/{config['database']}"
+    return await psycopg.AsyncConnection.connect(
+        conn_str,
+        connect_timeout=DB_TIMEOUT_CONFIG["connect_timeout"],
+        options=f"-c statement_timeout={DB_TIMEOUT_CONFIG['statement_timeout'] * 1000}",
+        autocommit=True
+    )
+
+
+async def connect_mysql_async(config: Dict, multi_statements: bool = False):
+    """Open an asyncio MySQL connection for a source config (raises on failure)"""
+    # aiomysql has no read_timeout; callers bound queries with asyncio deadlines
+    return await aiomysql.connect(
+        host=config['host'],
+        port=int(config['port']),
+        user=config['user'],
+        password=config['password'],
+        db=config['database'],
+        charset='utf8mb4',
+        connect_timeout=DB_TIMEOUT_CONFIG["connect_timeout"],
+        client_flag=CLIENT.MULTI_STATEMENTS if multi_statements else 0,
+        autocommit=True
+    )
+
+
+def _postgres_is_usable(conn) -> bool:
+    if conn.closed or conn.broken:
+        return False
+    if conn.info.transaction_status != psycopg.pq.TransactionStatus.IDLE:
+        conn.rollback()
+    return True
+
+
+def _mysql_is_usable(conn) -> bool:
+    return bool(conn.open)
+
+
+async def _postgres_is_usable_async(conn) -> bool:
+    if conn.closed or conn.broken:
+        return False
+    if conn.info.transaction_status != psycopg.pq.TransactionStatus.IDLE:
+        await conn.rollback()
+    return True
+
+
+async def _mysql_is_usable_async(conn) -> bool:
+    return not conn.closed
+
+
+def _use_pipeline(conn, batch: Sequence) -> bool:
+    return (
+        COLLECTION_CONFIG["pg_pipeline"] and len(batch) > 1
+        and isinstance(conn, (psycopg.Connection, psycopg.AsyncConnection))
+        and psycopg.Pipeline.is_supported()
+    )
+
+
+def _use_multi_statement(conn, batch: Sequence) -> bool:
+    return (
+        len(batch) > 1
+        and isinstance(conn, (pymysql.connections.Connection, aiomysql.Connection))
+        and bool(conn.client_flag & CLIENT.MULTI_STATEMENTS)
+    )
+
+
+def _multi_statement(cur, batch: Sequence[Tuple[str, Dict]]) -> str:
+    """One SQL string running every query of a batch; parameters are escaped client-side"""
+    return ";\n".join(cur.mogrify(sql, params) for sql, params in batch)
+
+
+def fetch_batch(conn, batch: Sequence[Tuple[str, Dict]]) -> List[List[Tuple]]:
+    """
+    Rows of every (sql, params) query in batch, in order
+
+    Either way the whole batch costs about one network round-trip instead
+    of one per query: PostgreSQL gets prepared statements through one
+    psycopg pipeline, MySQL one multi-statement whose result sets are read
+    back in order (the queries of several databases on a shared connection
+    can go out together).
+    """
+    if _use_pipeline(conn, batch):
+        cursors = []
+        try:
+            with conn.pipeline():
+                for sql, params in batch:
+                    cur = conn.cursor()
+                    cursors.append(cur)
+                    cur.execute(sql, params, prepare=True)
+            # Leaving the pipeline block synced it, so every result is already here
+            return [cur.fetchall() for cur in cursors]
+        finally:
+            for cur in cursors:
+                cur.close()
+
+    results = []
+    with conn.cursor() as cur:
+        if _use_multi_statement(conn, batch):
+            cur.execute(_multi_statement(cur, batch))
+            results.append(cur.fetchall())
+            while cur.nextset():
+                results.append(cur.fetchall())
+            return results
+        for sql, params in batch:
+            cur.execute(sql, params)
+            results.append(cur.fetchall())
+    return results
+
+
+async def fetch_batch_async(conn, batch: Sequence[Tuple[str, Dict]]) -> List[List[Tuple]]:
+    """``fetch_batch`` for psycopg AsyncConnection and aiomysql connections"""
+    if _use_pipeline(conn, batch):
+        cursors = []
+        try:
+            async with conn.pipeline():
+                for sql, params in batch:
+                    cur = conn.cursor()
+                    cursors.append(cur)
+                    await cur.execute(sql, params, prepare=True)
+            return [await cur.fetchall() for cur in cursors]
+        finally:
+            for cur in cursors:
+                await cur.close()
+
+    results = []
+    async with conn.cursor() as cur:
+        if _use_multi_statement(conn, batch):
+            await cur.execute(_multi_statement(cur, batch))
+            results.append(await cur.fetchall())
+            while await cur.nextset():
+                results.append(await cur.fetchall())
+            return results
+        for sql, params in batch:
+            await cur.execute(sql, params)
+            results.append(await cur.fetchall())
+    return results
+
+
+_stream_ids = count(1)
+
+
+def stream_rows(conn, sql: str, params: Dict = None, batch_size: int = None) -> Iterator[Tuple]:
+    """
+    Yield the rows of a query through a server-side cursor, batch_size at a time
+
+    The result set stays on the server (a psycopg named cursor, or pymysql's
+    unbuffered SSCursor) so memory does not grow with the number of rows. The
+    connection is busy until the generator is exhausted or closed; do not run
+    other queries on it meanwhile, and close it (contextlib.closing) before
+    the connection goes back to its pool. Closing discards the rest of the
+    result and ends the cursor's transaction.
+    """
+    batch_size = batch_size or COLLECTION_CONFIG["stream_batch_rows"]
+    if isinstance(conn, psycopg.Connection):
+        # Named cursors only live inside a transaction, and pooled connections autocommit
+        with conn.transaction(), conn.cursor(name=f"stream_{next(_stream_ids)}") as cur:
+            cur.itersize = batch_size
+            cur.execute(sql, params)
+            yield from cur
+        return
+
+    with conn.cursor(pymysql.cursors.SSCursor) as cur:
+        cur.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
+
+
+@asynccontextmanager
+async def open_stream_async(conn, sql: str, params: Dict = None):
+    """
+    ``stream_rows`` for psycopg AsyncConnection and aiomysql connections:
+    yields the executed server-side cursor (aiomysql's SSCursor for MySQL),
+    closed with the rest of its result and its transaction on exit. Read it
+    with fetchmany, or from a worker thread with fold_stream_async.
+    """
+    if isinstance(conn, psycopg.AsyncConnection):
+        async with conn.transaction(), conn.cursor(name=f"stream_{next(_stream_ids)}") as cur:
+            await cur.execute(sql, params)
+            yield cur
+        return
+
+    async with conn.cursor(aiomysql.SSCursor) as cur:
+        await cur.execute(sql, params)
+        yield cur
+
+
+def fetch_rows_threadsafe(cur, loop: asyncio.AbstractEventLoop, batch_size: int = None,
+                          cancelled: threading.Event = None) -> Iterator[Tuple]:
+    """
+    Rows of an open_stream_async cursor for sync code in a worker thread
+
+    Every batch is fetched on ``loop``, so the loop must stay free while the
+    thread runs and the cursor must stay open until the thread is done (see
+    fold_stream_async). Once ``cancelled`` is set, the next batch raises
+    CancelledError instead of touching the cursor.
+    """
+    batch_size = batch_size or COLLECTION_CONFIG["stream_batch_rows"]
+    while True:
+        if cancelled is not None and cancelled.is_set():
+            raise asyncio.CancelledError("stream cancelled")
+        rows = asyncio.run_coroutine_threadsafe(cur.fetchmany(batch_size), loop).result()
+        if not rows:
+            return
+        yield from rows
+
+
+async def fold_stream_async(cur, fold: Callable, *args):
+    """
+    ``fold(rows, *args)`` over an open_stream_async cursor, run in a worker thread
+
+    Cancelling the caller does not abandon the thread while the cursor is in
+    use: the thread is told to stop at its next batch and is waited for, and
+    only then does the cancellation propagate (and the caller's ``async with``
+    close the cursor).
+    """
+    cancelled = threading.Event()
+    rows = fetch_rows_threadsafe(cur, asyncio.get_running_loop(), cancelled=cancelled)
+    worker = asyncio.ensure_future(asyncio.to_thread(fold, rows, *args))
+    try:
+        return await asyncio.shield(worker)
+    except asyncio.CancelledError:
+        cancelled.set()
+        while not worker.done():
+            try:
+                await asyncio.wait({worker})
+            except asyncio.CancelledError:
+                continue
+        if not worker.cancelled():
+            worker.exception()
+        raise
+
+
+def _ping(conn) -> None:
+    """Cheap round-trip used as the checkout health check"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1")
+        cur.fetchone()
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of connections to a single database source.
+
+    Connections are created lazily up to ``max_size``; idle connections older
+    than ``max_idle`` seconds (or ``max_lifetime`` since creation) are
+    recycled, while ``min_size`` connections are kept warm. Every checkout of a
+    connection that sat idle for longer than ``check_after`` seconds is
+    verified with a ``SELECT 1`` round-trip first.
+    """
+
+    def __init__(self, name: str, factory: Callable, is_usable: Callable = None,
+                 min_size: int = 1, max_size: int = 5, max_idle: float = 300,
+                 max_lifetime: float = 3600, check_after: float = 30,
+                 checkout_timeout: float = 10, breaker: CircuitBreaker = None):
+        self.name = name
+        # Checkouts fail fast while this source's circuit is open
+        self.breaker = breaker
+        self._factory = factory
+        self._is_usable = is_usable or (lambda conn: True)
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.check_after = check_after
+        self.checkout_timeout = checkout_timeout
+
+        self._cond = threading.Condition()
+        # Idle entries are [conn, created_at, last_used]
+        self._idle = deque()
+        self._size = 0
+        self._closed = False
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "timeouts": 0,
+            "connections_created": 0,
+            "connect_errors": 0,
+            "creation_time_total": 0.0,
+            "creation_time_max": 0.0,
+            "health_check_failures": 0,
+            "recycled": 0,
+            "discarded": 0,
+        }
+        self._created_at = {}
+
+    def _expired(self, created_at: float, last_used: float, now: float) -> bool:
+        return (now - last_used > self.max_idle and self._size > self.min_size) or \
+            now - created_at > self.max_lifetime
+
+    def _create(self):
+        started = time.monotonic()
+        try:
+            conn = self._factory()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._stats["connect_errors"] += 1
+                self._cond.notify()
+            raise
+        elapsed = time.monotonic() - started
+        with self._cond:
+            self._stats["connections_created"] += 1
+            self._stats["creation_time_total"] += elapsed
+            self._stats["creation_time_max"] = max(self._stats["creation_time_max"], elapsed)
+            self._created_at[id(conn)] = time.monotonic()
+        return conn
+
+    def _close_quietly(self, conn) -> None:
+        self._created_at.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def getconn(self, timeout: Optional[float] = None):
+        """Check out a connection, waiting up to ``timeout`` seconds for one to free up"""
+        if self.breaker is not None and self.breaker.is_open():
+            raise SourceUnavailable(self.name, self.breaker.retry_in())
+        if timeout is None:
+            timeout = self.checkout_timeout
+        deadline = time.monotonic() + timeout
+        waited_since = None
+
+        while True:
+            candidate = None
+            with self._cond:
+                if self._closed:
+                    raise PoolTimeout(f"Pool '{self.name}' is closed")
+                now = time.monotonic()
+                while self._idle:
+                    conn, created_at, last_used = self._idle.pop()
+                    if self._expired(created_at, last_used, now):
+                        self._size -= 1
+                        self._stats["recycled"] += 1
+                        self._close_quietly(conn)
+                        continue
+                    candidate = (conn, last_used)
+                    break
+
+                if candidate is None:
+                    if self._size < self.max_size:
+                        self._size += 1
+                    else:
+                        if waited_since is None:
+                            waited_since = now
+                            self._stats["waits"] += 1
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            self._stats["timeouts"] += 1
+                            raise PoolTimeout(
+                                f"Timed out after {timeout:.1f}s waiting for a '{self.name}' connection"
+                            )
+                        self._cond.wait(remaining)
+                        continue
+
+            if candidate is None:
+                conn = self._create()
+            else:
+                conn, last_used = candidate
+                if time.monotonic() - last_used > self.check_after and not self._check(conn):
+                    continue
+
+            with self._cond:
+                self._stats["checkouts"] += 1
+                if waited_since is not None:
+                    waited = time.monotonic() - waited_since
+                    self._stats["wait_time_total"] += waited
+                    self._stats["wait_time_max"] = max(self._stats["wait_time_max"], waited)
+            return conn
+
+    def _check(self, conn) -> bool:
+        """Health check a connection on checkout, discarding it if dead"""
+        try:
+            if self._is_usable(conn):
+                _ping(conn)
+                return True
+        except Exception as e:
+            logger.warning(f"Discarding unhealthy '{self.name}' connection: {e}")
+        with self._cond:
+            self._size -= 1
+            self._stats["health_check_failures"] += 1
+            self._cond.notify()
+        self._close_quietly(conn)
+        return False
+
+    def putconn(self, conn, discard: bool = False) -> None:
+        """Return a checked-out connection to the pool"""
+        if not discard:
+            try:
+                discard = not self._is_usable(conn)
+            except Exception:
+                discard = True
+
+        with self._cond:
+            if discard or self._closed:
+                self._size -= 1
+                self._stats["discarded"] += 1
+            else:
+                created_at = self._created_at.get(id(conn), time.monotonic())
+                self._idle.append([conn, created_at, time.monotonic()])
+            self._cond.notify()
+
+        if discard or self._closed:
+            self._close_quietly(conn)
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """Borrow a connection for the duration of a ``with`` block"""
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+        except Exception:
+            # The connection may have died mid-query; let putconn decide
+            self.putconn(conn)
+            raise
+        else:
+            self.putconn(conn)
+
+    def stats(self) -> Dict:
+        """Snapshot of pool counters for sizing and monitoring"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats["size"] = self._size
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = self._size - len(self._idle)
+            stats["min_size"] = self.min_size
+            stats["max_size"] = self.max_size
+        created = stats["connections_created"]
+        stats["creation_time_avg"] = stats["creation_time_total"] / created if created else 0.0
+        stats["wait_time_avg"] = stats["wait_time_total"] / stats["waits"] if stats["waits"] else 0.0
+        return stats
+
+    def close(self) -> None:
+        """Close every idle connection and refuse further checkouts"""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _, _ in idle:
+            self._close_quietly(conn)
+
+
+async def _ping_async(conn) -> None:
+    async with conn.cursor() as cur:
+        await cur.execute("SELECT 1")
+        await cur.fetchone()
+
+
+class AsyncConnectionPool:
+    """
+    asyncio counterpart of ConnectionPool with the same sizing, recycling,
+    health-check and stats semantics. A pool is bound to the event loop it
+    is first used on.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Awaitable], is_usable: Callable = None,
+                 min_size: int = 1, max_size: int = 5, max_idle: float = 300,
+                 max_lifetime: float = 3600, check_after: float = 30,
+                 checkout_timeout: float = 10, breaker: CircuitBreaker = None):
+        self.name = name
+        # Checkouts fail fast while this source's circuit is open
+        self.breaker = breaker
+        self._factory = factory
+        self._is_usable = is_usable
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.check_after = check_after
+        self.checkout_timeout = checkout_timeout
+
+        self._cond = asyncio.Condition()
+        self._idle = deque()
+        self._size = 0
+        self._closed = False
+        self._created_at = {}
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "timeouts": 0,
+            "connections_created": 0,
+            "connect_errors": 0,
+            "creation_time_total": 0.0,
+            "creation_time_max": 0.0,
+            "health_check_failures": 0,
+            "recycled": 0,
+            "discarded": 0,
+        }
+
+    async def _usable(self, conn) -> bool:
+        try:
+            return self._is_usable is None or await self._is_usable(conn)
+        except Exception:
+            return False
+
+    async def _close_quietly(self, conn) -> None:
+        self._created_at.pop(id(conn), None)
+        try:
+            result = conn.close()
+            if asyncio.iscoroutine(result):
+                await result
+        except Exception:
+            pass
+
+    async def getconn(self, timeout: Optional[float] = None):
+        """Check out a connection, waiting up to ``timeout`` seconds for one to free up"""
+        if self.breaker is not None and self.breaker.is_open():
+            raise SourceUnavailable(self.name, self.breaker.retry_in())
+        if timeout is None:
+            timeout = self.checkout_timeout
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        waited_since = None
+
+        while True:
+            candidate = None
+            stale = []
+            async with self._cond:
+                if self._closed:
+                    raise PoolTimeout(f"Pool '{self.name}' is closed")
+                now = time.monotonic()
+                while self._idle:
+                    conn, created_at, last_used = self._idle.pop()
+                    if (now - last_used > self.max_idle and self._size > self.min_size) or \
+                            now - created_at > self.max_lifetime:
+                        self._size -= 1
+                        self._stats["recycled"] += 1
+                        stale.append(conn)
+                        continue
+                    candidate = (conn, last_used)
+                    break
+
+                if candidate is None:
+                    if self._size < self.max_size:
+                        self._size += 1
+                    else:
+                        if waited_since is None:
+                            waited_since = loop.time()
+                            self._stats["waits"] += 1
+                        remaining = deadline - loop.time()
+                        if remaining <= 0:
+                            self._stats["timeouts"] += 1
+                            raise PoolTimeout(
+                                f"Timed out after {timeout:.1f}s waiting for a '{self.name}' connection"
+                            )
+                        try:
+                            await asyncio.wait_for(self._cond.wait(), remaining)
+                        except asyncio.TimeoutError:
+                            pass
+                        continue
+
+            for conn in stale:
+                await self._close_quietly(conn)
+
+            if candidate is None:
+                started = time.monotonic()
+                try:
+                    conn = await self._factory()
+                except Exception:
+                    async with self._cond:
+                        self._size -= 1
+                        self._stats["connect_errors"] += 1
+                        self._cond.notify()
+                    raise
+                elapsed = time.monotonic() - started
+                self._created_at[id(conn)] = time.monotonic()
+                self._stats["connections_created"] += 1
+                self._stats["creation_time_total"] += elapsed
+                self._stats["creation_time_max"] = max(self._stats["creation_time_max"], elapsed)
+            else:
+                conn, last_used = candidate
+                if time.monotonic() - last_used > self.check_after and not await self._check(conn):
+                    continue
+
+            self._stats["checkouts"] += 1
+            if waited_since is not None:
+                waited = loop.time() - waited_since
+                self._stats["wait_time_total"] += waited
+                self._stats["wait_time_max"] = max(self._stats["wait_time_max"], waited)
+            return conn
+
+    async def _check(self, conn) -> bool:
+        try:
+            if await self._usable(conn):
+                await _ping_async(conn)
+                return True
+        except Exception as e:
+            logger.warning(f"Discarding unhealthy '{self.name}' connection: {e}")
+        async with self._cond:
+            self._size -= 1
+            self._stats["health_check_failures"] += 1
+            self._cond.notify()
+        await self._close_quietly(conn)
+        return False
+
+    async def putconn(self, conn, discard: bool = False) -> None:
+        """Return a checked-out connection to the pool"""
+        if not discard:
+            discard = not await self._usable(conn)
+
+        async with self._cond:
+            discard = discard or self._closed
+            if discard:
+                self._size -= 1
+                self._stats["discarded"] += 1
+            else:
+                created_at = self._created_at.get(id(conn), time.monotonic())
+                self._idle.append([conn, created_at, time.monotonic()])
+            self._cond.notify()
+
+        if discard:
+            await self._close_quietly(conn)
+
+    @asynccontextmanager
+    async def connection(self, timeout: Optional[float] = None):
+        """Borrow a connection for the duration of an ``async with`` block"""
+        conn = await self.getconn(timeout)
+        try:
+            yield conn
+        except asyncio.CancelledError:
+            # A cancelled query leaves the protocol mid-response; never reuse it
+            await self.putconn(conn, discard=True)
+            raise
+        except Exception:
+            await self.putconn(conn)
+            raise
+        else:
+            await self.putconn(conn)
+
+    def stats(self) -> Dict:
+        """Snapshot of pool counters for sizing and monitoring"""
+        stats = dict(self._stats)
+        stats["size"] = self._size
+        stats["idle"] = len(self._idle)
+        stats["in_use"] = self._size - len(self._idle)
+        stats["min_size"] = self.min_size
+        stats["max_size"] = self.max_size
+        created = stats["connections_created"]
+        stats["creation_time_avg"] = stats["creation_time_total"] / created if created else 0.0
+        stats["wait_time_avg"] = stats["wait_time_total"] / stats["waits"] if stats["waits"] else 0.0
+        return stats
+
+    async def close(self) -> None:
+        """Close every idle connection and refuse further checkouts"""
+        async with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _, _ in idle:
+            await self._close_quietly(conn)
+
+
+def _breaker_for(name: str) -> Optional[CircuitBreaker]:
+    # Pools shared by several sources are gated by each source's collector instead
+    return get_breaker(name) if CIRCUIT_BREAKER_CONFIG["enabled"] and name in SOURCES else None
+
+
+def _sends_batches(name: str) -> bool:
+    """Whether a pool serves the collectors, which send MySQL batches as multi-statements"""
+    return name in POOL_NAMES.values()
+
+
+def create_async_pool(name: str, config: Dict) -> AsyncConnectionPool:
+    """Create an asyncio pool for a source (owned by the caller, not shared process-wide)"""
+    if config["db_type"] == "postgresql":
+        factory, is_usable = (lambda: connect_postgres_async(config)), _postgres_is_usable_async
+    else:
+        multi_statements = _sends_batches(name)
+        factory, is_usable = (lambda: connect_mysql_async(config, multi_statements)), _mysql_is_usable_async
+    return AsyncConnectionPool(name, factory, is_usable, breaker=_breaker_for(name), **DB_POOL_CONFIG)
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(name: str, config: Dict) -> ConnectionPool:
+    """Get the process-wide pool for a source, creating it on first use"""
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            if config["db_type"] == "postgresql":
+                factory, is_usable = (lambda: connect_postgres(config)), _postgres_is_usable
+            else:
+                multi_statements = _sends_batches(name)
+                factory, is_usable = (lambda: connect_mysql(config, multi_statements)), _mysql_is_usable
+            pool = ConnectionPool(name, factory, is_usable, breaker=_breaker_for(name), **DB_POOL_CONFIG)
+            _pools[name] = pool
+        return pool
+
+
+def get_all_pool_stats() -> Dict[str, Dict]:
+    """Stats for every pool created in this process"""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {name: pool.stats() for name, pool in pools.items()}
+
+
+def close_all_pools() -> None:
+    """Close every pool (used on shutdown)"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
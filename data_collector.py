@@ -2,581 +2,764 @@
 Data Collector - Collects user activity data from both bots
 """
 import logging
+import threading
+import time
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime, date, timedelta
-from typing import List, Dict, Optional, Tuple
-import psycopg
-import pymysql
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Tuple
 
-from config import DOCKFIY_DB_CONFIG, TEL_BOT_DB_CONFIG, INVOICE_DB_CONFIG, TRAVEL_DB_CONFIG, DOCUMENT_DB_CONFIG
+from config import (
+    COLLECTION_CONFIG, ROLLUP_CONFIG, APPROX_DISTINCT_CONFIG, RESULT_CACHE_CONFIG, CIRCUIT_BREAKER_CONFIG
+)
+from circuit_breaker import SourceUnavailable, get_breaker, get_all_breaker_stats
+from connection_pool import connect_postgres, connect_mysql, fetch_batch, get_pool, get_all_pool_stats, stream_rows
+from schema_registry import schema_registry
+from sources import SOURCES, POOL_NAMES, compile_queries
+from hll import error_bound
+from result_cache import get_result_cache
+from rollup_store import (
+    as_date, get_rollup_store, rollup_period_stats, rollup_retention, rollup_trend_points, rollup_window_stats
+)
 
 logger = logging.getLogger(__name__)
 
+SYSTEMS = tuple(SOURCES)
+PERIODS = ("today", "week", "month")
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Shared worker threads for concurrent per-source collection"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=COLLECTION_CONFIG["max_workers"],
+                thread_name_prefix="collector"
+            )
+        return _executor
+
+# SQL compiled per source from its SourceSpec (see sources.compile_queries).
+# Every predicate compares the bare time column against a half-open range
+# [start, until) so an index on the date/timestamp column stays usable.
+PERIOD_QUERIES = {name: compile_queries(spec)["period"] for name, spec in SOURCES.items()}
+TREND_QUERIES = {name: compile_queries(spec)["trend"] for name, spec in SOURCES.items()}
+# Distinct (day, user) pairs in [%(start)s, %(until)s), used to fill the rollup store
+DAILY_USERS_QUERIES = {name: compile_queries(spec)["daily_users"] for name, spec in SOURCES.items()}
+TOTAL_QUERIES = {name: compile_queries(spec)["total"] for name, spec in SOURCES.items()}
+# Distinct (day, hour, user) triples in [%(start)s, %(until)s), for sources with a time of day
+HOURLY_USERS_QUERIES = {name: compile_queries(spec)["hourly_users"] for name, spec in SOURCES.items() if spec.hourly}
+
+
+def period_params(target_date: date) -> Dict:
+    """Query parameters for PERIOD_QUERIES relative to target_date"""
+    week_start = target_date - timedelta(days=target_date.weekday())
+    month_start = target_date.replace(day=1)
+    return {
+        "today": target_date,
+        "week_start": week_start,
+        "month_start": month_start,
+        # Early in a month the ISO week reaches back into the previous one
+        "scan_start": min(week_start, month_start),
+        "until": target_date + timedelta(days=1)
+    }
+
+
+def trend_params(start_date: date, end_date: date) -> Dict:
+    """Query parameters for TREND_QUERIES covering start_date..end_date inclusive"""
+    return {"start": start_date, "until": end_date + timedelta(days=1)}
+
+
+def span_query(system: str, start: date, end: date) -> Tuple[str, Dict]:
+    """
+    Per-user query for a rollup span: (day, user) rows for the days
+    [start, end], or (day, hour, user) rows for the hours [start, end) when
+    the bounds are datetimes
+    """
+    if isinstance(start, datetime):
+        return HOURLY_USERS_QUERIES[system], {"start": start, "until": end}
+    return DAILY_USERS_QUERIES[system], trend_params(start, end)
+
+
+def streams_span(start: date, end: date) -> bool:
+    """Whether a span is read through a server-side cursor instead of in a batch"""
+    return (end - start).days + 1 > COLLECTION_CONFIG["stream_after_days"]
+
+
+def hour_spans(store, system: str, day: date, now: datetime = None) -> List[Tuple[datetime, datetime]]:
+    """
+    Hour spans to read for a live day: the closed hours the store is missing
+    up to now (reaching back before ``day`` when the last ingest was
+    earlier, e.g. overnight), then the current (open) hour last
+    """
+    current = (now or datetime.now()).replace(minute=0, second=0, microsecond=0)
+    missing = store.missing_hours(system, datetime.combine(day, datetime.min.time()), current)
+    return missing + [(current, current + timedelta(hours=1))]
+
+
+def _period_row_to_stats(row) -> Dict:
+    if not row:
+        return {"today": 0, "week": 0, "month": 0}
+    return {"today": row[0] or 0, "week": row[1] or 0, "month": row[2] or 0}
+
+
+def _trend_rows_to_points(rows) -> List[Dict]:
+    return [
+        {
+            'date': row[0].strftime('%Y-%m-%d'),
+            'unique_users': row[1]
+        }
+        for row in rows
+    ]
+
+
+def combine_stats(results: Dict[str, Dict], unavailable: Dict[str, str], precision: int = None) -> Dict:
+    """
+    Assemble per-source period stats into the combined result with totals and
+    partial flags. ``error_bound`` is the relative 95% bound of HyperLogLog
+    estimates (``precision``), or None when every count is exact.
+    """
+    stats = {
+        system: results.get(system, {"today": None, "week": None, "month": None})
+        for system in SYSTEMS
+    }
+    stats["total"] = {
+        period: sum(stats[system][period] or 0 for system in SYSTEMS)
+        for period in PERIODS
+    }
+    stats["partial"] = bool(unavailable)
+    stats["unavailable"] = unavailable
+    stats["error_bound"] = error_bound(precision) if precision else None
+    return stats
+
+
+def daily_users_to_report(rows, params: Dict, start_date: date, end_date: date) -> Tuple[Dict, List[Dict]]:
+    """
+    Period stats and daily trend points derived from one set of (day, user_id)
+    rows covering both the period scan and the trend window
+    """
+    users_by_day: Dict[date, set] = {}
+    for day, user_id in rows:
+        if user_id is not None:
+            users_by_day.setdefault(as_date(day), set()).add(user_id)
+    
+    def distinct_between(start: date, end: date) -> int:
+        users = set()
+        for day, day_users in users_by_day.items():
+            if start <= day <= end:
+                users |= day_users
+        return len(users)
+    
+    target_date = params["today"]
+    stats = {
+        "today": len(users_by_day.get(target_date, ())),
+        "week": distinct_between(params["week_start"], target_date),
+        "month": distinct_between(params["month_start"], target_date)
+    }
+    points = [
+        {'date': day.strftime('%Y-%m-%d'), 'unique_users': len(users)}
+        for day, users in sorted(users_by_day.items())
+        if start_date <= day <= end_date and users
+    ]
+    return stats, points
+
+
+def combine_trends(results: Dict[str, List[Dict]], unavailable: Dict[str, str]) -> Dict:
+    """Assemble per-source daily series into the combined trends result"""
+    trends = {system: results.get(system, []) for system in SYSTEMS}
+    trends["partial"] = bool(unavailable)
+    trends["unavailable"] = unavailable
+    return trends
+
+
 class DataCollector:
-    def __init__(self):
-        self.dockify_config = DOCKFIY_DB_CONFIG
-        self.tel_bot_config = TEL_BOT_DB_CONFIG
-        self.invoice_config = INVOICE_DB_CONFIG
-        self.travel_config = TRAVEL_DB_CONFIG
-        self.document_config = DOCUMENT_DB_CONFIG
+    def __init__(self, parallel: bool = None, source_deadline: float = None, overall_deadline: float = None,
+                 use_rollups: bool = None, approximate: bool = None, use_cache: bool = None):
+        self.parallel = COLLECTION_CONFIG["parallel"] if parallel is None else parallel
+        self.source_deadline = source_deadline or COLLECTION_CONFIG["source_deadline"]
+        self.overall_deadline = overall_deadline or COLLECTION_CONFIG["overall_deadline"]
+        self.sources = SOURCES
+        self.configs = {system: spec.db_config for system, spec in SOURCES.items()}
+        # Pools are process-wide, so every DataCollector shares the same connections;
+        # MySQL sources on one server also share a pool (see sources.POOL_NAMES)
+        self.pools = {system: get_pool(POOL_NAMES[system], config) for system, config in self.configs.items()}
+        # Closed days come from the local rollup store, only today is read live
+        use_rollups = ROLLUP_CONFIG["enabled"] if use_rollups is None else use_rollups
+        self.rollups = get_rollup_store() if use_rollups else None
+        # Opt-in HyperLogLog estimates for the rollup-served counts
+        approximate = APPROX_DISTINCT_CONFIG["enabled"] if approximate is None else approximate
+        if approximate and not self.rollups:
+            logger.warning("Approximate distinct counts need the rollup store, using exact counts")
+        self.hll_precision = APPROX_DISTINCT_CONFIG["precision"] if approximate and self.rollups else None
+        # Per-source results shared with every other collector in the process
+        use_cache = RESULT_CACHE_CONFIG["enabled"] if use_cache is None else use_cache
+        self.cache = get_result_cache() if use_cache else None
+        # Sources that keep failing are skipped until their circuit half-opens
+        self.breakers = (
+            {system: get_breaker(system) for system in SOURCES} if CIRCUIT_BREAKER_CONFIG["enabled"] else {}
+        )
     
-    def get_dockify_connection(self):
-        """Get PostgreSQL connection for DOCKFIY bot"""
-        try:
-            conn_str = f"postgresql://{self.dockify_config['user']}:{self.dockify_config['password']}@{self.dockify_config['host']}:{self.dockify_config['port']}/{self.dockify_config['database']}"
-            return psycopg.connect(conn_str)
-        except Exception as e:
-            logger.error(f"Failed to connect to DOCKFIY database: {e}")
-            return None
+    def get_pool_stats(self) -> Dict:
+        """Get connection pool statistics (checkouts, waits, creation latency) per source"""
+        return get_all_pool_stats()
     
-    def get_tel_bot_connection(self):
-        """Get MySQL connection for tel-bot"""
-        try:
-            return pymysql.connect(
-                host=self.tel_bot_config['host'],
-                port=int(self.tel_bot_config['port']),
-                user=self.tel_bot_config['user'],
-                password=self.tel_bot_config['password'],
-                database=self.tel_bot_config['database'],
-                charset='utf8mb4'
-            )
-        except Exception as e:
-            logger.error(f"Failed to connect to tel-bot database: {e}")
-            return None
+    def get_cache_stats(self) -> Dict:
+        """Result cache hit / miss counters"""
+        return self.cache.stats() if self.cache else {}
     
-    def get_invoice_connection(self):
-        """Get MySQL connection for invoice system"""
-        try:
-            return pymysql.connect(
-                host=self.invoice_config['host'],
-                port=int(self.invoice_config['port']),
-                user=self.invoice_config['user'],
-                password=self.invoice_config['password'],
-                database=self.invoice_config['database'],
-                charset='utf8mb4'
-            )
-        except Exception as e:
-            logger.error(f"Failed to connect to invoice database: {e}")
-            return None
+    def get_breaker_stats(self) -> Dict:
+        """Circuit state, trips and fast-failed calls per source"""
+        return get_all_breaker_stats()
     
-    def get_travel_connection(self):
-        """Get MySQL connection for travel system"""
-        try:
-            return pymysql.connect(
-                host=self.travel_config['host'],
-                port=int(self.travel_config['port']),
-                user=self.travel_config['user'],
-                password=self.travel_config['password'],
-                database=self.travel_config['database'],
-                charset='utf8mb4'
-            )
-        except Exception as e:
-            logger.error(f"Failed to connect to travel database: {e}")
-            return None
+    def _schema_ok(self, system: str, cur) -> Optional[Dict]:
+        """Cached schema capabilities for a source, or None if required columns are missing"""
+        schema = schema_registry.ensure(system, cur)
+        return None if schema["missing"] else schema
     
-    def get_document_connection(self):
-        """Get PostgreSQL connection for document bot"""
+    def get_connection(self, system: str):
+        """Get a dedicated (unpooled) connection to a source's database"""
+        config = self.configs[system]
         try:
-            conn_str = f"postgresql://{self.document_config['user']}:{self.document_config['password']}@{self.document_config['host']}:{self.document_config['port']}/{self.document_config['database']}"
-            logger.info(f"Connecting to document bot database: {self.document_config['host']}:{self.document_config['port']}/{self.document_config['database']}")
-            conn = psycopg.connect(conn_str)
-            logger.info("Document bot database connection successful")
-            return conn
+            if config["db_type"] == "postgresql":
+                return connect_postgres(config)
+            return connect_mysql(config)
         except Exception as e:
-            logger.error(f"Failed to connect to document database: {e}")
+            logger.error(f"Failed to connect to {system} database: {e}")
             return None
     
-    def get_dockify_stats(self, target_date: date = None) -> Dict:
-        """Get user statistics from DOCKFIY bot"""
+    def get_source_stats(self, system: str, target_date: date = None) -> Dict:
+        """Get today / week / month unique users from one source"""
         if target_date is None:
             target_date = date.today()
         
-        conn = self.get_dockify_connection()
-        if not conn:
-            return {"today": 0, "week": 0, "month": 0}
-        
         try:
-            with conn.cursor() as cur:
-                # Today's unique users
-                cur.execute("""
-                    SELECT COUNT(DISTINCT telegram_id)
-                    FROM user_activity
-                    WHERE activity_date = %s
-                """, (target_date,))
-                result = cur.fetchone()
-                today = result[0] if result else 0
-                
-                # Week's unique users (Monday to today)
-                week_start = target_date - timedelta(days=target_date.weekday())
-                cur.execute("""
-                    SELECT COUNT(DISTINCT telegram_id)
-                    FROM user_activity
-                    WHERE activity_date >= %s AND activity_date <= %s
-                """, (week_start, target_date))
-                result = cur.fetchone()
-                week = result[0] if result else 0
-                
-                # Month's unique users
-                month_start = date(target_date.year, target_date.month, 1)
-                cur.execute("""
-                    SELECT COUNT(DISTINCT telegram_id)
-                    FROM user_activity
-                    WHERE activity_date >= %s AND activity_date <= %s
-                """, (month_start, target_date))
-                result = cur.fetchone()
-                month = result[0] if result else 0
-                
-                return {"today": today, "week": week, "month": month}
-        
+            return self._query_source_stats(system, target_date)
         except Exception as e:
-            logger.error(f"Error getting DOCKFIY stats: {e}")
+            logger.error(f"Error getting {system} stats: {e}")
+            # The schema may have changed under us; re-probe on the next call
+            schema_registry.invalidate(system)
             return {"today": 0, "week": 0, "month": 0}
-        finally:
-            conn.close()
     
-    def get_tel_bot_stats(self, target_date: date = None) -> Dict:
-        """Get user statistics from tel-bot"""
-        if target_date is None:
-            target_date = date.today()
-        
-        conn = self.get_tel_bot_connection()
-        if not conn:
-            return {"today": 0, "week": 0, "month": 0}
-        
+    def get_source_daily_trends(self, system: str, start_date: date, end_date: date) -> List[Dict]:
+        """Get unique users per day from one source"""
         try:
-            with conn.cursor() as cur:
-                # Today's unique users
-                cur.execute("""
-                    SELECT COUNT(DISTINCT telegram_id) as count
-                    FROM user_activity
-                    WHERE activity_date = %s
-                """, (target_date.strftime('%Y-%m-%d'),))
-                result = cur.fetchone()
-                today = result[0] if result else 0
-                
-                # Week's unique users
-                cur.execute("""
-                    SELECT COUNT(DISTINCT telegram_id) as count
-                    FROM user_activity
-                    WHERE activity_date >= DATE_SUB(%s, INTERVAL WEEKDAY(%s) DAY)
-                      AND activity_date <= %s
-                """, (target_date.strftime('%Y-%m-%d'), target_date.strftime('%Y-%m-%d'), target_date.strftime('%Y-%m-%d')))
-                result = cur.fetchone()
-                week = result[0] if result else 0
-                
-                # Month's unique users
-                cur.execute("""
-                    SELECT COUNT(DISTINCT telegram_id) as count
-                    FROM user_activity
-                    WHERE YEAR(activity_date) = %s
-                      AND MONTH(activity_date) = %s
-                """, (target_date.year, target_date.month))
-                result = cur.fetchone()
-                month = result[0] if result else 0
-                
-                return {"today": today, "week": week, "month": month}
-        
+            return self._query_source_trends(system, start_date, end_date)
         except Exception as e:
-            logger.error(f"Error getting tel-bot stats: {e}")
-            return {"today": 0, "week": 0, "month": 0}
-        finally:
-            conn.close()
+            logger.error(f"Error getting {system} daily trends: {e}")
+            # The schema may have changed under us; re-probe on the next call
+            schema_registry.invalidate(system)
+            return []
+    
+    def _query_source_stats(self, system: str, target_date: date) -> Dict:
+        with self.pools[system].connection() as conn, conn.cursor() as cur:
+            schema = self._schema_ok(system, cur)
+            if not schema:
+                return {"today": 0, "week": 0, "month": 0}
+            
+            if all(schema["optional"].values()):
+                # Today / week (Monday to today) / month in a single scan
+                cur.execute(PERIOD_QUERIES[system], period_params(target_date))
+                return _period_row_to_stats(cur.fetchone())
+            
+            # Without its time column the table can only give an all-time total
+            logger.info(f"{schema['table']} missing {self.sources[system].time_column}, using total count")
+            cur.execute(TOTAL_QUERIES[system])
+            result = cur.fetchone()
+            total_users = result[0] if result else 0
+            return {"today": total_users, "week": total_users, "month": total_users}
+    
+    def _query_source_trends(self, system: str, start_date: date, end_date: date) -> List[Dict]:
+        with self.pools[system].connection() as conn, conn.cursor() as cur:
+            schema = self._schema_ok(system, cur)
+            if not schema:
+                return []
+            if not all(schema["optional"].values()):
+                logger.info(f"{schema['table']} missing {self.sources[system].time_column}, cannot generate daily trends")
+                return []
+            cur.execute(TREND_QUERIES[system], trend_params(start_date, end_date))
+            return _trend_rows_to_points(cur.fetchall())
+    
+    # Per-source shortcuts used by the setup and diagnostic scripts
+    def get_dockify_stats(self, target_date: date = None) -> Dict:
+        return self.get_source_stats("dockify", target_date)
+    
+    def get_tel_bot_stats(self, target_date: date = None) -> Dict:
+        return self.get_source_stats("tel_bot", target_date)
     
     def get_invoice_stats(self, target_date: date = None) -> Dict:
-        """Get user statistics from invoice system"""
-        if target_date is None:
-            target_date = date.today()
-        
-        conn = self.get_invoice_connection()
-        if not conn:
-            return {"today": 0, "week": 0, "month": 0}
-        
-        try:
-            with conn.cursor() as cur:
-                # Today's unique users (managers and admins who used the system)
-                cur.execute("""
-                    SELECT COUNT(DISTINCT manager_info_id) as count
-                    FROM history_log
-                    WHERE DATE(date) = %s
-                      AND manager_info_id IS NOT NULL
-                """, (target_date.strftime('%Y-%m-%d'),))
-                result = cur.fetchone()
-                today = result[0] if result else 0
-                
-                # Week's unique users (managers and admins who used the system)
-                cur.execute("""
-                    SELECT COUNT(DISTINCT manager_info_id) as count
-                    FROM history_log
-                    WHERE DATE(date) >= DATE_SUB(%s, INTERVAL WEEKDAY(%s) DAY)
-                      AND DATE(date) <= %s
-                      AND manager_info_id IS NOT NULL
-                """, (target_date.strftime('%Y-%m-%d'), target_date.strftime('%Y-%m-%d'), target_date.strftime('%Y-%m-%d')))
-                result = cur.fetchone()
-                week = result[0] if result else 0
-                
-                # Month's unique users (managers and admins who used the system)
-                cur.execute("""
-                    SELECT COUNT(DISTINCT manager_info_id) as count
-                    FROM history_log
-                    WHERE YEAR(DATE(date)) = %s
-                      AND MONTH(DATE(date)) = %s
-                      AND manager_info_id IS NOT NULL
-                """, (target_date.year, target_date.month))
-                result = cur.fetchone()
-                month = result[0] if result else 0
-                
-                return {"today": today, "week": week, "month": month}
-        
-        except Exception as e:
-            logger.error(f"Error getting invoice stats: {e}")
-            return {"today": 0, "week": 0, "month": 0}
-        finally:
-            conn.close()
+        return self.get_source_stats("invoice", target_date)
     
     def get_travel_stats(self, target_date: date = None) -> Dict:
-        """Get user statistics from travel system"""
+        return self.get_source_stats("travel", target_date)
+    
+    def get_document_stats(self, target_date: date = None) -> Dict:
+        return self.get_source_stats("document", target_date)
+    
+    def get_dockify_connection(self):
+        return self.get_connection("dockify")
+    
+    def get_tel_bot_connection(self):
+        return self.get_connection("tel_bot")
+    
+    def get_document_connection(self):
+        return self.get_connection("document")
+    
+    def get_combined_stats(self, target_date: date = None) -> Dict:
+        """
+        Get combined statistics from all systems
+        
+        Sources that miss their deadline or fail report None for every period
+        and the result is flagged with "partial" and an "unavailable" reason
+        per source. Per-source results are served from the result cache.
+        """
         if target_date is None:
             target_date = date.today()
         
-        conn = self.get_travel_connection()
-        if not conn:
-            return {"today": 0, "week": 0, "month": 0}
+        results, unavailable = self._collect({
+            system: (lambda system=system: self._cached(
+                ("stats", system, target_date, self.hll_precision),
+                lambda: self._guarded(system, lambda: self._load_stats(system, target_date)),
+                target_date
+            ))
+            for system in SYSTEMS
+        })
         
-        try:
-            with conn.cursor() as cur:
-                # Today's unique users (employees who submitted vehicle forms)
-                cur.execute("""
-                    SELECT COUNT(DISTINCT emp_uid) as count
-                    FROM journeys
-                    WHERE DATE(start_time) = %s
-                      AND emp_uid IS NOT NULL
-                """, (target_date.strftime('%Y-%m-%d'),))
-                result = cur.fetchone()
-                today = result[0] if result else 0
-                
-                # Week's unique users
-                cur.execute("""
-                    SELECT COUNT(DISTINCT emp_uid) as count
-                    FROM journeys
-                    WHERE DATE(start_time) >= DATE_SUB(%s, INTERVAL WEEKDAY(%s) DAY)
-                      AND DATE(start_time) <= %s
-                      AND emp_uid IS NOT NULL
-                """, (target_date.strftime('%Y-%m-%d'), target_date.strftime('%Y-%m-%d'), target_date.strftime('%Y-%m-%d')))
-                result = cur.fetchone()
-                week = result[0] if result else 0
-                
-                # Month's unique users
-                cur.execute("""
-                    SELECT COUNT(DISTINCT emp_uid) as count
-                    FROM journeys
-                    WHERE YEAR(DATE(start_time)) = %s
-                      AND MONTH(DATE(start_time)) = %s
-                      AND emp_uid IS NOT NULL
-                """, (target_date.year, target_date.month))
-                result = cur.fetchone()
-                month = result[0] if result else 0
-                
-                return {"today": today, "week": week, "month": month}
+        return combine_stats(results, unavailable, self.hll_precision)
+    
+    def get_daily_trends(self, days: int = 30) -> Dict:
+        """Get daily trends for all systems (missing sources are flagged like get_combined_stats)"""
+        end_date = date.today()
+        start_date = end_date - timedelta(days=days)
         
-        except Exception as e:
-            logger.error(f"Error getting travel stats: {e}")
-            return {"today": 0, "week": 0, "month": 0}
-        finally:
-            conn.close()
+        trends_for = self._get_rollup_trends if self.rollups else self._query_source_trends
+        results, unavailable = self._collect({
+            system: (lambda system=system: self._guarded(system, lambda: trends_for(system, start_date, end_date)))
+            for system in SYSTEMS
+        })
+        
+        return combine_trends(results, unavailable)
     
-    def get_document_stats(self, target_date: date = None) -> Dict:
-        """Get user statistics from document bot"""
-        if target_date is None:
-            target_date = date.today()
+    def get_report_data(self, target_date: date = None, days: int = 30) -> Tuple[Dict, Dict]:
+        """
+        Combined stats and daily trends for a report in one collection pass
         
-        conn = self.get_document_connection()
-        if not conn:
-            return {"today": 0, "week": 0, "month": 0}
+        Each source is read once at daily grain (today's IDs on top of the
+        rollup store, or the whole window live when rollups are off); today,
+        week, month and the daily series are all derived from that result.
         
-        try:
-            with conn.cursor() as cur:
-                # Check if upload_sessions has created_at column
-                cur.execute("""
-                    SELECT column_name 
-                    FROM information_schema.columns 
-                    WHERE table_name = 'upload_sessions' AND column_name = 'created_at'
-                """)
-                has_created_at = cur.fetchone() is not None
-                
-                if has_created_at:
-                    logger.info("Using upload_sessions table with created_at column")
-                    # Today's unique users (users who started upload sessions)
-                    cur.execute("""
-                        SELECT COUNT(DISTINCT user_id) as count
-                        FROM upload_sessions
-                        WHERE DATE(created_at) = %s
-                    """, (target_date,))
-                    result = cur.fetchone()
-                    today = result[0] if result else 0
-                    
-                    # Week's unique users
-                    week_start = target_date - timedelta(days=target_date.weekday())
-                    cur.execute("""
-                        SELECT COUNT(DISTINCT user_id) as count
-                        FROM upload_sessions
-                        WHERE DATE(created_at) >= %s AND DATE(created_at) <= %s
-                    """, (week_start, target_date))
-                    result = cur.fetchone()
-                    week = result[0] if result else 0
-                    
-                    # Month's unique users
-                    month_start = target_date.replace(day=1)
-                    cur.execute("""
-                        SELECT COUNT(DISTINCT user_id) as count
-                        FROM upload_sessions
-                        WHERE DATE(created_at) >= %s AND DATE(created_at) <= %s
-                    """, (month_start, target_date))
-                    result = cur.fetchone()
-                    month = result[0] if result else 0
-                    
-                    logger.info(f"Document bot stats from upload_sessions: today={today}, week={week}, month={month}")
-                    return {"today": today, "week": week, "month": month}
-                
-                else:
-                    logger.info("upload_sessions missing created_at, using total count from upload_sessions")
-                    # upload_sessions table doesn't have created_at, so use total unique users
-                    cur.execute("SELECT COUNT(DISTINCT user_id) FROM upload_sessions")
-                    result = cur.fetchone()
-                    total_users = result[0] if result else 0
-                    logger.info(f"Document bot upload_sessions query result: {total_users}")
-                    
-                    # Since we can't filter by date, return the total for all periods
-                    logger.info(f"Document bot stats from upload_sessions (total): {total_users}")
-                    return {"today": total_users, "week": total_users, "month": total_users}
+        Returns:
+            (stats, trends) shaped like get_combined_stats and get_daily_trends
+        """
+        if target_date is None:
+            target_date = date.today()
+        start_date = target_date - timedelta(days=days)
         
-        except Exception as e:
-            logger.error(f"Error getting document stats: {e}")
-            return {"today": 0, "week": 0, "month": 0}
-        finally:
-            conn.close()
+        results, unavailable = self._collect({
+            system: (lambda system=system: self._cached(
+                ("report", system, target_date, days, self.hll_precision),
+                lambda: self._guarded(system, lambda: self._load_report_data(system, target_date, start_date)),
+                target_date
+            ))
+            for system in SYSTEMS
+        })
+        stats = combine_stats({system: result[0] for system, result in results.items()}, unavailable, self.hll_precision)
+        trends = combine_trends({system: result[1] for system, result in results.items()}, unavailable)
+        return stats, trends
     
-    def get_combined_stats(self, target_date: date = None) -> Dict:
-        """Get combined statistics from both bots"""
+    def get_window_stats(self, window: str = "week", target_date: date = None,
+                         start: date = None, end: date = None) -> Dict[str, Dict]:
+        """
+        Exact unique users per system for any window in user_sets.WINDOWS
+        (today, ISO week, month, rolling 7/28/90 days or a custom range)
+        
+        Answered from the rollup store's per-day user sets without querying the
+        sources. Today counts through the live IDs read by the last stats or
+        trends collection; systems with days missing report "complete": False.
+        """
+        if not self.rollups:
+            logger.warning("Window stats need the rollup store (ROLLUP_ENABLED=false)")
+            return {}
         if target_date is None:
             target_date = date.today()
+        return {
+            system: rollup_window_stats(self.rollups, system, window, target_date, start, end, self.hll_precision)
+            for system in SYSTEMS
+        }
+    
+    def get_range_stats(self, systems: List[str] = None, start: date = None, end: date = None,
+                        grain: str = "day") -> Dict[str, List[Dict]]:
+        """
+        Unique users per bucket of any date range, per system
         
-        dockify_stats = self.get_dockify_stats(target_date)
-        tel_bot_stats = self.get_tel_bot_stats(target_date)
-        invoice_stats = self.get_invoice_stats(target_date)
-        travel_stats = self.get_travel_stats(target_date)
-        document_stats = self.get_document_stats(target_date)
+        ``grain`` is one of user_sets.GRAINS (day, ISO week, month, quarter).
+        Answered from the rollup store's precomputed day and bucket counts in
+        one lookup per bucket, without querying the sources; each bucket is
+        {"bucket", "start", "end", "unique_users", "complete"}.
         
+        Raises:
+            ValueError: for an unknown grain or start after end
+        """
+        if not self.rollups:
+            logger.warning("Range stats need the rollup store (ROLLUP_ENABLED=false)")
+            return {}
+        end = end or date.today()
+        start = start or end
         return {
-            "dockify": dockify_stats,
-            "tel_bot": tel_bot_stats,
-            "invoice": invoice_stats,
-            "travel": travel_stats,
-            "document": document_stats,
-            "total": {
-                "today": dockify_stats["today"] + tel_bot_stats["today"] + invoice_stats["today"] + travel_stats["today"] + document_stats["today"],
-                "week": dockify_stats["week"] + tel_bot_stats["week"] + invoice_stats["week"] + travel_stats["week"] + document_stats["week"],
-                "month": dockify_stats["month"] + tel_bot_stats["month"] + invoice_stats["month"] + travel_stats["month"] + document_stats["month"]
-            }
+            system: self.rollups.bucket_counts(system, start, end, grain)
+            for system in systems or SYSTEMS
         }
     
-    def get_daily_trends(self, days: int = 30) -> Dict:
-        """Get daily trends for both bots"""
-        end_date = date.today()
-        start_date = end_date - timedelta(days=days)
+    def get_retention(self, weeks: int = 12, horizon: int = 8, target_date: date = None) -> Dict[str, Dict]:
+        """
+        Weekly retention cohorts per system (see rollup_store.rollup_retention)
         
-        # Get DOCKFIY trends
-        dockify_trends = self._get_dockify_daily_trends(start_date, end_date)
+        Computed from the rollup store's cached per-day user sets with
+        vectorized set operations instead of self-joins on the sources.
+        """
+        if not self.rollups:
+            logger.warning("Retention cohorts need the rollup store (ROLLUP_ENABLED=false)")
+            return {}
+        target_date = target_date or date.today()
+        return {
+            system: rollup_retention(self.rollups, system, target_date, weeks, horizon)
+            for system in SYSTEMS
+        }
+    
+    def get_intraday(self, target_date: date = None) -> Dict[str, Dict[int, int]]:
+        """
+        Unique users per hour of target_date for sources with hourly rollups
         
-        # Get tel-bot trends
-        tel_bot_trends = self._get_tel_bot_daily_trends(start_date, end_date)
+        Read from the rollup store only; today's hours are as fresh as the
+        last stats or trends collection (the current hour included).
+        """
+        if not self.rollups:
+            return {}
+        target_date = target_date or date.today()
+        return {
+            system: self.rollups.hourly_counts(system, target_date)
+            for system in SYSTEMS if self._hourly(system)
+        }
+    
+    def get_hourly_profile(self, days: int = 30) -> Dict[str, List[float]]:
+        """Average unique users in each hour of the day (0-23) over the last ``days`` days, per hourly source"""
+        if not self.rollups:
+            return {}
+        end = date.today() - timedelta(days=1)
+        start = end - timedelta(days=days - 1)
+        return {
+            system: self.rollups.hour_of_day_profile(system, start, end)
+            for system in SYSTEMS if self._hourly(system)
+        }
+    
+    def ingest_rollups(self, systems: List[str] = None) -> Dict[str, int]:
+        """
+        Background job: pull every closed day since each source's watermark
+        into the rollup store (the first run backfills ROLLUP_CONFIG["backfill_days"]),
+        and every closed hour of the last ROLLUP_CONFIG["hourly_days"] days
+        for sources with hourly rollups
         
-        # Get invoice trends
-        invoice_trends = self._get_invoice_daily_trends(start_date, end_date)
+        Sources sharing a pool are caught up together over one connection,
+        with all their queries in a single batch.
         
-        travel_trends = self._get_travel_daily_trends(start_date, end_date)
+        Returns:
+            Number of days ingested per source
+        """
+        if not self.rollups:
+            return {}
         
-        # Get document trends
-        document_trends = self._get_document_daily_trends(start_date, end_date)
+        yesterday = date.today() - timedelta(days=1)
+        start = yesterday - timedelta(days=ROLLUP_CONFIG["backfill_days"] - 1)
+        ingested = {}
+        for members in self._pool_groups(systems or SYSTEMS):
+            members = [system for system in members if self._breaker_closed(system)]
+            if not members:
+                continue
+            try:
+                ingested.update(self._ingest_sources(members, start, yesterday))
+            except Exception as e:
+                logger.error(f"Error ingesting {'/'.join(members)} rollups: {e}")
+                for system in members:
+                    schema_registry.invalidate(system)
+                    if system in self.breakers:
+                        self.breakers[system].record_failure()
+            else:
+                for system in members:
+                    if system in self.breakers:
+                        self.breakers[system].record_success()
+        return ingested
+    
+    def _pool_groups(self, systems) -> List[List[str]]:
+        """Systems grouped by the pool they share, in report order"""
+        groups: Dict[str, List[str]] = {}
+        for system in systems:
+            groups.setdefault(POOL_NAMES[system], []).append(system)
+        return list(groups.values())
+    
+    def _breaker_closed(self, system: str) -> bool:
+        breaker = self.breakers.get(system)
+        if breaker is not None and breaker.is_open():
+            logger.info(f"Skipping {system}: source unavailable (circuit open)")
+            return False
+        return True
+    
+    def _ingest_sources(self, members: List[str], start_date: date, end_date: date) -> Dict[str, int]:
+        """Catch up the rollups of sources sharing a pool on one connection"""
+        ingested = dict.fromkeys(members, 0)
+        with self.pools[members[0]].connection() as conn:
+            with conn.cursor() as cur:
+                capable = [system for system in members if self._rollup_capable(system, cur)]
+            spans = [
+                (system, start, end)
+                for system in capable
+                for start, end in self.rollups.missing_ranges(system, start_date, end_date)
+            ]
+            current_hour = datetime.now().replace(minute=0, second=0, microsecond=0)
+            first_hour = datetime.combine(current_hour.date() - timedelta(days=ROLLUP_CONFIG["hourly_days"]),
+                                          datetime.min.time())
+            spans += [
+                (system, start, until)
+                for system in capable if self._hourly(system)
+                for start, until in self.rollups.missing_hours(system, first_hour, current_hour)
+            ]
+            with closing(self._fetch_spans(conn, spans)) as fetched:
+                for (system, start, end), rows in fetched:
+                    if isinstance(start, datetime):
+                        self.rollups.ingest_hours(system, rows, start, end)
+                    else:
+                        ingested[system] += self.rollups.ingest(system, rows, start, end)
+        return ingested
+    
+    def _rollup_capable(self, system: str, cur) -> bool:
+        """Whether a source has every column the per-day user queries need"""
+        schema = self._schema_ok(system, cur)
+        return schema is not None and all(schema["optional"].values())
+    
+    def _fetch_spans(self, conn, spans: List[Tuple[str, date, date]]) -> Iterator[Tuple[Tuple, Iterable]]:
+        """
+        Yield ((system, start, end), rows) with the rows of every span, in order
+        (see span_query; datetime bounds select the hourly query)
         
-        return {
-            "dockify": dockify_trends,
-            "tel_bot": tel_bot_trends,
-            "invoice": invoice_trends,
-            "travel": travel_trends,
-            "document": document_trends
-        }
+        Spans of up to COLLECTION_CONFIG["stream_after_days"] days are read
+        together in one batch. Longer ones (backfills, long live windows) are
+        streamed through a server-side cursor, so their rows must be consumed
+        before the next span is taken. Each stream is closed when the next span
+        is taken or this generator is closed, so callers wrap it in
+        contextlib.closing: a connection must not go back to the pool with
+        an unread result or an open cursor transaction.
+        """
+        streamed = {index for index, (_, start, end) in enumerate(spans) if streams_span(start, end)}
+        batched = [index for index in range(len(spans)) if index not in streamed]
+        fetched = dict(zip(batched, fetch_batch(conn, [span_query(*spans[index]) for index in batched]))) if batched else {}
+        for index, span in enumerate(spans):
+            if index in fetched:
+                yield span, fetched[index]
+                continue
+            with closing(stream_rows(conn, *span_query(*span))) as rows:
+                yield span, rows
     
-    def _get_dockify_daily_trends(self, start_date: date, end_date: date) -> List[Dict]:
-        """Get daily trends from DOCKFIY bot"""
-        conn = self.get_dockify_connection()
-        if not conn:
-            return []
+    def _sync_rollups(self, system: str, conn, start_date: date, end_date: date,
+                      fresh_day: date = None) -> Tuple[int, Optional[int]]:
+        """
+        Ingest whatever part of the closed days [start_date, end_date] the store
+        is missing and read fresh_day live in the same batch (one pipelined
+        round-trip on PostgreSQL, see _fetch_spans); fresh_day becomes the
+        store's live day (set_fresh)
         
-        try:
-            with conn.cursor() as cur:
-                cur.execute("""
-                    SELECT 
-                        activity_date,
-                        COUNT(DISTINCT telegram_id) as unique_users
-                    FROM user_activity
-                    WHERE activity_date >= %s AND activity_date <= %s
-                    GROUP BY activity_date
-                    ORDER BY activity_date ASC
-                """, (start_date, end_date))
-                
-                results = cur.fetchall()
-                return [
-                    {
-                        'date': row[0].isoformat(),
-                        'unique_users': row[1]
-                    }
-                    for row in results
-                ]
-        except Exception as e:
-            logger.error(f"Error getting DOCKFIY daily trends: {e}")
-            return []
-        finally:
-            conn.close()
+        For today on a source with hourly rollups only the closed hours not
+        stored yet and the current hour are read, and the day is the union
+        of its hours.
+        
+        Returns:
+            (days ingested, fresh_day's unique users or None)
+        """
+        end_date = min(end_date, date.today() - timedelta(days=1))
+        ranges = self.rollups.missing_ranges(system, start_date, end_date)
+        spans = [(system, start, end) for start, end in ranges]
+        hourly = fresh_day == date.today() and self._hourly(system)
+        if hourly:
+            spans += [(system, start, until) for start, until in hour_spans(self.rollups, system, fresh_day)]
+        elif fresh_day:
+            spans.append((system, fresh_day, fresh_day))
+        ingested = 0
+        fresh = None
+        with closing(self._fetch_spans(conn, spans)) as fetched:
+            for index, ((_, start, end), rows) in enumerate(fetched):
+                if index < len(ranges):
+                    ingested += self.rollups.ingest(system, rows, start, end)
+                elif not hourly:
+                    fresh = self.rollups.set_fresh(system, fresh_day, [row[-1] for row in rows])
+                elif index < len(spans) - 1:
+                    self.rollups.ingest_hours(system, rows, start, end)
+                else:
+                    self.rollups.set_fresh_hour(system, start, [row[-1] for row in rows])
+                    fresh = self.rollups.set_fresh_from_hours(system, fresh_day)
+        return ingested, (len(fresh) if fresh is not None else None)
     
-    def _get_tel_bot_daily_trends(self, start_date: date, end_date: date) -> List[Dict]:
-        """Get daily trends from tel-bot"""
-        conn = self.get_tel_bot_connection()
-        if not conn:
-            return []
+    def _hourly(self, system: str) -> bool:
+        """Whether a source keeps hourly rollups"""
+        return self.rollups is not None and ROLLUP_CONFIG["hourly_days"] > 0 and system in HOURLY_USERS_QUERIES
+    
+    def _guarded(self, system: str, loader: Callable):
+        """
+        Run a raising per-source loader behind the source's circuit breaker
         
+        Refused calls raise SourceUnavailable without touching the database.
+        Errors count as failures, and so do calls slower than the source
+        deadline (the collector has already given up on them by then).
+        """
+        breaker = self.breakers.get(system)
+        if breaker is None:
+            return loader()
+        if not breaker.allow():
+            raise SourceUnavailable(system, breaker.retry_in())
+        started = time.monotonic()
         try:
-            with conn.cursor() as cur:
-                cur.execute("""
-                    SELECT 
-                        activity_date,
-                        COUNT(DISTINCT telegram_id) as unique_users
-                    FROM user_activity
-                    WHERE activity_date >= %s AND activity_date <= %s
-                    GROUP BY activity_date
-                    ORDER BY activity_date ASC
-                """, (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))
-                
-                results = cur.fetchall()
-                return [
-                    {
-                        'date': row[0].strftime('%Y-%m-%d'),
-                        'unique_users': row[1]
-                    }
-                    for row in results
-                ]
-        except Exception as e:
-            logger.error(f"Error getting tel-bot daily trends: {e}")
-            return []
-        finally:
-            conn.close()
+            result = loader()
+        except SourceUnavailable:
+            raise
+        except Exception:
+            breaker.record_failure()
+            raise
+        if time.monotonic() - started > self.source_deadline:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return result
     
-    def _get_invoice_daily_trends(self, start_date: date, end_date: date) -> List[Dict]:
-        """Get daily trends from invoice system"""
-        conn = self.get_invoice_connection()
-        if not conn:
-            return []
-        
+    def _cached(self, key: Tuple, loader: Callable, target_date: date):
+        """Serve a per-source result through the result cache (past dates never expire)"""
+        if self.cache is None:
+            return loader()
+        return self.cache.get_or_load(key, loader, immutable=target_date < date.today())
+    
+    def _load_stats(self, system: str, target_date: date) -> Dict:
+        """
+        Period stats for one source: from the rollup store plus a live read of
+        target_date if it is today, or live when rollups are off. Raises on
+        failure so errors are reported (and never cached) instead of zeros.
+        """
         try:
-            with conn.cursor() as cur:
-                cur.execute("""
-                    SELECT 
-                        DATE(date) as activity_date,
-                        COUNT(DISTINCT manager_info_id) as unique_users
-                    FROM history_log
-                    WHERE DATE(date) >= %s AND DATE(date) <= %s
-                      AND manager_info_id IS NOT NULL
-                    GROUP BY DATE(date)
-                    ORDER BY DATE(date) ASC
-                """, (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))
-                
-                results = cur.fetchall()
-                return [
-                    {
-                        'date': row[0].strftime('%Y-%m-%d'),
-                        'unique_users': row[1]
-                    }
-                    for row in results
-                ]
-        except Exception as e:
-            logger.error(f"Error getting invoice daily trends: {e}")
-            return []
-        finally:
-            conn.close()
+            if not self.rollups:
+                return self._query_source_stats(system, target_date)
+            
+            params = period_params(target_date)
+            with self.pools[system].connection() as conn, conn.cursor() as cur:
+                capable = self._rollup_capable(system, cur)
+                if capable:
+                    fresh_day = target_date if target_date >= date.today() else None
+                    self._sync_rollups(system, conn, params["scan_start"], target_date, fresh_day)
+            if not capable:
+                # e.g. upload_sessions without created_at: the live path has the fallback
+                return self._query_source_stats(system, target_date)
+            return rollup_period_stats(self.rollups, system, params, precision=self.hll_precision)
+        except Exception:
+            # The schema may have changed under us; re-probe on the next call
+            schema_registry.invalidate(system)
+            raise
     
-    def _get_travel_daily_trends(self, start_date: date, end_date: date) -> List[Dict]:
-        """Get daily trends from travel system"""
-        conn = self.get_travel_connection()
-        if not conn:
-            return []
+    def _get_rollup_trends(self, system: str, start_date: date, end_date: date) -> List[Dict]:
+        """Daily trends from the rollup store plus a live count for end_date if it is today (raises on failure)"""
+        fresh_count = None
+        try:
+            with self.pools[system].connection() as conn, conn.cursor() as cur:
+                capable = self._rollup_capable(system, cur)
+                if capable:
+                    fresh_day = end_date if end_date >= date.today() else None
+                    _, fresh_count = self._sync_rollups(system, conn, start_date, end_date, fresh_day)
+            if not capable:
+                return self._query_source_trends(system, start_date, end_date)
+        except Exception:
+            schema_registry.invalidate(system)
+            raise
         
+        return rollup_trend_points(self.rollups, system, start_date, end_date, fresh_count)
+    
+    def _load_report_data(self, system: str, target_date: date, start_date: date) -> Tuple[Dict, List[Dict]]:
+        """
+        One source's period stats and daily trend points from a single
+        daily-grain read (raises on failure, like _load_stats)
+        """
+        params = period_params(target_date)
+        first_day = min(params["scan_start"], start_date)
+        result = None
+        fresh_count = None
         try:
-            with conn.cursor() as cur:
-                cur.execute("""
-                    SELECT 
-                        DATE(start_time) as activity_date,
-                        COUNT(DISTINCT emp_uid) as unique_users
-                    FROM journeys
-                    WHERE DATE(start_time) >= %s AND DATE(start_time) <= %s
-                      AND emp_uid IS NOT NULL
-                    GROUP BY DATE(start_time)
-                    ORDER BY DATE(start_time) ASC
-                """, (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))
-                
-                results = cur.fetchall()
-                return [
-                    {
-                        'date': row[0].strftime('%Y-%m-%d'),
-                        'unique_users': row[1]
-                    }
-                    for row in results
-                ]
-        except Exception as e:
-            logger.error(f"Error getting travel daily trends: {e}")
-            return []
-        finally:
-            conn.close()
+            with self.pools[system].connection() as conn, conn.cursor() as cur:
+                capable = self._rollup_capable(system, cur)
+                if capable and self.rollups:
+                    fresh_day = target_date if target_date >= date.today() else None
+                    _, fresh_count = self._sync_rollups(system, conn, first_day, target_date, fresh_day)
+                elif capable:
+                    # Rows are folded into per-day sets as they stream in
+                    with closing(self._fetch_spans(conn, [(system, first_day, target_date)])) as fetched:
+                        _, rows = next(fetched)
+                        result = daily_users_to_report(rows, params, start_date, target_date)
+            
+            if not capable:
+                # e.g. upload_sessions without created_at: the live paths have the fallbacks
+                result = (self._query_source_stats(system, target_date),
+                          self._query_source_trends(system, start_date, target_date))
+            elif result is None:
+                result = (rollup_period_stats(self.rollups, system, params, precision=self.hll_precision),
+                          rollup_trend_points(self.rollups, system, start_date, target_date, fresh_count))
+        except Exception:
+            schema_registry.invalidate(system)
+            raise
+        
+        if self.cache is not None:
+            # A following get_combined_stats for the same day reuses these stats
+            self.cache.store(("stats", system, target_date, self.hll_precision), result[0],
+                             immutable=target_date < date.today())
+        return result
     
-    def _get_document_daily_trends(self, start_date: date, end_date: date) -> List[Dict]:
-        """Get daily trends from document bot"""
-        conn = self.get_document_connection()
-        if not conn:
-            return []
+    def _collect(self, tasks: Dict[str, Callable]) -> Tuple[Dict, Dict[str, str]]:
+        """
+        Run one collection task per source
         
-        try:
-            with conn.cursor() as cur:
-                # Check if upload_sessions has created_at column
-                cur.execute("""
-                    SELECT column_name 
-                    FROM information_schema.columns 
-                    WHERE table_name = 'upload_sessions' AND column_name = 'created_at'
-                """)
-                has_created_at = cur.fetchone() is not None
-                
-                if has_created_at:
-                    # Use upload_sessions table with timestamps
-                    cur.execute("""
-                        SELECT 
-                            DATE(created_at) as activity_date,
-                            COUNT(DISTINCT user_id) as unique_users
-                        FROM upload_sessions
-                        WHERE DATE(created_at) >= %s AND DATE(created_at) <= %s
-                        GROUP BY DATE(created_at)
-                        ORDER BY DATE(created_at) ASC
-                    """, (start_date, end_date))
-                else:
-                    # upload_sessions doesn't have created_at column, can't generate trends
-                    logger.info("upload_sessions missing created_at, cannot generate daily trends")
-                    return []
-                
-                results = cur.fetchall()
-                return [
-                    {
-                        'date': row[0].strftime('%Y-%m-%d'),
-                        'unique_users': row[1]
-                    }
-                    for row in results
-                ]
-        except Exception as e:
-            logger.error(f"Error getting document daily trends: {e}")
-            return []
-        finally:
-            conn.close()
+        In parallel mode every task is submitted at once, so wall-clock time
+        tracks the slowest source instead of the sum of all of them. Each
+        source gets its own deadline, capped by the overall deadline; a task
+        that misses it is abandoned (its query finishes in the background and
+        the connection goes back to the pool) and reported as unavailable.
+        
+        Returns:
+            (results by source, unavailable reason by source)
+        """
+        if not self.parallel:
+            results = {}
+            unavailable = {}
+            for system, task in tasks.items():
+                try:
+                    results[system] = task()
+                except SourceUnavailable as e:
+                    unavailable[system] = str(e)
+                except Exception as e:
+                    unavailable[system] = f"error: {e}"
+                    logger.error(f"{system} collection failed: {e}")
+            return results, unavailable
+        
+        started = time.monotonic()
+        overall_deadline = started + self.overall_deadline
+        futures = {system: _get_executor().submit(task) for system, task in tasks.items()}
+        
+        results = {}
+        unavailable = {}
+        for system, future in futures.items():
+            deadline = min(started + self.source_deadline, overall_deadline)
+            try:
+                results[system] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                future.cancel()
+                waited = time.monotonic() - started
+                unavailable[system] = f"timed out after {waited:.1f}s"
+                logger.warning(f"{system} collection missed its deadline after {waited:.1f}s, returning partial results")
+            except SourceUnavailable as e:
+                unavailable[system] = str(e)
+            except Exception as e:
+                unavailable[system] = f"error: {e}"
+                logger.error(f"{system} collection failed: {e}")
+        
+        return results, unavailable
@@ -0,0 +1,99 @@
+"""
+HyperLogLog - Mergeable approximate distinct counting over user-ID arrays
+"""
+import math
+import zlib
+
+import numpy as np
+
+_U64 = np.uint64
+
+
+def _mix64(ids: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer: spreads int64 user IDs over 64 uniform bits"""
+    x = ids.astype(np.int64).view(np.uint64).copy()
+    with np.errstate(over="ignore"):
+        x ^= x >> _U64(30)
+        x *= _U64(0xBF58476D1CE4E5B9)
+        x ^= x >> _U64(27)
+        x *= _U64(0x94D049BB133111EB)
+        x ^= x >> _U64(31)
+    return x
+
+
+def _bit_length(x: np.ndarray) -> np.ndarray:
+    """Exact bit length of every element of a uint64 array"""
+    x = x.copy()
+    length = np.zeros(x.shape, dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = x >= (_U64(1) << _U64(shift))
+        length[high] += shift
+        x[high] >>= _U64(shift)
+    length += (x > 0).astype(np.uint8)
+    return length
+
+
+def relative_error(precision: int) -> float:
+    """Standard error of an estimate, as a fraction of the count"""
+    return 1.04 / math.sqrt(1 << precision)
+
+
+def error_bound(precision: int) -> float:
+    """Relative error bound at ~95% confidence (two standard errors)"""
+    return 2 * relative_error(precision)
+
+
+class HyperLogLog:
+    """
+    HyperLogLog sketch with 2**precision one-byte registers. Sketches of the
+    same precision merge by taking the register-wise maximum, so a window's
+    estimate is the merge of its day sketches.
+    """
+
+    def __init__(self, precision: int = 14, registers: np.ndarray = None):
+        if not 4 <= precision <= 18:
+            raise ValueError("HyperLogLog precision must be between 4 and 18")
+        self.precision = precision
+        self.registers = registers if registers is not None else np.zeros(1 << precision, dtype=np.uint8)
+
+    @classmethod
+    def from_ids(cls, ids: np.ndarray, precision: int = 14) -> "HyperLogLog":
+        sketch = cls(precision)
+        sketch.add_ids(ids)
+        return sketch
+
+    def add_ids(self, ids: np.ndarray) -> None:
+        """Add an array of int64 user IDs"""
+        if len(ids) == 0:
+            return
+        hashed = _mix64(np.asarray(ids))
+        index = (hashed >> _U64(64 - self.precision)).astype(np.intp)
+        rest = hashed & ((_U64(1) << _U64(64 - self.precision)) - _U64(1))
+        rank = (64 - self.precision + 1 - _bit_length(rest).astype(np.int16)).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """Union with another sketch in place"""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self) -> int:
+        """Estimated number of distinct IDs added"""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / float(np.sum(np.ldexp(1.0, -self.registers.astype(np.int32))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is far more accurate for small cardinalities
+            return int(round(m * math.log(m / zeros)))
+        return int(round(raw))
+
+    def to_bytes(self) -> bytes:
+        return zlib.compress(self.registers.tobytes(), 6)
+
+    @classmethod
+    def from_bytes(cls, blob: bytes, precision: int) -> "HyperLogLog":
+        registers = np.frombuffer(zlib.decompress(blob), dtype=np.uint8).copy()
+        return cls(precision, registers)
@@ -0,0 +1,110 @@
+"""
+Render Service - Report layout in warm worker processes, off the bot's GIL
+"""
+import io
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from config import RENDER_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# The worker process's generator, created once by _warm_worker
+_generator = None
+
+
+def _warm_worker() -> None:
+    """
+    Process initializer: import ReportLab and the report module, compile the
+    report template and render a throwaway page, so fonts, styles and chart
+    modules are loaded before the first real job arrives
+    """
+    global _generator
+    from reportlab.platypus import Paragraph, SimpleDocTemplate
+    from report_generator import ConsolidatedReportGenerator
+    from report_template import report_template
+
+    _generator = ConsolidatedReportGenerator(use_cache=False)
+    SimpleDocTemplate(io.BytesIO()).build([Paragraph("warm-up", report_template().normal)])
+
+
+def _ready() -> bool:
+    return _generator is not None
+
+
+def _render_job(report_type: str, stats: Dict, trends: Dict, hourly: Dict, retention: Dict,
+                anomalies: List[Dict]) -> bytes:
+    """Lay out one report in the worker and return the PDF bytes"""
+    buffer = io.BytesIO()
+    _generator._render(buffer, report_type, stats, trends, hourly, retention, anomalies)
+    return buffer.getvalue()
+
+
+class RenderService:
+    """
+    A pool of ``processes`` worker processes that render reports from
+    already collected data. Layout is CPU-bound, so each report renders on
+    its own core while the bot process only waits on a future; workers are
+    spawned (not forked from the threaded bot) and warmed up at start.
+    """
+
+    def __init__(self, processes: int = None):
+        self.processes = processes or RENDER_CONFIG["processes"]
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_worker
+        )
+
+    def warm(self) -> None:
+        """Start every worker now instead of on the first reports"""
+        for future in [self._executor.submit(_ready) for _ in range(self.processes)]:
+            future.result()
+        logger.info(f"Render service ready with {self.processes} worker processes")
+
+    def submit(self, report_type: str, stats: Dict, trends: Dict, hourly: Dict, retention: Dict,
+               anomalies: List[Dict]) -> Future:
+        """Queue a render job; the future resolves to the PDF bytes"""
+        return self._executor.submit(_render_job, report_type, stats, trends, hourly, retention, anomalies)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_service = None
+_service_failed = False
+_service_lock = threading.Lock()
+
+
+def get_render_service() -> Optional[RenderService]:
+    """
+    Process-wide render service, or None to render in-process: when
+    RENDER_PROCESSES is 0 or the workers could not be started
+    """
+    global _service, _service_failed
+    if RENDER_CONFIG["processes"] <= 0:
+        return None
+    with _service_lock:
+        if _service is None and not _service_failed:
+            service = RenderService()
+            try:
+                service.warm()
+            except Exception as e:
+                logger.error(f"Could not start render workers, rendering in-process: {e}")
+                service.close()
+                _service_failed = True
+            else:
+                _service = service
+        return _service
+
+
+def close_render_service() -> None:
+    """Stop the worker processes (used on shutdown)"""
+    global _service
+    with _service_lock:
+        if _service is not None:
+            _service.close()
+            _service = None
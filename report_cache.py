@@ -0,0 +1,144 @@
+"""
+Report Cache - Content-addressed, size-bounded cache of rendered PDF reports
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from config import REPORT_CACHE_CONFIG, REPORTS_DIR
+
+logger = logging.getLogger(__name__)
+
+
+def content_key(*parts) -> str:
+    """
+    SHA-256 of the parts in a normalized JSON form (sorted keys, dates and
+    other non-JSON values as strings), so equal inputs always hash alike
+    """
+    normalized = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class ReportCache:
+    """
+    Rendered reports stored as ``<key>.pdf``, where the key hashes every
+    input of the rendering (see content_key). A file's modification time is
+    its last use: hits touch it and the least recently used files are
+    deleted once the directory grows past ``max_bytes``.
+    """
+
+    def __init__(self, directory: str = None, max_bytes: int = None):
+        self.directory = Path(directory or Path(REPORTS_DIR) / "cache")
+        self.max_bytes = max_bytes or REPORT_CACHE_CONFIG["max_mb"] * 1024 * 1024
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path_for(self, key: str) -> Path:
+        return self.directory / f"{key}.pdf"
+
+    def get(self, key: str) -> Optional[Path]:
+        """Cached file for key (marked as just used), or None"""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def put(self, key: str, render: Callable[[str], None]) -> Path:
+        """Render into a temporary file, move it into place atomically and evict old entries"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.path_for(key)
+        temporary = self.directory / f".{key}.{uuid.uuid4().hex}.tmp"
+        try:
+            render(str(temporary))
+            os.replace(temporary, path)
+        finally:
+            temporary.unlink(missing_ok=True)
+        self._evict(keep=path)
+        return path
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        """Content of the cached report for key, or None"""
+        path = self.get(key)
+        if path is None:
+            return None
+        try:
+            return path.read_bytes()
+        except FileNotFoundError:
+            # Evicted between the lookup and the read
+            return None
+
+    def put_bytes(self, key: str, pdf: bytes) -> Path:
+        return self.put(key, lambda path: Path(path).write_bytes(pdf))
+
+    def get_or_render(self, key: str, render: Callable[[str], None]) -> Path:
+        return self.get(key) or self.put(key, render)
+
+    def _evict(self, keep: Path) -> None:
+        """Delete least recently used reports until the cache fits in max_bytes"""
+        with self._lock:
+            entries = []
+            for path in self.directory.glob("*.pdf"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    path.unlink()
+                except OSError as e:
+                    # e.g. still open for sending on Windows; retried on the next eviction
+                    logger.warning(f"Could not evict cached report {path.name}: {e}")
+                    continue
+                total -= size
+                self.evictions += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions
+            }
+
+
+def link_or_copy(source: Path, target: Path) -> None:
+    """Give target the content of source: a hard link when the filesystem allows, else a copy"""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_report_cache() -> ReportCache:
+    """Process-wide report cache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ReportCache()
+        return _cache
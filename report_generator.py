@@ -1,46 +1,141 @@
 """
 Report Generator - Creates consolidated PDF reports for both bots
 """
+import asyncio
+import io
 import os
 import logging
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, date
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+from xml.sax.saxutils import escape
 
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import inch
 from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
+from reportlab.platypus import SimpleDocTemplate, Table, Paragraph, Spacer, PageBreak
 from reportlab.pdfgen import canvas
 from reportlab.graphics.shapes import Drawing
 from reportlab.graphics.charts.linecharts import HorizontalLineChart
+from reportlab.graphics.charts.legends import Legend
 from reportlab.graphics import renderPDF
 
-from config import SYSTEM_NAMES, REPORTS_DIR
-from data_collector import DataCollector
+from config import SYSTEM_NAMES, REPORTS_DIR, REPORT_CACHE_CONFIG, REPORT_ARCHIVE_CONFIG, TREND_CONFIG
+from anomalies import detect_anomalies
+from data_collector import DataCollector, SYSTEMS
+from async_data_collector import AsyncDataCollector
+from report_cache import content_key, get_report_cache, link_or_copy
+from report_template import report_template, retention_layout
+from trend_series import chart_points, trend_grain
+from render_service import close_render_service, get_render_service
 
 logger = logging.getLogger(__name__)
 
+# Part of every cached report's key: bump it whenever the layout changes so
+# reports rendered with the old template are not served again
+TEMPLATE_VERSION = "1"
+
+
+# Trend line colour per system (systems without one use the first)
+SYSTEM_COLORS = {
+    "dockify": '#3B82F6',
+    "tel_bot": '#10B981',
+    "invoice": '#F59E0B',
+    "travel": '#10B981',
+    "document": '#8B5CF6'
+}
+
+
+# Chart title and x-axis date format per trend grain
+GRAIN_TITLES = {
+    "day": ("Daily Active Users", '%m/%d'),
+    "week": ("Average Daily Active Users per Week", '%m/%d'),
+    "month": ("Average Daily Active Users per Month", '%b %Y')
+}
+
+
+def trend_days(report_type: str) -> int:
+    """Days of daily trends a report type covers (TREND_CONFIG; weekly's for unknown types)"""
+    return TREND_CONFIG["days"].get(report_type, TREND_CONFIG["days"]["weekly"])
+
+
+def system_name(system: str) -> str:
+    """Display name of a system, falling back to its registry key"""
+    return SYSTEM_NAMES.get(system, system)
+
+
+def format_count(value: Optional[int], error_bound: Optional[float] = None) -> str:
+    """
+    Format a unique-user count, showing n/a for sources that did not respond
+    and the relative error bound next to approximate (HyperLogLog) counts
+    """
+    if value is None:
+        return "n/a"
+    if error_bound and value:
+        return f"{value} ±{error_bound:.1%}"
+    return str(value)
+
+
+def describe_error_bound(error_bound: float) -> str:
+    """Note explaining approximate counts"""
+    return f"Counts are HyperLogLog estimates, within ±{error_bound:.1%} at 95% confidence"
+
+
+def describe_unavailable(unavailable: Dict[str, str]) -> str:
+    """
+    One-line summary of the sources missing from a partial result
+
+    Reasons are raw error text: escape them for the markup they go into.
+    """
+    return ", ".join(f"{system_name(system)} {reason}" for system, reason in unavailable.items())
+
+
+def describe_anomaly(anomaly: Dict) -> str:
+    """One-line explanation of a flagged day from anomalies.detect_anomalies"""
+    users = anomaly["unique_users"]
+    expected = anomaly["expected"]
+    if anomaly["kind"] == "zero":
+        return f"no active users (usually ~{expected:.0f}), possible outage"
+    if anomaly["kind"] in ("spike", "dip"):
+        direction = "above" if anomaly["kind"] == "spike" else "below"
+        return f"{users} users, well {direction} the usual ~{expected:.0f}"
+    return f"{users} users, last 7 days {anomaly['change']:+.0%} vs the week before"
+
+
 class ConsolidatedReportGenerator:
-    def __init__(self):
-        self.data_collector = DataCollector()
-        
-    def generate_report(self, report_type: str = "weekly") -> str:
+    def __init__(self, use_cache: bool = None):
+        self._data_collector = None
+        use_cache = REPORT_CACHE_CONFIG["enabled"] if use_cache is None else use_cache
+        self.cache = get_report_cache() if use_cache else None
+    
+    @property
+    def data_collector(self) -> DataCollector:
+        """Created on first use; rendering alone (e.g. in a render worker) needs no database"""
+        if self._data_collector is None:
+            self._data_collector = DataCollector()
+        return self._data_collector
+        
+    def generate_report(self, report_type: str = "weekly", stats: Dict = None, trends: Dict = None,
+                        hourly: Dict = None, retention: Dict = None) -> str:
         """
-        Generate a consolidated monitoring PDF report
+        Generate a consolidated monitoring PDF report as a file
+        
+        Rendering is deterministic (no timestamps in the PDF), so with the
+        report cache on, identical inputs reuse the PDF rendered for them before.
         
         Args:
-            report_type: Type of report ("weekly" or "monthly")
+            report_type: Type of report ("weekly", "monthly", "quarterly" or "yearly")
+            stats: Pre-collected combined stats (collected here if omitted)
+            trends: Pre-collected daily trends (collected here if omitted)
+            hourly: Pre-collected hour-of-day profile (collected here if omitted)
+            retention: Pre-collected weekly retention cohorts (collected here if omitted)
             
         Returns:
-            str: Path to the generated PDF file
+            str: Path to the generated PDF file (the caller's to delete)
         """
         try:
-            # Fetch data from both bots
-            stats = self.data_collector.get_combined_stats()
-            trends = self.data_collector.get_daily_trends(30)
+            stats, trends, hourly, retention, anomalies = self._report_inputs(report_type, stats, trends, hourly, retention)
             
             # Create reports directory if it doesn't exist
             reports_path = Path(REPORTS_DIR)
@@ -51,62 +146,147 @@ class ConsolidatedReportGenerator:
             filename = f"consolidated_monitoring_report_{report_type}_{timestamp}.pdf"
             filepath = reports_path / filename
             
-            # Create PDF document
-            doc = SimpleDocTemplate(
-                str(filepath),
-                pagesize=A4,
-                rightMargin=50,
-                leftMargin=50,
-                topMargin=50,
-                bottomMargin=50
-            )
-            
-            # Build PDF content
-            story = []
+            def render(path: str) -> None:
+                self._render(path, report_type, stats, trends, hourly, retention, anomalies)
             
-            # Page 1: Usage Statistics Tables
-            story.extend(self._create_page1_tables(stats, report_type))
+            if self.cache is None:
+                render(str(filepath))
+                logger.info(f"Consolidated monitoring report generated: {filepath}")
+            else:
+                key = content_key(TEMPLATE_VERSION, TREND_CONFIG, report_type, stats, trends, hourly, retention, anomalies)
+                # The caller gets its own link to the cached file, so deleting it after sending is safe
+                link_or_copy(self.cache.get_or_render(key, render), filepath)
+                logger.info(f"Consolidated monitoring report {key[:12]} ready: {filepath} "
+                            f"(cache: {self.cache.stats()})")
+            return str(filepath)
             
-            # Page 2: Line Graphs
-            story.append(PageBreak())
-            story.extend(self._create_page2_graphs(trends))
+        except Exception as e:
+            logger.error(f"Error generating consolidated monitoring report: {e}")
+            raise
+    
+    def render_report(self, report_type: str = "weekly", stats: Dict = None, trends: Dict = None,
+                      hourly: Dict = None, retention: Dict = None) -> bytes:
+        """
+        Generate a consolidated monitoring PDF report in memory
+        
+        Same inputs as generate_report, but the PDF is built into a buffer and
+        returned as bytes, ready for send_document; nothing touches the disk
+        except the report cache and, when REPORT_ARCHIVE_ENABLED is set, a
+        copy written to the archive directory. Layout runs in the render
+        service's worker processes unless RENDER_PROCESSES is 0.
+        
+        Returns:
+            bytes: The PDF document
+        """
+        try:
+            stats, trends, hourly, retention, anomalies = self._report_inputs(report_type, stats, trends, hourly, retention)
             
-            # Build the PDF
-            doc.build(story)
+            key = content_key(TEMPLATE_VERSION, TREND_CONFIG, report_type, stats, trends, hourly, retention, anomalies)
+            pdf = self.cache.get_bytes(key) if self.cache else None
+            if pdf is None:
+                pdf = self._render_bytes(report_type, stats, trends, hourly, retention, anomalies)
+                if self.cache:
+                    self.cache.put_bytes(key, pdf)
+            logger.info(f"Consolidated monitoring report {key[:12]} rendered in memory ({len(pdf)} bytes)")
             
-            logger.info(f"Consolidated monitoring report generated: {filepath}")
-            return str(filepath)
+            if REPORT_ARCHIVE_CONFIG["enabled"]:
+                self._archive(report_type, pdf)
+            return pdf
             
         except Exception as e:
             logger.error(f"Error generating consolidated monitoring report: {e}")
             raise
     
-    def _create_page1_tables(self, stats: Dict, report_type: str) -> List:
-        """Create Page 1 content with usage statistics tables"""
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        # Title
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#000000'),
-            spaceAfter=12,
-            alignment=TA_CENTER
+    def _render_bytes(self, report_type: str, stats: Dict, trends: Dict, hourly: Dict,
+                      retention: Dict, anomalies: List[Dict]) -> bytes:
+        """PDF bytes from a render worker process, or rendered here when the service is off"""
+        service = get_render_service()
+        if service is not None:
+            try:
+                return service.submit(report_type, stats, trends, hourly, retention, anomalies).result()
+            except BrokenProcessPool as e:
+                # A worker died; start fresh ones on the next report and render this one here
+                logger.error(f"Render worker failed, rendering in-process: {e}")
+                close_render_service()
+        buffer = io.BytesIO()
+        self._render(buffer, report_type, stats, trends, hourly, retention, anomalies)
+        return buffer.getvalue()
+    
+    def _report_inputs(self, report_type: str, stats: Dict, trends: Dict, hourly: Dict, retention: Dict):
+        """Fetch whatever report data the caller did not pass, plus the flagged days"""
+        days = trend_days(report_type)
+        if stats is None and trends is None:
+            stats, trends = self.data_collector.get_report_data(days=days)
+        elif stats is None:
+            stats = self.data_collector.get_combined_stats()
+        elif trends is None:
+            trends = self.data_collector.get_daily_trends(days)
+        if hourly is None:
+            hourly = self.data_collector.get_hourly_profile(30)
+        if retention is None:
+            retention = self.data_collector.get_retention()
+        return stats, trends, hourly, retention, detect_anomalies(trends)
+    
+    def _archive(self, report_type: str, pdf: bytes) -> None:
+        """Keep a timestamped copy of a sent report; failures are logged, never raised"""
+        try:
+            archive_path = Path(REPORT_ARCHIVE_CONFIG["dir"])
+            archive_path.mkdir(parents=True, exist_ok=True)
+            timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+            filepath = archive_path / f"consolidated_monitoring_report_{report_type}_{timestamp}.pdf"
+            filepath.write_bytes(pdf)
+            logger.info(f"Report archived: {filepath}")
+        except Exception as e:
+            logger.error(f"Error archiving {report_type} report: {e}")
+    
+    def _render(self, path, report_type: str, stats: Dict, trends: Dict, hourly: Dict,
+                retention: Dict, anomalies: List[Dict]) -> None:
+        """
+        Lay out and write the PDF to a path or file-like buffer; invariant mode
+        keeps timestamps and IDs out of the file
+        """
+        doc = SimpleDocTemplate(
+            path,
+            pagesize=A4,
+            rightMargin=50,
+            leftMargin=50,
+            topMargin=50,
+            bottomMargin=50,
+            invariant=True
         )
         
-        subtitle_style = ParagraphStyle(
-            'CustomSubtitle',
-            parent=styles['Normal'],
-            fontSize=14,
-            textColor=colors.HexColor('#000000'),
-            spaceAfter=30,
-            alignment=TA_CENTER
-        )
+        # Build PDF content
+        story = []
+        
+        # Page 1: Usage Statistics Tables
+        story.extend(self._create_page1_tables(stats, report_type))
+        
+        # Page 2: Line Graphs
+        story.append(PageBreak())
+        story.extend(self._create_page2_graphs(trends, hourly, anomalies, trend_days(report_type)))
         
-        elements.append(Paragraph("Usage Counts", title_style))
-        elements.append(Paragraph(f"Consolidated {report_type.title()} Report (Daily / Weekly / Monthly)", subtitle_style))
+        # Page 3: Retention Cohorts (rollup store only)
+        if retention:
+            story.append(PageBreak())
+            story.extend(self._create_page3_retention(retention))
+        
+        doc.build(story)
+    
+    def _create_page1_tables(self, stats: Dict, report_type: str) -> List:
+        """Create Page 1 content with usage statistics tables"""
+        elements = []
+        template = report_template()
+        
+        elements.append(Paragraph("Usage Counts", template.title))
+        elements.append(Paragraph(f"Consolidated {report_type.title()} Report (Daily / Weekly / Monthly)", template.subtitle))
+        if stats.get("partial"):
+            elements.append(Paragraph(
+                f"<b>Partial data:</b> {escape(describe_unavailable(stats['unavailable']))}. "
+                "Totals only include the systems that responded.",
+                template.normal
+            ))
+        if stats.get("error_bound"):
+            elements.append(Paragraph(describe_error_bound(stats["error_bound"]) + ".", template.normal))
         elements.append(Spacer(1, 0.3*inch))
         
         # Today's Table
@@ -135,158 +315,173 @@ class ConsolidatedReportGenerator:
         return elements
     
     def _create_section_table(self, title: str, stats: Dict, period: str) -> Table:
-        """Create a single usage statistics table section"""
-        styles = getSampleStyleSheet()
-        
-        # Section title
-        section_title_style = ParagraphStyle(
-            'SectionTitle',
-            parent=styles['Heading2'],
-            fontSize=16,
-            textColor=colors.HexColor('#000000'),
-            spaceAfter=12
-        )
+        """Create a single usage statistics table section (only the cells come from the data)"""
+        template = report_template()
         
         # Prepare table data
-        dockify_count = stats["dockify"][period]
-        tel_bot_count = stats["tel_bot"][period]
-        invoice_count = stats["invoice"][period]
-        travel_count = stats["travel"][period]
-        document_count = stats["document"][period]
-        total_count = stats["total"][period]
-        
+        bound = stats.get("error_bound")
         data = [
-            [Paragraph("<b>System</b>", styles['Normal']), 
-             Paragraph("<b>Unique Users</b>", styles['Normal'])],
-            [SYSTEM_NAMES["dockify"], str(dockify_count)],
-            [SYSTEM_NAMES["tel_bot"], str(tel_bot_count)],
-            [SYSTEM_NAMES["invoice"], str(invoice_count)],
-            [SYSTEM_NAMES["travel"], str(travel_count)],
-            [SYSTEM_NAMES["document"], str(document_count)],
-            [Paragraph("<b>TOTAL</b>", styles['Normal']), 
-             Paragraph(f"<b>{total_count}</b>", styles['Normal'])]
+            [Paragraph(header, template.normal) for header in template.section_header],
+            *[[system_name(system), format_count(stats[system][period], bound)] for system in SYSTEMS],
+            [Paragraph("<b>TOTAL</b>", template.normal), 
+             Paragraph(f"<b>{format_count(stats['total'][period], bound)}</b>", template.normal)]
         ]
         
-        # Create table
-        table = Table(data, colWidths=[3.5*inch, 2*inch])
-        
-        # Style the table
-        table.setStyle(TableStyle([
-            # Header row
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#F0F0F0')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-            ('ALIGN', (0, 0), (-1, 0), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('TOPPADDING', (0, 0), (-1, 0), 12),
-            
-            # Data rows
-            ('ALIGN', (0, 1), (0, -2), 'LEFT'),
-            ('ALIGN', (1, 1), (1, -2), 'RIGHT'),
-            ('FONTNAME', (0, 1), (-1, -2), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -2), 12),
-            ('BOTTOMPADDING', (0, 1), (-1, -2), 10),
-            ('TOPPADDING', (0, 1), (-1, -2), 10),
-            
-            # Total row
-            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#E8E8E8')),
-            ('ALIGN', (0, -1), (0, -1), 'LEFT'),
-            ('ALIGN', (1, -1), (1, -1), 'RIGHT'),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, -1), (-1, -1), 12),
-            ('BOTTOMPADDING', (0, -1), (-1, -1), 10),
-            ('TOPPADDING', (0, -1), (-1, -1), 10),
-            
-            # Grid
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ]))
+        table = Table(data, colWidths=list(template.section_col_widths))
+        table.setStyle(template.section_table)
         
         # Add section title before table
-        title_para = Paragraph(f"<b>{title}</b>", section_title_style)
+        title_para = Paragraph(f"<b>{title}</b>", template.section_title)
         
         # Return as a combined element
-        return Table([[title_para], [table]], colWidths=[5.5*inch])
+        return Table([[title_para], [table]], colWidths=[template.section_width])
     
-    def _create_page2_graphs(self, trends: Dict) -> List:
-        """Create Page 2 content with line graphs"""
+    def _create_page2_graphs(self, trends: Dict, hourly: Dict = None, anomalies: List[Dict] = None,
+                             days: int = 30) -> List:
+        """Create Page 2 content with line graphs of the last ``days`` days"""
         elements = []
-        styles = getSampleStyleSheet()
-        
-        # Title
-        title_style = ParagraphStyle(
-            'GraphTitle',
-            parent=styles['Heading1'],
-            fontSize=20,
-            textColor=colors.HexColor('#000000'),
-            spaceAfter=30,
-            alignment=TA_CENTER
-        )
+        template = report_template()
+        section_title = template.graph_section_title
         
-        elements.append(Paragraph("Usage Trends", title_style))
+        elements.append(Paragraph("Usage Trends", template.graph_title))
         elements.append(Spacer(1, 0.3*inch))
         
-        # System Graphs
-        section_title = ParagraphStyle(
-            'GraphSectionTitle',
-            parent=styles['Heading2'],
-            fontSize=14,
-            textColor=colors.HexColor('#000000'),
-            spaceAfter=12
-        )
-        
-        # DOCKFIY Bot Graph
-        elements.append(Paragraph(f"<b>{SYSTEM_NAMES['dockify']} - Daily Active Users (Last 30 Days)</b>", section_title))
-        if trends["dockify"] and len(trends["dockify"]) > 0:
-            elements.append(self._create_line_chart(trends["dockify"], colors.HexColor('#3B82F6')))
+        # Days that stand out from each system's recent baseline
+        elements.append(Paragraph("<b>Anomalies</b>", section_title))
+        if anomalies is None:
+            anomalies = detect_anomalies(trends)
+        if anomalies:
+            elements.append(self._create_anomaly_table(anomalies))
         else:
-            elements.append(Paragraph("No data available", styles['Normal']))
-        
+            elements.append(Paragraph("No unusual days in this period.", template.normal))
         elements.append(Spacer(1, 0.3*inch))
         
-        # Tel-Bot Graph
-        elements.append(Paragraph(f"<b>{SYSTEM_NAMES['tel_bot']} - Daily Active Users (Last 30 Days)</b>", section_title))
-        if trends["tel_bot"] and len(trends["tel_bot"]) > 0:
-            elements.append(self._create_line_chart(trends["tel_bot"], colors.HexColor('#10B981')))
-        else:
-            elements.append(Paragraph("No data available", styles['Normal']))
+        grain = trend_grain(days)
+        chart_title = GRAIN_TITLES[grain][0]
+        for index, system in enumerate(SYSTEMS):
+            if index:
+                elements.append(Spacer(1, 0.3*inch))
+            elements.append(Paragraph(f"<b>{system_name(system)} - {chart_title} (Last {days} Days)</b>", section_title))
+            if system in trends.get("unavailable", {}):
+                elements.append(Paragraph(f"Source unavailable ({escape(trends['unavailable'][system])})", template.normal))
+            elif trends[system]:
+                color = SYSTEM_COLORS.get(system, SYSTEM_COLORS["dockify"])
+                elements.append(self._create_line_chart(trends[system], colors.HexColor(color), grain))
+            else:
+                elements.append(Paragraph("No data available", template.normal))
+        
+        # Hour-of-day profile, for systems whose activity has a time of day
+        hourly = {system: profile for system, profile in (hourly or {}).items() if any(profile)}
+        if hourly:
+            elements.append(Spacer(1, 0.3*inch))
+            elements.append(Paragraph("<b>Activity by Hour of Day (Average Unique Users, Last 30 Days)</b>", section_title))
+            elements.append(self._create_hourly_chart(hourly))
         
-        elements.append(Spacer(1, 0.3*inch))
+        return elements
+    
+    def _create_anomaly_table(self, anomalies: List[Dict]) -> Table:
+        """Flagged days, most recent first"""
+        template = report_template()
+        data = [list(template.anomaly_header)]
+        for anomaly in reversed(anomalies):
+            data.append([
+                anomaly["date"].strftime('%Y-%m-%d'),
+                system_name(anomaly["system"]),
+                anomaly["kind"].replace("_", " "),
+                describe_anomaly(anomaly)
+            ])
+        
+        table = Table(data, colWidths=list(template.anomaly_col_widths))
+        table.setStyle(template.anomaly_table)
+        return table
+    
+    def _create_hourly_chart(self, hourly: Dict[str, List[float]]) -> Drawing:
+        """One line per system over the 24 hours of the day, with a legend"""
+        drawing = Drawing(400, 230)
+        line_colors = [colors.HexColor(SYSTEM_COLORS.get(system, SYSTEM_COLORS["dockify"])) for system in hourly]
+        peak = max(max(profile) for profile in hourly.values())
         
-        # Invoice System Graph
-        elements.append(Paragraph(f"<b>{SYSTEM_NAMES['invoice']} - Daily Active Users (Last 30 Days)</b>", section_title))
-        if trends["invoice"] and len(trends["invoice"]) > 0:
-            elements.append(self._create_line_chart(trends["invoice"], colors.HexColor('#F59E0B')))
-        else:
-            elements.append(Paragraph("No data available", styles['Normal']))
+        chart = HorizontalLineChart()
+        chart.x = 50
+        chart.y = 60
+        chart.height = 150
+        chart.width = 350
+        chart.data = list(hourly.values())
+        for index, color in enumerate(line_colors):
+            chart.lines[index].strokeColor = color
+            chart.lines[index].strokeWidth = 2
+            chart.lines[index].symbol = None
         
-        # Travel System Graph
-        elements.append(Paragraph(f"<b>{SYSTEM_NAMES['travel']} - Daily Active Users (Last 30 Days)</b>", section_title))
-        if trends["travel"] and len(trends["travel"]) > 0:
-            elements.append(self._create_line_chart(trends["travel"], colors.HexColor('#10B981')))
-        else:
-            elements.append(Paragraph("No data available", styles['Normal']))
+        chart.valueAxis.valueMin = 0
+        chart.valueAxis.valueMax = peak * 1.2
+        chart.valueAxis.valueStep = max(1, int(peak / 5))
+        chart.categoryAxis.categoryNames = [f"{hour:02d}" if hour % 3 == 0 else '' for hour in range(24)]
+        chart.categoryAxis.labels.fontSize = 8
+        chart.valueAxis.labels.fontSize = 8
+        drawing.add(chart)
         
-        elements.append(Spacer(1, 0.3*inch))
+        legend = Legend()
+        legend.x = 50
+        legend.y = 20
+        legend.alignment = 'right'
+        legend.columnMaximum = 1
+        legend.fontSize = 8
+        legend.colorNamePairs = [(color, system_name(system)) for color, system in zip(line_colors, hourly)]
+        drawing.add(legend)
         
-        # Document Bot Graph
-        elements.append(Paragraph(f"<b>{SYSTEM_NAMES['document']} - Daily Active Users (Last 30 Days)</b>", section_title))
-        if trends["document"] and len(trends["document"]) > 0:
-            elements.append(self._create_line_chart(trends["document"], colors.HexColor('#8B5CF6')))
-        else:
-            elements.append(Paragraph("No data available", styles['Normal']))
+        return drawing
+    
+    def _create_page3_retention(self, retention: Dict) -> List:
+        """Create Page 3 content with one weekly retention table per system"""
+        elements = []
+        template = report_template()
+        
+        elements.append(Paragraph("Weekly Retention", template.retention_title))
+        elements.append(Paragraph(
+            "Users first seen in each ISO week and the share of them active again 1 to "
+            f"{next(iter(retention.values()))['horizon']} weeks later.",
+            template.normal
+        ))
+        
+        for system in SYSTEMS:
+            if system not in retention:
+                continue
+            elements.append(Spacer(1, 0.25*inch))
+            elements.append(Paragraph(f"<b>{system_name(system)}</b>", template.retention_section_title))
+            if not retention[system]["complete"]:
+                elements.append(Paragraph("Some days of these weeks are not in the rollup store yet.", template.normal))
+            elements.append(self._create_retention_table(retention[system]))
         
         return elements
     
-    def _create_line_chart(self, data: List[Dict], line_color) -> Drawing:
-        """Create a line chart from data"""
+    def _create_retention_table(self, retention: Dict) -> Table:
+        """Cohort-by-week table of retention percentages"""
+        template = report_template()
+        header, col_widths = retention_layout(retention["horizon"])
+        data = [list(header)]
+        for cohort in retention["cohorts"]:
+            data.append([cohort["cohort"], str(cohort["users"])] + [
+                "" if count is None else f"{count / cohort['users']:.0%}" if cohort["users"] else "-"
+                for count in cohort["retained"]
+            ])
+        
+        table = Table(data, colWidths=list(col_widths))
+        table.setStyle(template.retention_table)
+        return table
+    
+    def _create_line_chart(self, data: List[Dict], line_color, grain: str = "day") -> Drawing:
+        """
+        Create a line chart from a daily trend series, averaged per week or
+        month for coarser grains and downsampled to at most
+        TREND_CHART_MAX_POINTS points (see trend_series.chart_points)
+        """
         drawing = Drawing(400, 200)
         
         if not data or len(data) == 0:
             return drawing
         
         # Prepare data for chart
-        values = [item['unique_users'] for item in data]
+        days, values = chart_points(data, grain)
         
         # Create line chart
         chart = HorizontalLineChart()
@@ -307,13 +502,12 @@ class ConsolidatedReportGenerator:
         chart.valueAxis.valueStep = max(1, int(max(values) / 5)) if values else 2
         
         # X-axis labels
-        if len(data) > 0:
-            label_interval = max(1, len(data) // 6)
-            chart.categoryAxis.categoryNames = [
-                datetime.fromisoformat(item['date']).strftime('%m/%d')
-                if i % label_interval == 0 else ''
-                for i, item in enumerate(data)
-            ]
+        date_format = GRAIN_TITLES[grain][1]
+        label_interval = max(1, len(days) // 6)
+        chart.categoryAxis.categoryNames = [
+            day.strftime(date_format) if i % label_interval == 0 else ''
+            for i, day in enumerate(days)
+        ]
         
         # Grid and styling
         chart.categoryAxis.labels.angle = 45
@@ -331,10 +525,71 @@ def generate_consolidated_report(report_type: str = "weekly") -> str:
     Generate a consolidated monitoring report PDF
     
     Args:
-        report_type: Type of report ("weekly" or "monthly")
+        report_type: Type of report ("weekly", "monthly", "quarterly" or "yearly")
         
     Returns:
         str: Path to the generated PDF file
     """
     generator = ConsolidatedReportGenerator()
     return generator.generate_report(report_type)
+
+
+def render_consolidated_report(report_type: str = "weekly") -> bytes:
+    """
+    Generate a consolidated monitoring report PDF in memory
+    
+    Args:
+        report_type: Type of report ("weekly", "monthly", "quarterly" or "yearly")
+        
+    Returns:
+        bytes: The PDF document
+    """
+    generator = ConsolidatedReportGenerator()
+    return generator.render_report(report_type)
+
+
+async def _collect_report_inputs(collector, report_type: str) -> Tuple[Dict, Dict, Dict, Dict]:
+    """(stats, trends, hourly, retention) from an AsyncDataCollector (a temporary one if None)"""
+    owns_collector = collector is None
+    if owns_collector:
+        collector = AsyncDataCollector()
+    try:
+        stats, trends = await collector.get_report_data(days=trend_days(report_type))
+        hourly = await collector.get_hourly_profile(30)
+        retention = await collector.get_retention()
+        return stats, trends, hourly, retention
+    finally:
+        if owns_collector:
+            await collector.close()
+
+
+async def generate_consolidated_report_async(report_type: str = "weekly", collector=None) -> str:
+    """
+    Generate a consolidated monitoring report PDF without blocking the event loop
+    
+    Data is collected with an AsyncDataCollector and the ReportLab rendering
+    runs in a worker thread.
+    
+    Args:
+        report_type: Type of report ("weekly", "monthly", "quarterly" or "yearly")
+        collector: AsyncDataCollector to reuse (a temporary one is used if omitted)
+        
+    Returns:
+        str: Path to the generated PDF file
+    """
+    inputs = await _collect_report_inputs(collector, report_type)
+    generator = ConsolidatedReportGenerator()
+    return await asyncio.to_thread(generator.generate_report, report_type, *inputs)
+
+
+async def render_consolidated_report_async(report_type: str = "weekly", collector=None) -> bytes:
+    """
+    Generate a consolidated monitoring report PDF in memory without blocking
+    the event loop (see generate_consolidated_report_async)
+    
+    Returns:
+        bytes: The PDF document
+    """
+    inputs = await _collect_report_inputs(collector, report_type)
+    generator = ConsolidatedReportGenerator()
+    return await asyncio.to_thread(generator.render_report, report_type, *inputs)
@@ -0,0 +1,124 @@
+"""
+Report Template - Paragraph styles, table styles and layouts of the PDF report, built once per process
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Tuple
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.styles import ParagraphStyle, StyleSheet1, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import TableStyle
+
+BLACK = colors.HexColor('#000000')
+HEADER_BACKGROUND = colors.HexColor('#F0F0F0')
+TOTAL_BACKGROUND = colors.HexColor('#E8E8E8')
+
+# Small-print grid shared by the anomaly and retention tables
+_SMALL_GRID = (
+    ('BACKGROUND', (0, 0), (-1, 0), HEADER_BACKGROUND),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 8),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+    ('TOPPADDING', (0, 0), (-1, -1), 3),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+)
+
+
+@dataclass(frozen=True)
+class ReportTemplate:
+    """
+    Everything about the report's look that does not depend on its data
+
+    Styles and table styles are only read while a document is laid out, so
+    one instance is shared by every report (and thread) of the process.
+    Flowables such as Paragraph keep per-layout state and are still made per
+    report from the markup and styles here.
+    """
+    styles: StyleSheet1
+    title: ParagraphStyle
+    subtitle: ParagraphStyle
+    section_title: ParagraphStyle
+    graph_title: ParagraphStyle
+    graph_section_title: ParagraphStyle
+    retention_title: ParagraphStyle
+    retention_section_title: ParagraphStyle
+    section_table: TableStyle
+    anomaly_table: TableStyle
+    retention_table: TableStyle
+    section_header: Tuple[str, str] = ("<b>System</b>", "<b>Unique Users</b>")
+    section_col_widths: Tuple[float, float] = (3.5*inch, 2*inch)
+    section_width: float = 5.5*inch
+    anomaly_header: Tuple[str, ...] = ("Date", "System", "Flag", "Details")
+    anomaly_col_widths: Tuple[float, ...] = (0.9*inch, 2*inch, 1.1*inch, 2.6*inch)
+
+    @property
+    def normal(self) -> ParagraphStyle:
+        return self.styles['Normal']
+
+
+def compile_template() -> ReportTemplate:
+    """Build every style and table style of the report from scratch"""
+    styles = getSampleStyleSheet()
+
+    def heading(name: str, parent: str, font_size: int, space_after: int, **extra) -> ParagraphStyle:
+        return ParagraphStyle(name, parent=styles[parent], fontSize=font_size, textColor=BLACK,
+                              spaceAfter=space_after, **extra)
+
+    return ReportTemplate(
+        styles=styles,
+        title=heading('CustomTitle', 'Heading1', 24, 12, alignment=TA_CENTER),
+        subtitle=heading('CustomSubtitle', 'Normal', 14, 30, alignment=TA_CENTER),
+        section_title=heading('SectionTitle', 'Heading2', 16, 12),
+        graph_title=heading('GraphTitle', 'Heading1', 20, 30, alignment=TA_CENTER),
+        graph_section_title=heading('GraphSectionTitle', 'Heading2', 14, 12),
+        retention_title=heading('RetentionTitle', 'Heading1', 20, 12, alignment=TA_CENTER),
+        retention_section_title=heading('RetentionSectionTitle', 'Heading2', 14, 8),
+        section_table=TableStyle([
+            # Header row
+            ('BACKGROUND', (0, 0), (-1, 0), HEADER_BACKGROUND),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
+            ('ALIGN', (0, 0), (-1, 0), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('TOPPADDING', (0, 0), (-1, 0), 12),
+
+            # Data rows
+            ('ALIGN', (0, 1), (0, -2), 'LEFT'),
+            ('ALIGN', (1, 1), (1, -2), 'RIGHT'),
+            ('FONTNAME', (0, 1), (-1, -2), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -2), 12),
+            ('BOTTOMPADDING', (0, 1), (-1, -2), 10),
+            ('TOPPADDING', (0, 1), (-1, -2), 10),
+
+            # Total row
+            ('BACKGROUND', (0, -1), (-1, -1), TOTAL_BACKGROUND),
+            ('ALIGN', (0, -1), (0, -1), 'LEFT'),
+            ('ALIGN', (1, -1), (1, -1), 'RIGHT'),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, -1), (-1, -1), 12),
+            ('BOTTOMPADDING', (0, -1), (-1, -1), 10),
+            ('TOPPADDING', (0, -1), (-1, -1), 10),
+
+            # Grid
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ]),
+        anomaly_table=TableStyle(_SMALL_GRID),
+        retention_table=TableStyle(_SMALL_GRID + (('ALIGN', (1, 0), (-1, -1), 'RIGHT'),))
+    )
+
+
+@lru_cache(maxsize=1)
+def report_template() -> ReportTemplate:
+    """The process-wide compiled template (built on first use)"""
+    return compile_template()
+
+
+@lru_cache(maxsize=None)
+def retention_layout(horizon: int) -> Tuple[Tuple[str, ...], Tuple[float, ...]]:
+    """Header row and column widths of a retention table with ``horizon`` weeks"""
+    header = ("Cohort", "Users") + tuple(f"W+{week}" for week in range(1, horizon + 1))
+    return header, (0.9*inch, 0.6*inch) + (0.5*inch,) * horizon
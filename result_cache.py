@@ -0,0 +1,167 @@
+"""
+Result Cache - TTL + stale-while-revalidate cache for collected results
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from config import RESULT_CACHE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+FRESH, STALE, MISS = "fresh", "stale", "miss"
+
+
+class ResultCache:
+    """
+    Results keyed by e.g. (kind, source, target date). Entries younger than
+    ``ttl`` are served as they are; older ones are still served right away
+    while a single background refresh replaces them, until they are
+    ``ttl + max_stale`` old and count as a miss. Immutable entries (data for
+    past dates) never expire. Only successful loads are stored.
+    """
+
+    def __init__(self, ttl: float = None, max_stale: float = None, max_entries: int = None):
+        self.ttl = RESULT_CACHE_CONFIG["ttl"] if ttl is None else ttl
+        self.max_stale = RESULT_CACHE_CONFIG["max_stale"] if max_stale is None else max_stale
+        self.max_entries = max_entries or RESULT_CACHE_CONFIG["max_entries"]
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float, bool]]" = OrderedDict()
+        self._refreshing = set()
+        self._tasks = set()
+        self._executor = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def lookup(self, key: Hashable) -> Tuple[Any, str]:
+        """Cached value and its state (fresh, stale or miss), counting the outcome"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at, immutable = entry
+                age = time.monotonic() - stored_at
+                if immutable or age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value, FRESH
+                if age < self.ttl + self.max_stale:
+                    self._entries.move_to_end(key)
+                    self.stale_hits += 1
+                    return value, STALE
+                del self._entries[key]
+            self.misses += 1
+            return None, MISS
+
+    def store(self, key: Hashable, value: Any, immutable: bool = False) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic(), immutable)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable = None) -> None:
+        """Drop one entry (or all of them)"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def _claim_refresh(self, key: Hashable) -> bool:
+        """True for the one caller that should refresh a stale key"""
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def _refreshed(self, key: Hashable, error: Optional[Exception]) -> None:
+        with self._lock:
+            self._refreshing.discard(key)
+            if error is None:
+                self.refreshes += 1
+            else:
+                self.refresh_errors += 1
+        if error is not None:
+            logger.warning(f"Background refresh of {key} failed, keeping the stale result: {error}")
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], immutable: bool = False) -> Any:
+        """Cached value for key; loads on a miss and refreshes stale values in a worker thread"""
+        value, state = self.lookup(key)
+        if state == MISS:
+            value = loader()
+            self.store(key, value, immutable)
+        elif state == STALE and self._claim_refresh(key):
+            self._get_executor().submit(self._refresh, key, loader, immutable)
+        return value
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any], immutable: bool) -> None:
+        try:
+            self.store(key, loader(), immutable)
+        except Exception as e:
+            self._refreshed(key, e)
+        else:
+            self._refreshed(key, None)
+
+    async def get_or_load_async(self, key: Hashable, loader: Callable[[], Awaitable],
+                                immutable: bool = False) -> Any:
+        """``get_or_load`` for coroutine loaders; stale values refresh in a background task"""
+        value, state = self.lookup(key)
+        if state == MISS:
+            value = await loader()
+            self.store(key, value, immutable)
+        elif state == STALE and self._claim_refresh(key):
+            task = asyncio.get_running_loop().create_task(self._refresh_async(key, loader, immutable))
+            # Keep a reference so the task is not garbage collected mid-refresh
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return value
+
+    async def _refresh_async(self, key: Hashable, loader: Callable[[], Awaitable], immutable: bool) -> None:
+        try:
+            self.store(key, await loader(), immutable)
+        except Exception as e:
+            self._refreshed(key, e)
+        else:
+            self._refreshed(key, None)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-refresh")
+            return self._executor
+
+    def stats(self) -> Dict:
+        """Hit / miss counters and size, for observability"""
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+                "refreshes": self.refreshes,
+                "refresh_errors": self.refresh_errors,
+                "refreshing": len(self._refreshing),
+                "entries": len(self._entries)
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """Process-wide result cache shared by the sync and async collectors"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+        return _cache
@@ -0,0 +1,814 @@
+"""
+Rollup Store - Local SQLite store of per-day, per-system activity
+"""
+import logging
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from config import ROLLUP_CONFIG, APPROX_DISTINCT_CONFIG
+from hll import HyperLogLog, error_bound
+from user_sets import (
+    EMPTY_IDS, GRAINS, MAPPED_ID_BASE, bucket_label, cohort_triangle, decode_ids, encode_ids, grain_buckets,
+    to_id_array, union_ids, window_bounds
+)
+
+logger = logging.getLogger(__name__)
+
+# Rows turned into ID arrays at a time, so streamed rows are never all in memory
+INGEST_CHUNK_ROWS = 10000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_activity (
+    system TEXT NOT NULL,
+    day TEXT NOT NULL,
+    unique_users INTEGER NOT NULL,
+    PRIMARY KEY (system, day)
+) WITHOUT ROWID;
+
+-- Sorted user IDs per day, delta-encoded and zlib-compressed (see user_sets)
+CREATE TABLE IF NOT EXISTS daily_user_sets (
+    system TEXT NOT NULL,
+    day TEXT NOT NULL,
+    ids BLOB NOT NULL,
+    PRIMARY KEY (system, day)
+) WITHOUT ROWID;
+
+-- HyperLogLog registers per day, built at ingest when approximate counts are
+-- enabled (other precisions are built from daily_user_sets on first use)
+CREATE TABLE IF NOT EXISTS daily_sketches (
+    system TEXT NOT NULL,
+    day TEXT NOT NULL,
+    precision INTEGER NOT NULL,
+    registers BLOB NOT NULL,
+    PRIMARY KEY (system, day)
+) WITHOUT ROWID;
+
+-- Distinct users per fully ingested ISO week / month / quarter, so long
+-- ranges are answered per bucket instead of per day
+CREATE TABLE IF NOT EXISTS bucket_activity (
+    system TEXT NOT NULL,
+    grain TEXT NOT NULL,
+    bucket_start TEXT NOT NULL,
+    unique_users INTEGER NOT NULL,
+    PRIMARY KEY (system, grain, bucket_start)
+) WITHOUT ROWID;
+
+-- Sorted user IDs per closed hour, for sources whose time column has a time
+-- of day; the hours of a day union into its day set
+CREATE TABLE IF NOT EXISTS hourly_user_sets (
+    system TEXT NOT NULL,
+    day TEXT NOT NULL,
+    hour INTEGER NOT NULL,
+    unique_users INTEGER NOT NULL,
+    ids BLOB NOT NULL,
+    PRIMARY KEY (system, day, hour)
+) WITHOUT ROWID;
+
+-- Ingested hours per system: [first_hour, hours_until)
+CREATE TABLE IF NOT EXISTS hourly_watermarks (
+    system TEXT PRIMARY KEY,
+    first_hour TEXT NOT NULL,
+    hours_until TEXT NOT NULL
+);
+
+-- First stored day of every user per system: sorted IDs (as in
+-- daily_user_sets) and the matching day ordinals, zlib-compressed int32.
+-- Kept up to date by ingest, so cohorts never rescan the whole history.
+CREATE TABLE IF NOT EXISTS user_first_seen (
+    system TEXT PRIMARY KEY,
+    ids BLOB NOT NULL,
+    first_days BLOB NOT NULL
+);
+
+-- Integer stand-ins for non-integer user IDs such as emp_uid
+CREATE TABLE IF NOT EXISTS user_id_map (
+    system TEXT NOT NULL,
+    user_key TEXT NOT NULL,
+    user_num INTEGER NOT NULL,
+    PRIMARY KEY (system, user_key)
+) WITHOUT ROWID;
+
+-- Closed days [first_day, last_day] that have been ingested per system
+CREATE TABLE IF NOT EXISTS watermarks (
+    system TEXT PRIMARY KEY,
+    first_day TEXT NOT NULL,
+    last_day TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+"""
+
+
+def merge_coverage(covered: Optional[Tuple], start, until) -> Tuple:
+    """
+    Coverage [first, until) after ingesting [start, until): the union when
+    the two overlap or touch, else the old coverage unchanged, so a gap
+    between them is never marked as ingested
+    """
+    if covered is None:
+        return start, until
+    first, covered_until = covered
+    if start <= covered_until and until >= first:
+        return min(first, start), max(covered_until, until)
+    return covered
+
+
+def fold_first_seen(ids: np.ndarray, first_days: np.ndarray,
+                    sets: Dict[date, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """(sorted IDs, first day ordinals) after also seeing each day's users on that day"""
+    ids = np.concatenate([ids] + list(sets.values()))
+    first_days = np.concatenate(
+        [first_days] + [np.full(len(day_ids), day.toordinal(), dtype=np.int64) for day, day_ids in sets.items()]
+    )
+    order = np.lexsort((first_days, ids))
+    ids, first_days = ids[order], first_days[order]
+    earliest = np.ones(len(ids), dtype=bool)
+    earliest[1:] = ids[1:] != ids[:-1]
+    return ids[earliest], first_days[earliest]
+
+
+def as_date(value) -> date:
+    """Normalize a day value returned by any of the source drivers"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _hour_cutoff(until: datetime) -> datetime:
+    """Start of the oldest day of hourly rollups kept when ingesting up to ``until``"""
+    return datetime.combine(until.date() - timedelta(days=ROLLUP_CONFIG["hourly_days"]), datetime.min.time())
+
+
+class RollupStore:
+    """
+    Per-day unique-user counts and user-ID sets for every system, ingested
+    incrementally from the source databases. Only closed days (before today)
+    are stored, so stored days never change and a report only has to read
+    today's rows from the sources.
+
+    User IDs are kept per day as compressed sorted integer arrays, so the
+    distinct users of any window are an exact in-memory union of its days.
+    """
+
+    def __init__(self, path: str = None, set_cache_days: int = None, sketch_precision: int = None):
+        self.path = path or ROLLUP_CONFIG["path"]
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        # Decoded day arrays, least recently used first
+        self._sets: "OrderedDict[Tuple[str, date], np.ndarray]" = OrderedDict()
+        self._set_cache_days = set_cache_days or ROLLUP_CONFIG["set_cache_days"]
+        # Precision of the day sketches written at ingest (None: approximate counts are off)
+        self.sketch_precision = sketch_precision or (
+            APPROX_DISTINCT_CONFIG["precision"] if APPROX_DISTINCT_CONFIG["enabled"] else None
+        )
+        # Live IDs of the current (not yet stored) day per system: (day, ids)
+        self._fresh: Dict[str, Tuple[date, np.ndarray]] = {}
+        # Live IDs of the current (open) hour per system: (hour start, ids)
+        self._fresh_hours: Dict[str, Tuple[datetime, np.ndarray]] = {}
+        self._id_maps: Dict[str, Dict[str, int]] = {}
+        # (sorted IDs, first day ordinals) per system, see user_first_seen
+        self._first_seen: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._migrate_daily_users()
+
+    def _migrate_daily_users(self) -> None:
+        """
+        Drop the row-per-user table of older stores. It kept IDs as text, which
+        loses the integer/string distinction, so those days are re-ingested.
+        """
+        with self._lock, self._conn:
+            exists = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'daily_users'"
+            ).fetchone()
+            if not exists:
+                return
+            self._conn.execute("DROP TABLE daily_users")
+            self._conn.execute("DELETE FROM daily_activity")
+            self._conn.execute("DELETE FROM watermarks")
+        logger.info("Dropped the old per-user rollup rows; days will be re-ingested as compact sets")
+
+    def _to_ids(self, system: str, values: Iterable) -> np.ndarray:
+        """
+        Sorted int64 IDs for raw source values. Integers are used as-is, other
+        values get a stable number from user_id_map. Caller holds the lock.
+        """
+        id_map = self._id_maps.get(system)
+        if id_map is None:
+            id_map = dict(self._conn.execute(
+                "SELECT user_key, user_num FROM user_id_map WHERE system = ?", (system,)
+            ).fetchall())
+            self._id_maps[system] = id_map
+
+        ids, new_keys = [], []
+        for value in values:
+            if isinstance(value, int) and not isinstance(value, bool):
+                ids.append(value)
+                continue
+            key = str(value)
+            number = id_map.get(key)
+            if number is None:
+                number = MAPPED_ID_BASE + len(id_map)
+                id_map[key] = number
+                new_keys.append((system, key, number))
+            ids.append(number)
+        if new_keys:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO user_id_map (system, user_key, user_num) VALUES (?, ?, ?)", new_keys
+                )
+        return to_id_array(ids)
+
+    def _cache_set(self, key: Tuple[str, date], ids: np.ndarray) -> None:
+        self._sets[key] = ids
+        self._sets.move_to_end(key)
+        while len(self._sets) > self._set_cache_days:
+            self._sets.popitem(last=False)
+
+    def coverage(self, system: str) -> Optional[Tuple[date, date]]:
+        """First and last ingested day for a system, or None if never ingested"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT first_day, last_day FROM watermarks WHERE system = ?", (system,)
+            ).fetchone()
+        if not row:
+            return None
+        return date.fromisoformat(row[0]), date.fromisoformat(row[1])
+
+    def missing_ranges(self, system: str, start: date, end: date) -> List[Tuple[date, date]]:
+        """
+        Day ranges that still have to be ingested for [start, end] to be covered
+
+        Coverage is one contiguous range that only grows at its edges, so this
+        is at most one range before the first ingested day and one after the
+        watermark. Each reaches up to the coverage rather than stopping at the
+        requested window, so ingesting it keeps coverage contiguous.
+        """
+        if start > end:
+            return []
+        covered = self.coverage(system)
+        if covered is None:
+            return [(start, end)]
+        first_day, last_day = covered
+        ranges = []
+        if start < first_day:
+            ranges.append((start, first_day - timedelta(days=1)))
+        if end > last_day:
+            ranges.append((last_day + timedelta(days=1), end))
+        return ranges
+
+    def _fold_ids(self, system: str, rows: Iterable, key) -> Dict:
+        """
+        ID arrays per key(row) from rows ending in a user ID, consumed in
+        chunks so a streamed result is never all in memory
+        """
+        folded = {}
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, INGEST_CHUNK_ROWS))
+            if not chunk:
+                return folded
+            grouped: Dict = {}
+            for row in chunk:
+                if row[-1] is not None:
+                    grouped.setdefault(key(row), []).append(row[-1])
+            with self._lock:
+                for group, users in grouped.items():
+                    folded[group] = union_ids((folded.get(group, EMPTY_IDS), self._to_ids(system, users)))
+
+    def ingest(self, system: str, rows: Iterable, start: date, end: date) -> int:
+        """
+        Store (day, user_id) rows for the closed days [start, end] and extend coverage
+
+        Days in the range without rows are recorded with zero users so they
+        are not fetched again. ``rows`` may be a stream; it is consumed in
+        chunks that are folded into compact per-day ID arrays.
+        """
+        users_by_day = self._fold_ids(system, rows, lambda row: as_date(row[0]))
+
+        days = []
+        day = start
+        while day <= end:
+            days.append(day)
+            day += timedelta(days=1)
+
+        with self._lock:
+            sets = {day: users_by_day.get(day, EMPTY_IDS) for day in days}
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO daily_activity (system, day, unique_users) VALUES (?, ?, ?)",
+                    [(system, day.isoformat(), len(ids)) for day, ids in sets.items()]
+                )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO daily_user_sets (system, day, ids) VALUES (?, ?, ?)",
+                    [(system, day.isoformat(), encode_ids(ids)) for day, ids in sets.items()]
+                )
+                self._record_first_seen(system, sets)
+                self._conn.execute(
+                    "DELETE FROM daily_sketches WHERE system = ? AND day >= ? AND day <= ?",
+                    (system, start.isoformat(), end.isoformat())
+                )
+                if self.sketch_precision:
+                    self._conn.executemany(
+                        "INSERT INTO daily_sketches (system, day, precision, registers) VALUES (?, ?, ?, ?)",
+                        [(system, day.isoformat(), self.sketch_precision,
+                          HyperLogLog.from_ids(ids, self.sketch_precision).to_bytes()) for day, ids in sets.items()]
+                    )
+                row = self._conn.execute(
+                    "SELECT first_day, last_day FROM watermarks WHERE system = ?", (system,)
+                ).fetchone()
+                covered = (date.fromisoformat(row[0]), date.fromisoformat(row[1]) + timedelta(days=1)) if row else None
+                first_day, days_until = merge_coverage(covered, start, end + timedelta(days=1))
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO watermarks (system, first_day, last_day, updated_at) VALUES (?, ?, ?, ?)",
+                    (system, first_day.isoformat(), (days_until - timedelta(days=1)).isoformat(),
+                     datetime.now().isoformat(timespec="seconds"))
+                )
+            for day, ids in sets.items():
+                self._cache_set((system, day), ids)
+
+        self._materialize_buckets(system, start, end)
+        logger.info(f"Ingested {system} rollups for {start} to {end} ({len(days)} days)")
+        return len(days)
+
+    def _load_first_seen(self, system: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (sorted IDs, first day ordinals) of a system. Stores ingested before
+        user_first_seen existed are folded from their day sets once. Caller
+        holds the lock inside a transaction.
+        """
+        cached = self._first_seen.get(system)
+        if cached is not None:
+            return cached
+        row = self._conn.execute(
+            "SELECT ids, first_days FROM user_first_seen WHERE system = ?", (system,)
+        ).fetchone()
+        if row:
+            first_days = np.frombuffer(zlib.decompress(row[1]), dtype="<i4") if row[1] else EMPTY_IDS
+            self._first_seen[system] = (decode_ids(row[0]), first_days.astype(np.int64))
+            return self._first_seen[system]
+        rows = self._conn.execute("SELECT day, ids FROM daily_user_sets WHERE system = ?", (system,)).fetchall()
+        self._store_first_seen(system, *fold_first_seen(
+            EMPTY_IDS, EMPTY_IDS, {date.fromisoformat(day): decode_ids(blob) for day, blob in rows}
+        ))
+        return self._first_seen[system]
+
+    def _store_first_seen(self, system: str, ids: np.ndarray, first_days: np.ndarray) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO user_first_seen (system, ids, first_days) VALUES (?, ?, ?)",
+            (system, encode_ids(ids), zlib.compress(first_days.astype("<i4").tobytes(), 6) if len(ids) else b"")
+        )
+        self._first_seen[system] = (ids, first_days)
+
+    def _record_first_seen(self, system: str, sets: Dict[date, np.ndarray]) -> None:
+        """Fold newly stored day sets into user_first_seen (lock held, inside a transaction)"""
+        self._store_first_seen(system, *fold_first_seen(*self._load_first_seen(system), sets))
+
+    def seen_before(self, system: str, day: date) -> np.ndarray:
+        """Distinct user IDs first active on a stored day before ``day``"""
+        with self._lock, self._conn:
+            ids, first_days = self._load_first_seen(system)
+        return ids[first_days < day.toordinal()]
+
+    def _materialize_buckets(self, system: str, start: date, end: date) -> None:
+        """Recount every week / month / quarter touching [start, end] that is now fully ingested"""
+        covered = self.coverage(system)
+        rows, stale = [], []
+        for grain in GRAINS[1:]:
+            for bucket_start, bucket_end in grain_buckets(start, end, grain):
+                key = (system, grain, bucket_start.isoformat())
+                if covered[0] <= bucket_start and bucket_end <= covered[1]:
+                    rows.append(key + (self.distinct_users(system, bucket_start, bucket_end),))
+                else:
+                    stale.append(key)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM bucket_activity WHERE system = ? AND grain = ? AND bucket_start = ?", stale
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO bucket_activity (system, grain, bucket_start, unique_users) VALUES (?, ?, ?, ?)",
+                rows
+            )
+
+    def bucket_counts(self, system: str, start: date, end: date, grain: str) -> List[Dict]:
+        """
+        Distinct users per day / ISO week / month / quarter of [start, end]
+
+        Whole buckets come from daily_activity or bucket_activity, so a long
+        range costs one lookup per bucket; only buckets cut by the range
+        edges, or not materialized yet, are unions of their day sets.
+        ``complete`` is False for buckets with days that are not known.
+        """
+        buckets = grain_buckets(start, end, grain)
+        first, last = buckets[0][0].isoformat(), buckets[-1][0].isoformat()
+        with self._lock:
+            if grain == "day":
+                stored = dict(self._conn.execute(
+                    "SELECT day, unique_users FROM daily_activity WHERE system = ? AND day >= ? AND day <= ?",
+                    (system, first, last)
+                ).fetchall())
+            else:
+                stored = dict(self._conn.execute(
+                    "SELECT bucket_start, unique_users FROM bucket_activity "
+                    "WHERE system = ? AND grain = ? AND bucket_start >= ? AND bucket_start <= ?",
+                    (system, grain, first, last)
+                ).fetchall())
+        covered = self.coverage(system)
+
+        results, new_rows = [], []
+        for bucket_start, bucket_end in buckets:
+            lo, hi = max(bucket_start, start), min(bucket_end, end)
+            whole = (lo, hi) == (bucket_start, bucket_end)
+            count = stored.get(bucket_start.isoformat()) if whole else None
+            complete = count is not None
+            if count is None:
+                sets = self.day_sets(system, lo, hi)
+                count = len(union_ids(sets.values()))
+                complete = len(sets) == (hi - lo).days + 1
+                if whole and grain != "day" and covered and covered[0] <= lo and hi <= covered[1]:
+                    new_rows.append((system, grain, bucket_start.isoformat(), count))
+            results.append({
+                "bucket": bucket_label(bucket_start, grain),
+                "start": lo,
+                "end": hi,
+                "unique_users": count,
+                "complete": complete
+            })
+        if new_rows:
+            # Stores that predate bucket_activity fill it in as ranges are asked for
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO bucket_activity (system, grain, bucket_start, unique_users) VALUES (?, ?, ?, ?)",
+                    new_rows
+                )
+        return results
+
+    def _hour_coverage(self, system: str, cutoff: datetime) -> Optional[Tuple[datetime, datetime]]:
+        """Ingested hours [first_hour, hours_until) still kept at cutoff, or None. Caller holds the lock."""
+        row = self._conn.execute(
+            "SELECT first_hour, hours_until FROM hourly_watermarks WHERE system = ?", (system,)
+        ).fetchone()
+        if not row or datetime.fromisoformat(row[1]) <= cutoff:
+            return None
+        return max(datetime.fromisoformat(row[0]), cutoff), datetime.fromisoformat(row[1])
+
+    def missing_hours(self, system: str, since: datetime, until: datetime) -> List[Tuple[datetime, datetime]]:
+        """
+        Hour ranges [start, until) that still have to be ingested for
+        [since, until) to be covered; like missing_ranges they reach up to
+        the coverage, e.g. back over a night the bot was down
+        """
+        if since >= until:
+            return []
+        with self._lock:
+            covered = self._hour_coverage(system, _hour_cutoff(until))
+        if covered is None:
+            return [(since, until)]
+        first_hour, hours_until = covered
+        ranges = []
+        if since < first_hour:
+            ranges.append((since, first_hour))
+        if until > hours_until:
+            ranges.append((hours_until, until))
+        return ranges
+
+    def ingest_hours(self, system: str, rows: Iterable, start: datetime, until: datetime) -> int:
+        """
+        Store (day, hour, user_id) rows for the closed hours [start, until)
+
+        Hours without rows are stored empty so they are not fetched again;
+        hours older than ROLLUP_CONFIG["hourly_days"] are dropped.
+        """
+        users_by_hour = self._fold_ids(system, rows, lambda row: (as_date(row[0]), int(row[1])))
+        hours = []
+        hour = start
+        while hour < until:
+            hours.append(hour)
+            hour += timedelta(hours=1)
+        cutoff = _hour_cutoff(until)
+
+        with self._lock, self._conn:
+            stored = []
+            for hour in hours:
+                ids = users_by_hour.get((hour.date(), hour.hour), EMPTY_IDS)
+                stored.append((system, hour.date().isoformat(), hour.hour, len(ids), encode_ids(ids)))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO hourly_user_sets (system, day, hour, unique_users, ids) VALUES (?, ?, ?, ?, ?)",
+                stored
+            )
+            first_hour, hours_until = merge_coverage(self._hour_coverage(system, cutoff), max(start, cutoff), until)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO hourly_watermarks (system, first_hour, hours_until) VALUES (?, ?, ?)",
+                (system, first_hour.isoformat(), hours_until.isoformat())
+            )
+            self._conn.execute(
+                "DELETE FROM hourly_user_sets WHERE system = ? AND day < ?", (system, cutoff.date().isoformat())
+            )
+        logger.info(f"Ingested {system} hourly rollups for {start:%Y-%m-%d %H:00} to {until:%Y-%m-%d %H:00}")
+        return len(hours)
+
+    def set_fresh_hour(self, system: str, hour: datetime, user_ids: Iterable) -> np.ndarray:
+        """Remember the live user IDs of the current, still open hour"""
+        with self._lock:
+            ids = self._to_ids(system, (user_id for user_id in user_ids if user_id is not None))
+            self._fresh_hours[system] = (hour, ids)
+        return ids
+
+    def hour_sets(self, system: str, day: date) -> Dict[int, np.ndarray]:
+        """User-ID arrays of every known hour of a day, including the live hour"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT hour, ids FROM hourly_user_sets WHERE system = ? AND day = ?", (system, day.isoformat())
+            ).fetchall()
+            fresh = self._fresh_hours.get(system)
+        sets = {hour: decode_ids(blob) for hour, blob in rows}
+        if fresh and fresh[0].date() == day and fresh[0].hour not in sets:
+            sets[fresh[0].hour] = fresh[1]
+        return sets
+
+    def set_fresh_from_hours(self, system: str, day: date) -> np.ndarray:
+        """Make the union of a day's hours (closed ones plus the live hour) its live day set"""
+        ids = union_ids(self.hour_sets(system, day).values())
+        with self._lock:
+            self._fresh[system] = (day, ids)
+        return ids
+
+    def hourly_counts(self, system: str, day: date) -> Dict[int, int]:
+        """Unique users per known hour of a day, including the live hour"""
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT hour, unique_users FROM hourly_user_sets WHERE system = ? AND day = ?",
+                (system, day.isoformat())
+            ).fetchall())
+            fresh = self._fresh_hours.get(system)
+        if fresh and fresh[0].date() == day and fresh[0].hour not in counts:
+            counts[fresh[0].hour] = len(fresh[1])
+        return dict(sorted(counts.items()))
+
+    def hour_of_day_profile(self, system: str, start: date, end: date) -> List[float]:
+        """Average unique users in each hour of the day (0-23) over the stored hours of [start, end]"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT hour, AVG(unique_users) FROM hourly_user_sets "
+                "WHERE system = ? AND day >= ? AND day <= ? GROUP BY hour",
+                (system, start.isoformat(), end.isoformat())
+            ).fetchall()
+        averages = dict(rows)
+        return [float(averages.get(hour, 0.0)) for hour in range(24)]
+
+    def set_fresh(self, system: str, day: date, user_ids: Iterable) -> np.ndarray:
+        """Remember the live user IDs of a day that is not stored yet (normally today)"""
+        with self._lock:
+            ids = self._to_ids(system, (user_id for user_id in user_ids if user_id is not None))
+            self._fresh[system] = (day, ids)
+        return ids
+
+    def daily_counts(self, system: str, start: date, end: date) -> Dict[date, int]:
+        """Stored unique users per day in [start, end]"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT day, unique_users FROM daily_activity WHERE system = ? AND day >= ? AND day <= ? ORDER BY day",
+                (system, start.isoformat(), end.isoformat())
+            ).fetchall()
+        return {date.fromisoformat(day): count for day, count in rows}
+
+    def day_sets(self, system: str, start: date, end: date) -> Dict[date, np.ndarray]:
+        """
+        User-ID arrays of every known day in [start, end]: stored days first,
+        then the live set from set_fresh if its day falls in the range
+        """
+        if start > end:
+            return {}
+        sets = {}
+        with self._lock:
+            day = start
+            complete = True
+            while day <= end:
+                cached = self._sets.get((system, day))
+                if cached is None:
+                    complete = False
+                    break
+                sets[day] = cached
+                day += timedelta(days=1)
+            if not complete:
+                rows = self._conn.execute(
+                    "SELECT day, ids FROM daily_user_sets WHERE system = ? AND day >= ? AND day <= ?",
+                    (system, start.isoformat(), end.isoformat())
+                ).fetchall()
+                sets = {}
+                for day_text, blob in rows:
+                    day = date.fromisoformat(day_text)
+                    sets[day] = self._sets.get((system, day))
+                    if sets[day] is None:
+                        sets[day] = decode_ids(blob)
+                    self._cache_set((system, day), sets[day])
+            fresh = self._fresh.get(system)
+        if fresh and start <= fresh[0] <= end and fresh[0] not in sets:
+            sets[fresh[0]] = fresh[1]
+        return sets
+
+    def users_in(self, system: str, start: date, end: date) -> np.ndarray:
+        """Distinct user IDs seen on any known day in [start, end]"""
+        return union_ids(self.day_sets(system, start, end).values())
+
+    def distinct_users(self, system: str, start: date, end: date) -> int:
+        """Exact number of distinct users in [start, end]"""
+        sets = self.day_sets(system, start, end)
+        if len(sets) == 1:
+            return len(next(iter(sets.values())))
+        return len(union_ids(sets.values())) if sets else 0
+
+    def day_sketches(self, system: str, start: date, end: date, precision: int) -> Dict[date, HyperLogLog]:
+        """
+        HyperLogLog sketches of every known day in [start, end], like day_sets
+
+        Sketches are normally written by ingest. Only days stored without one
+        at this precision have their ID arrays decoded, once, to sketch and
+        store them; those arrays bypass the decoded-set cache.
+        """
+        if start > end:
+            return {}
+        bounds = (system, start.isoformat(), end.isoformat())
+        with self._lock:
+            sketches = {
+                date.fromisoformat(day): HyperLogLog.from_bytes(blob, precision)
+                for day, blob in self._conn.execute(
+                    "SELECT day, registers FROM daily_sketches "
+                    "WHERE system = ? AND day >= ? AND day <= ? AND precision = ?",
+                    bounds + (precision,)
+                ).fetchall()
+            }
+            unsketched = [
+                day for (day,) in self._conn.execute(
+                    "SELECT day FROM daily_activity WHERE system = ? AND day >= ? AND day <= ?", bounds
+                ).fetchall()
+                if date.fromisoformat(day) not in sketches
+            ]
+            new_rows = []
+            for day_text in unsketched:
+                ids = self._sets.get((system, date.fromisoformat(day_text)))
+                if ids is None:
+                    row = self._conn.execute(
+                        "SELECT ids FROM daily_user_sets WHERE system = ? AND day = ?", (system, day_text)
+                    ).fetchone()
+                    ids = decode_ids(row[0]) if row else EMPTY_IDS
+                sketch = HyperLogLog.from_ids(ids, precision)
+                sketches[date.fromisoformat(day_text)] = sketch
+                new_rows.append((system, day_text, precision, sketch.to_bytes()))
+            if new_rows:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO daily_sketches (system, day, precision, registers) VALUES (?, ?, ?, ?)",
+                        new_rows
+                    )
+            fresh = self._fresh.get(system)
+        if fresh and start <= fresh[0] <= end and fresh[0] not in sketches:
+            sketches[fresh[0]] = HyperLogLog.from_ids(fresh[1], precision)
+        return sketches
+
+    def estimate_users(self, system: str, start: date, end: date, precision: int) -> int:
+        """Approximate distinct users in [start, end] from merged day sketches"""
+        return merged_estimate(self.day_sketches(system, start, end, precision).values(), precision)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def merged_estimate(sketches: Iterable[HyperLogLog], precision: int) -> int:
+    """Approximate distinct users of the union of some day sketches"""
+    merged = HyperLogLog(precision)
+    for sketch in sketches:
+        merged.merge(sketch)
+    return merged.estimate()
+
+
+def _count_users(store: RollupStore, system: str, start: date, end: date, precision: Optional[int]) -> int:
+    if precision:
+        return store.estimate_users(system, start, end, precision)
+    return store.distinct_users(system, start, end)
+
+
+def rollup_period_stats(store: RollupStore, system: str, params: Dict, fresh_ids: Optional[Iterable] = None,
+                        precision: int = None) -> Dict:
+    """
+    Today / week / month unique users from the store
+
+    ``params`` come from data_collector.period_params. ``fresh_ids`` are the
+    target day's user IDs read live from the source; when omitted the target
+    day itself must already be in the store. With a HyperLogLog ``precision``
+    the counts are estimates from merged day sketches instead of exact unions.
+    """
+    target_date = params["today"]
+    if fresh_ids is not None:
+        store.set_fresh(system, target_date, fresh_ids)
+    return {
+        "today": _count_users(store, system, target_date, target_date, precision),
+        "week": _count_users(store, system, params["week_start"], target_date, precision),
+        "month": _count_users(store, system, params["month_start"], target_date, precision)
+    }
+
+
+def rollup_window_stats(store: RollupStore, system: str, window: str, target_date: date,
+                        start: date = None, end: date = None, precision: int = None) -> Dict:
+    """
+    Distinct users of one window (see user_sets.window_bounds) from the
+    stored day sets, without touching the source database
+
+    ``complete`` is False when some days of the window are neither stored nor
+    the live day last passed to set_fresh. ``error_bound`` is None for exact
+    counts and the relative 95% bound for HyperLogLog estimates.
+    """
+    start, end = window_bounds(window, target_date, start, end)
+    if precision:
+        days = store.day_sketches(system, start, end, precision)
+        unique_users = merged_estimate(days.values(), precision)
+    else:
+        days = store.day_sets(system, start, end)
+        unique_users = len(union_ids(days.values()))
+    return {
+        "start": start,
+        "end": end,
+        "unique_users": unique_users,
+        "complete": len(days) == (end - start).days + 1,
+        "error_bound": error_bound(precision) if precision else None
+    }
+
+
+def rollup_trend_points(store: RollupStore, system: str, start: date, end: date,
+                        fresh_count: Optional[int] = None) -> List[Dict]:
+    """
+    Daily unique users in [start, end] from the store, in the same shape as the
+    live trend queries (days without activity are omitted). ``fresh_count`` is
+    the live count for ``end`` when that day is not stored yet.
+    """
+    counts = store.daily_counts(system, start, end)
+    if fresh_count is not None:
+        counts[end] = fresh_count
+    return [
+        {'date': day.strftime('%Y-%m-%d'), 'unique_users': count}
+        for day, count in sorted(counts.items())
+        if count > 0
+    ]
+
+
+def rollup_retention(store: RollupStore, system: str, target_date: date, weeks: int = 12,
+                     horizon: int = 8) -> Dict:
+    """
+    Weekly retention cohorts over the last ``weeks`` complete ISO weeks
+    before target_date's week, from the stored day sets
+
+    A cohort is the users first seen in its week, counting every stored day
+    before it as history (from user_first_seen, so the cost does not grow
+    with the stored history); ``retained`` lists how many of them are active in
+    each of the following ``horizon`` weeks (None past the last complete
+    week). ``complete`` is False when some days of the weeks are not stored.
+    """
+    end = target_date - timedelta(days=target_date.weekday() + 1)
+    start = end - timedelta(weeks=weeks) + timedelta(days=1)
+    week_starts = [start + timedelta(weeks=index) for index in range(weeks)]
+    sets = store.day_sets(system, start, end)
+    week_sets = [
+        union_ids(ids for day, ids in sets.items() if week_start <= day < week_start + timedelta(weeks=1))
+        for week_start in week_starts
+    ]
+    seen = store.seen_before(system, start)
+    sizes, retained = cohort_triangle(week_sets, horizon, seen)
+    return {
+        "cohorts": [
+            {
+                "cohort": bucket_label(week_start, "week"),
+                "start": week_start,
+                "users": int(size),
+                "retained": [int(count) if count >= 0 else None for count in row]
+            }
+            for week_start, size, row in zip(week_starts, sizes, retained)
+        ],
+        "horizon": horizon,
+        "complete": len(sets) == weeks * 7
+    }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_rollup_store() -> RollupStore:
+    """Process-wide rollup store, opened on first use"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = RollupStore()
+        return _store
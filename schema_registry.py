@@ -0,0 +1,106 @@
+"""
+Schema Registry - Cached per-source table/column capabilities
+"""
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from config import SCHEMA_CACHE_TTL
+from sources import SOURCES
+
+logger = logging.getLogger(__name__)
+
+# Table and columns each collector reads, from the source registry. "required"
+# columns must exist for the source to be queried at all; "optional" ones
+# switch the collector between a full and a fallback query path.
+SOURCE_SCHEMAS = {name: spec.schema for name, spec in SOURCES.items()}
+
+PROBE_QUERIES = {
+    "postgresql": """
+        SELECT column_name
+        FROM information_schema.columns
+        WHERE table_schema = ANY(current_schemas(false)) AND table_name = %(table)s
+    """,
+    "mysql": """
+        SELECT column_name
+        FROM information_schema.columns
+        WHERE table_schema = %(database)s AND table_name = %(table)s
+    """
+}
+
+
+class SchemaRegistry:
+    """
+    Remembers which tables and columns each source has, so collectors can pick
+    their query path from memory instead of asking information_schema on every
+    call. Entries expire after ``ttl`` seconds and are dropped on query errors,
+    so the next call re-probes.
+    """
+
+    def __init__(self, ttl: float = SCHEMA_CACHE_TTL, schemas: Dict = None):
+        self.ttl = ttl
+        self.schemas = schemas or SOURCE_SCHEMAS
+        self._lock = threading.Lock()
+        self._cache = {}
+        self.probes = 0
+
+    def probe_query(self, system: str):
+        """SQL and parameters that list the columns of a source's table"""
+        spec = self.schemas[system]
+        return PROBE_QUERIES[spec["db_type"]], {"database": spec.get("database"), "table": spec["table"]}
+
+    def cached(self, system: str) -> Optional[Dict]:
+        """Capabilities for a source if they were probed within the TTL"""
+        with self._lock:
+            entry = self._cache.get(system)
+            if entry and time.monotonic() - entry["probed_at"] < self.ttl:
+                return entry
+        return None
+
+    def store(self, system: str, rows) -> Dict:
+        """Record probe results (rows of column_name) and return the capabilities"""
+        spec = self.schemas[system]
+        columns = frozenset(str(row[0]).lower() for row in rows)
+        entry = {
+            "table": spec["table"],
+            "table_exists": bool(columns),
+            "columns": columns,
+            "missing": tuple(column for column in spec["required"] if column not in columns),
+            "optional": {column: column in columns for column in spec["optional"]},
+            "probed_at": time.monotonic()
+        }
+        with self._lock:
+            self._cache[system] = entry
+            self.probes += 1
+        if entry["missing"]:
+            logger.warning(f"{system}: {spec['table']} is missing columns {', '.join(entry['missing'])}")
+        return entry
+
+    def ensure(self, system: str, cur) -> Dict:
+        """Capabilities for a source, probing through ``cur`` only on a cache miss"""
+        entry = self.cached(system)
+        if entry is None:
+            cur.execute(*self.probe_query(system))
+            entry = self.store(system, cur.fetchall())
+        return entry
+
+    async def ensure_async(self, system: str, cur) -> Dict:
+        """``ensure`` for asyncio cursors"""
+        entry = self.cached(system)
+        if entry is None:
+            await cur.execute(*self.probe_query(system))
+            entry = self.store(system, await cur.fetchall())
+        return entry
+
+    def invalidate(self, system: str = None) -> None:
+        """Forget cached capabilities for one source (or all of them)"""
+        with self._lock:
+            if system is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(system, None)
+
+
+# Shared by every collector in the process
+schema_registry = SchemaRegistry()
@@ -0,0 +1,174 @@
+"""
+Sources - Declarative source registry and per-dialect query compiler
+"""
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Tuple
+
+from config import COLLECTION_CONFIG, SOURCE_DEFINITIONS
+
+
+@dataclass(frozen=True)
+class SourceSpec:
+    """
+    One monitored system: where its activity lives and how to count its users
+
+    Built from config.SOURCE_DEFINITIONS; ``db_config`` is left out of
+    equality and hashing so specs can key the compiled-query cache.
+    """
+    name: str
+    db_type: str
+    database: str
+    table: str
+    user_column: str
+    time_column: str
+    time_is_date: bool = False
+    filters: Tuple[str, ...] = ()
+    time_optional: bool = False
+    db_config: Dict = field(default=None, compare=False, repr=False)
+
+    @classmethod
+    def from_definition(cls, name: str, definition: Dict) -> "SourceSpec":
+        config = definition["db_config"]
+        return cls(
+            name=name,
+            db_type=config["db_type"],
+            database=config["database"],
+            table=definition["table"],
+            user_column=definition["user_column"],
+            time_column=definition["time_column"],
+            time_is_date=definition.get("time_is_date", False),
+            filters=tuple(definition.get("filters", ())),
+            time_optional=definition.get("time_optional", False),
+            db_config=config
+        )
+
+    @property
+    def qualified_table(self) -> str:
+        """
+        Table name as it appears in SQL. MySQL tables are qualified with their
+        database so one connection can serve every source on a server.
+        """
+        if self.db_type == "mysql":
+            return f"`{self.database}`.{self.table}"
+        return self.table
+
+    @property
+    def hourly(self) -> bool:
+        """Whether activity has a time of day (DATE columns only give the day)"""
+        return not self.time_is_date
+
+    @property
+    def server(self) -> Tuple:
+        """Host, port and account; sources with equal servers can share connections"""
+        config = self.db_config
+        return (self.db_type, config["host"], str(config["port"]), config["user"], config["password"])
+
+    @property
+    def schema(self) -> Dict:
+        """Table and columns for schema_registry"""
+        required = (self.user_column,) if self.time_optional else (self.user_column, self.time_column)
+        optional = (self.time_column,) if self.time_optional else ()
+        return {
+            "db_type": self.db_type, "database": self.database, "table": self.table,
+            "required": required, "optional": optional
+        }
+
+
+def _where(spec: SourceSpec, start: str, until: str) -> str:
+    """Half-open range on the bare time column (index-friendly) plus the spec's filters"""
+    predicates = [
+        f"{spec.time_column} >= %({start})s AND {spec.time_column} < %({until})s",
+        f"{spec.user_column} IS NOT NULL",
+        *spec.filters
+    ]
+    return "\n          AND ".join(predicates)
+
+
+def _count_since(spec: SourceSpec, param: str) -> str:
+    """COUNT(DISTINCT user) over the rows at or after a period start"""
+    if spec.db_type == "postgresql":
+        return f"COUNT(DISTINCT {spec.user_column}) FILTER (WHERE {spec.time_column} >= %({param})s)"
+    # MySQL has no FILTER; COUNT ignores the NULLs from unmatched CASEs
+    return f"COUNT(DISTINCT CASE WHEN {spec.time_column} >= %({param})s THEN {spec.user_column} END)"
+
+
+@lru_cache(maxsize=None)
+def compile_queries(spec: SourceSpec) -> Dict[str, str]:
+    """
+    SQL for every collection path of a source, generated once per spec
+
+    - period: today / week / month unique users in one scan (period_params)
+    - trend: unique users per day in [start, until) (trend_params)
+    - daily_users: distinct (day, user) pairs in [start, until)
+    - total: all-time unique users, for tables without the time column
+    - hourly_users: distinct (day, hour, user) triples in [start, until),
+      only for sources whose time column has a time of day
+    """
+    day = spec.time_column if spec.time_is_date else f"DATE({spec.time_column})"
+    counts = ",\n            ".join(_count_since(spec, param) for param in ("today", "week_start", "month_start"))
+    total_where = f"\n        WHERE {' AND '.join(spec.filters)}" if spec.filters else ""
+    queries = {
+        "period": f"""
+        SELECT
+            {counts}
+        FROM {spec.qualified_table}
+        WHERE {_where(spec, "scan_start", "until")}
+    """,
+        "trend": f"""
+        SELECT
+            {day} AS activity_date,
+            COUNT(DISTINCT {spec.user_column}) AS unique_users
+        FROM {spec.qualified_table}
+        WHERE {_where(spec, "start", "until")}
+        GROUP BY {day}
+        ORDER BY {day} ASC
+    """,
+        "daily_users": f"""
+        SELECT DISTINCT {day}, {spec.user_column}
+        FROM {spec.qualified_table}
+        WHERE {_where(spec, "start", "until")}
+    """,
+        "total": f"""
+        SELECT COUNT(DISTINCT {spec.user_column})
+        FROM {spec.qualified_table}{total_where}
+    """
+    }
+    if spec.hourly:
+        if spec.db_type == "postgresql":
+            hour = f"CAST({spec.time_column} AS DATE), CAST(EXTRACT(HOUR FROM {spec.time_column}) AS INTEGER)"
+        else:
+            hour = f"DATE({spec.time_column}), HOUR({spec.time_column})"
+        queries["hourly_users"] = f"""
+        SELECT DISTINCT {hour}, {spec.user_column}
+        FROM {spec.qualified_table}
+        WHERE {_where(spec, "start", "until")}
+    """
+    return queries
+
+
+def _pool_names(sources: Dict[str, SourceSpec]) -> Dict[str, str]:
+    """
+    Connection pool per source. MySQL sources on the same server and account
+    (e.g. tel_bot and invoice on localhost:3306) share one pool named after
+    all of them; PostgreSQL cannot query across databases, so its sources
+    always get their own.
+    """
+    groups: Dict[Tuple, list] = {}
+    for spec in sources.values():
+        if spec.db_type == "mysql" and COLLECTION_CONFIG["share_mysql_connections"]:
+            groups.setdefault(spec.server, []).append(spec.name)
+    names = {name: name for name in sources}
+    for members in groups.values():
+        for name in members:
+            names[name] = "+".join(members)
+    return names
+
+
+# Every monitored system, in report order
+SOURCES: Dict[str, SourceSpec] = {
+    name: SourceSpec.from_definition(name, definition)
+    for name, definition in SOURCE_DEFINITIONS.items()
+}
+
+POOL_NAMES: Dict[str, str] = _pool_names(SOURCES)
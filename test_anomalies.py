@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the rolling median / MAD anomaly scoring on synthetic daily series
+"""
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+
+# Add current directory to Python path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from anomalies import detect_anomalies, score_series, series_matrix
+
+THRESHOLDS = {"window": 14, "z_threshold": 3.5, "week_over_week_change": 0.5, "min_users": 5}
+
+
+def steady(days: int) -> np.ndarray:
+    """20 and 22 users on alternate days: median 21, MAD 1"""
+    return np.array([20.0 if day % 2 == 0 else 22.0 for day in range(days)])
+
+
+def flagged(scores, kind: str):
+    return np.nonzero(scores[kind][0])[0].tolist()
+
+
+def test_steady_series_is_never_flagged():
+    scores = score_series(steady(40)[None, :], **THRESHOLDS)
+    for kind in ("zero", "spike", "dip", "week_over_week"):
+        assert not scores[kind].any()
+    assert scores["baseline"][0, 20] == 21
+    # Days without a full window of history are not scored
+    assert np.isnan(scores["baseline"][0, :14]).all() and np.isnan(scores["z"][0, :14]).all()
+
+
+def test_spike_and_dip():
+    series = steady(40)
+    series[20], series[30] = 60, 2
+    scores = score_series(series[None, :], **THRESHOLDS)
+    assert flagged(scores, "spike") == [20]
+    assert flagged(scores, "dip") == [30]
+    # The spread is floored at the baseline's counting noise, not the tiny MAD
+    assert scores["z"][0, 20] == (60 - 21) / np.sqrt(21)
+
+
+def test_zero_is_not_also_a_dip():
+    series = steady(30)
+    series[25] = 0
+    scores = score_series(series[None, :], **THRESHOLDS)
+    assert flagged(scores, "zero") == [25]
+    assert flagged(scores, "dip") == []
+
+
+def test_small_baselines_are_not_judged():
+    series = np.array([2.0, 1.0] * 15)
+    series[20], series[25] = 30, 0
+    scores = score_series(series[None, :], **THRESHOLDS)
+    assert not (scores["zero"] | scores["spike"] | scores["dip"]).any()
+
+
+def test_week_over_week_break_is_flagged_once():
+    series = np.concatenate([np.full(21, 20.0), np.full(14, 40.0)])
+    scores = score_series(series[None, :], **THRESHOLDS)
+    # Four days at 40 lift the weekly total from 140 to 220, past +50%
+    assert flagged(scores, "week_over_week") == [24]
+    assert scores["change"][0, 24] == 220 / 140 - 1
+
+
+def test_rows_are_scored_independently():
+    quiet, noisy = steady(30), steady(30)
+    noisy[22] = 90
+    scores = score_series(np.vstack([quiet, noisy]), **THRESHOLDS)
+    assert not scores["spike"][0].any()
+    assert np.nonzero(scores["spike"][1])[0].tolist() == [22]
+
+
+def trend_points(start: date, values):
+    return [{"date": (start + timedelta(days=offset)).isoformat(), "unique_users": int(value)}
+            for offset, value in enumerate(values) if value]
+
+
+def test_series_matrix_fills_missing_days_and_skips_unavailable():
+    start = date(2026, 3, 1)
+    trends = {
+        "dockify": [{"date": "2026-03-01", "unique_users": 4}, {"date": "2026-03-03", "unique_users": 6}],
+        "invoice": [],
+        "unavailable": {"invoice": "timed out"}
+    }
+    systems, days, matrix = series_matrix(trends, start, start + timedelta(days=3))
+    assert systems == ["dockify"]
+    assert days[-1] == date(2026, 3, 4)
+    assert matrix.tolist() == [[4, 0, 6, 0]]
+
+
+def test_detect_anomalies_reports_flagged_days():
+    start = date(2026, 3, 1)
+    values = steady(30)
+    values[20], values[25] = 70, 0
+    trends = {"dockify": trend_points(start, values)}
+    anomalies = detect_anomalies(trends, start, start + timedelta(days=29), **THRESHOLDS)
+    assert [(anomaly["date"], anomaly["kind"]) for anomaly in anomalies] == [
+        (start + timedelta(days=20), "spike"),
+        (start + timedelta(days=25), "zero")
+    ]
+    assert anomalies[0]["system"] == "dockify"
+    assert anomalies[0]["unique_users"] == 70 and anomalies[0]["expected"] == 21
+    assert detect_anomalies({"dockify": []}, **THRESHOLDS) == []
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the per-source circuit breaker and the collectors' guarded loads
+"""
+import asyncio
+import sys
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+# Add current directory to Python path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+import circuit_breaker
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, SourceUnavailable
+from async_data_collector import AsyncDataCollector
+from data_collector import DataCollector
+from sources import POOL_NAMES
+
+
+class Clock:
+    """Stands in for time.monotonic in the breaker module"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", clock)
+    return clock
+
+
+def tripped(clock, half_open_max_calls: int = 1) -> CircuitBreaker:
+    breaker = CircuitBreaker("dockify", failure_threshold=3, reset_timeout=30,
+                             half_open_max_calls=half_open_max_calls)
+    for _ in range(3):
+        breaker.record_failure()
+    return breaker
+
+
+def test_opens_after_failure_threshold(clock):
+    breaker = CircuitBreaker("dockify", failure_threshold=3, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.is_open()
+    assert not breaker.allow()
+    assert breaker.stats() == {"state": OPEN, "consecutive_failures": 3, "trips": 1, "rejected": 1}
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker("dockify", failure_threshold=3, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_after_reset_timeout(clock):
+    breaker = tripped(clock)
+    clock.now += 29
+    assert breaker.state == OPEN and breaker.retry_in() == 1
+    clock.now += 1
+    assert breaker.state == HALF_OPEN and not breaker.is_open()
+    assert breaker.retry_in() == 0
+
+
+def test_half_open_trial_slots(clock):
+    breaker = tripped(clock, half_open_max_calls=2)
+    clock.now += 30
+    assert breaker.allow() and breaker.allow()
+    assert not breaker.allow()
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_success_from_half_open_closes(clock):
+    breaker = tripped(clock)
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.stats()["consecutive_failures"] == 0
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failure_from_half_open_reopens(clock):
+    breaker = tripped(clock)
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.stats()["trips"] == 2
+    # The reset timeout starts over from the failed trial
+    clock.now += 29
+    assert breaker.state == OPEN
+    clock.now += 1
+    assert breaker.state == HALF_OPEN
+
+
+class UntouchablePool:
+    """Fails the test if a refused call reaches the database"""
+
+    def connection(self, *args, **kwargs):
+        raise AssertionError("the pool was used while the circuit was open")
+
+
+def test_guarded_refuses_without_touching_the_pool(clock):
+    collector = DataCollector.__new__(DataCollector)
+    collector.breakers = {"dockify": tripped(clock)}
+    collector.pools = {"dockify": UntouchablePool()}
+    collector.source_deadline = 5
+
+    with pytest.raises(SourceUnavailable) as refused:
+        collector._guarded("dockify", lambda: collector._query_source_stats("dockify", date.today()))
+    assert refused.value.system == "dockify" and refused.value.retry_in == 30
+
+
+def test_async_guarded_refuses_without_touching_the_pool(clock):
+    collector = AsyncDataCollector.__new__(AsyncDataCollector)
+    collector.breakers = {"dockify": tripped(clock)}
+    collector.pools = {POOL_NAMES["dockify"]: UntouchablePool()}
+
+    async def load():
+        return await collector._query_source_stats("dockify", date.today())
+
+    with pytest.raises(SourceUnavailable):
+        asyncio.run(collector._guarded("dockify", load))
+
+
+def test_guarded_records_outcomes(clock):
+    collector = DataCollector.__new__(DataCollector)
+    breaker = CircuitBreaker("dockify", failure_threshold=1, reset_timeout=30)
+    collector.breakers = {"dockify": breaker}
+    collector.source_deadline = 5
+
+    assert collector._guarded("dockify", lambda: 42) == 42
+    with pytest.raises(ZeroDivisionError):
+        collector._guarded("dockify", lambda: 1 / 0)
+    assert breaker.state == OPEN
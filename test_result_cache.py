@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the result cache's TTL, stale-while-revalidate refreshes and immutable entries
+"""
+import asyncio
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# Add current directory to Python path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+import result_cache
+from result_cache import FRESH, MISS, STALE, ResultCache
+
+
+class Clock:
+    """Stands in for time.monotonic in the cache module"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(result_cache.time, "monotonic", clock)
+    return clock
+
+
+class Loader:
+    """Counts its calls and returns "v1", "v2", ... (or raises once told to)"""
+
+    def __init__(self):
+        self.calls = 0
+        self.error = None
+
+    def __call__(self) -> str:
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return f"v{self.calls}"
+
+
+def drain(cache: ResultCache) -> None:
+    """Wait for the background refreshes submitted so far"""
+    if cache._executor is not None:
+        cache._executor.shutdown(wait=True)
+        cache._executor = None
+
+
+def test_ttl_expiry(clock):
+    cache = ResultCache(ttl=60, max_stale=300)
+    cache.store("key", "value")
+    clock.now += 59
+    assert cache.lookup("key") == ("value", FRESH)
+    clock.now += 1
+    assert cache.lookup("key") == ("value", STALE)
+    clock.now += 300
+    assert cache.lookup("key") == (None, MISS)
+    # The expired entry is gone rather than kept around
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["hits"] == 1 and cache.stats()["stale_hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_miss_loads_once_then_hits(clock):
+    cache = ResultCache(ttl=60, max_stale=300)
+    loader = Loader()
+    assert cache.get_or_load("key", loader) == "v1"
+    assert cache.get_or_load("key", loader) == "v1"
+    assert loader.calls == 1
+
+
+def test_stale_value_is_served_while_refreshing(clock):
+    cache = ResultCache(ttl=60, max_stale=300)
+    loader = Loader()
+    cache.get_or_load("key", loader)
+    clock.now += 61
+
+    release = threading.Event()
+
+    def slow_loader():
+        release.wait(5)
+        return loader()
+
+    # Stale callers get the old value right away; only one refresh is started
+    assert cache.get_or_load("key", slow_loader) == "v1"
+    assert cache.get_or_load("key", slow_loader) == "v1"
+    assert cache.stats()["refreshing"] == 1
+    release.set()
+    drain(cache)
+
+    assert loader.calls == 2
+    assert cache.lookup("key") == ("v2", FRESH)
+    assert cache.stats()["refreshes"] == 1 and cache.stats()["refreshing"] == 0
+
+
+def test_failed_refresh_keeps_the_stale_value(clock):
+    cache = ResultCache(ttl=60, max_stale=300)
+    loader = Loader()
+    cache.get_or_load("key", loader)
+    clock.now += 61
+    loader.error = RuntimeError("source down")
+
+    assert cache.get_or_load("key", loader) == "v1"
+    drain(cache)
+    assert cache.lookup("key") == ("v1", STALE)
+    assert cache.stats()["refresh_errors"] == 1 and cache.stats()["refreshing"] == 0
+
+
+def test_async_stale_value_is_refreshed_in_the_background(clock):
+    cache = ResultCache(ttl=60, max_stale=300)
+    calls = []
+
+    async def load():
+        calls.append(None)
+        return f"v{len(calls)}"
+
+    async def scenario():
+        assert await cache.get_or_load_async("key", load) == "v1"
+        clock.now += 61
+        assert await cache.get_or_load_async("key", load) == "v1"
+        assert await cache.get_or_load_async("key", load) == "v1"
+        await asyncio.gather(*cache._tasks)
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+    assert cache.lookup("key") == ("v2", FRESH)
+
+
+def test_past_date_entries_never_expire(clock):
+    cache = ResultCache(ttl=60, max_stale=300)
+    loader = Loader()
+    assert cache.get_or_load(("daily", "dockify", "2026-01-01"), loader, immutable=True) == "v1"
+    clock.now += 10 * 365 * 86400
+    assert cache.lookup(("daily", "dockify", "2026-01-01")) == ("v1", FRESH)
+    assert cache.get_or_load(("daily", "dockify", "2026-01-01"), loader, immutable=True) == "v1"
+    drain(cache)
+    assert loader.calls == 1
+
+
+def test_least_recently_used_entries_are_evicted(clock):
+    cache = ResultCache(ttl=60, max_stale=300, max_entries=2)
+    cache.store("a", 1, immutable=True)
+    cache.store("b", 2)
+    cache.lookup("a")
+    cache.store("c", 3)
+    assert cache.lookup("b") == (None, MISS)
+    assert cache.lookup("a") == (1, FRESH) and cache.lookup("c") == (3, FRESH)
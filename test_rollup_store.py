@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the rollup store's daily and hourly coverage tracking and
+bucket counts, against a temporary SQLite file (no source databases needed)
+"""
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+# Add current directory to Python path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from config import ROLLUP_CONFIG
+import rollup_store
+from rollup_store import RollupStore, merge_coverage, rollup_retention, rollup_window_stats
+
+
+def day_rows(start: date, end: date, users_per_day: int = 3):
+    """(day, user) rows with users_per_day users a day, user IDs shifting by one each day"""
+    rows = []
+    day = start
+    while day <= end:
+        offset = (day - start).days
+        rows.extend((day, offset + user) for user in range(users_per_day))
+        day += timedelta(days=1)
+    return rows
+
+
+def make_store(tmp_path) -> RollupStore:
+    return RollupStore(str(tmp_path / "rollups.sqlite3"))
+
+
+def test_merge_coverage():
+    assert merge_coverage(None, 5, 8) == (5, 8)
+    assert merge_coverage((1, 5), 5, 8) == (1, 8)  # touching
+    assert merge_coverage((1, 5), 3, 4) == (1, 5)  # inside
+    assert merge_coverage((4, 6), 1, 4) == (1, 6)  # before, touching
+    assert merge_coverage((1, 5), 7, 9) == (1, 5)  # gap: unchanged
+
+
+def test_first_ingest_sets_coverage(tmp_path):
+    store = make_store(tmp_path)
+    start, end = date(2026, 1, 1), date(2026, 1, 10)
+    assert store.missing_ranges("dockify", start, end) == [(start, end)]
+    assert store.ingest("dockify", day_rows(start, end), start, end) == 10
+    assert store.coverage("dockify") == (start, end)
+    assert store.missing_ranges("dockify", start, end) == []
+
+
+def test_disjoint_ingest_never_covers_the_gap(tmp_path):
+    store = make_store(tmp_path)
+    store.ingest("dockify", day_rows(date(2026, 1, 1), date(2026, 1, 10)), date(2026, 1, 1), date(2026, 1, 10))
+
+    # A later range reaches back to the watermark instead of leaving a gap
+    assert store.missing_ranges("dockify", date(2026, 3, 1), date(2026, 3, 4)) == [
+        (date(2026, 1, 11), date(2026, 3, 4))
+    ]
+
+    # Ingesting only the later range keeps coverage where it was
+    store.ingest("dockify", day_rows(date(2026, 3, 1), date(2026, 3, 4)), date(2026, 3, 1), date(2026, 3, 4))
+    assert store.coverage("dockify") == (date(2026, 1, 1), date(2026, 1, 10))
+    assert store.missing_ranges("dockify", date(2026, 2, 1), date(2026, 2, 28)) == [
+        (date(2026, 1, 11), date(2026, 2, 28))
+    ]
+
+
+def test_missing_ranges_before_and_after_coverage(tmp_path):
+    store = make_store(tmp_path)
+    store.ingest("dockify", day_rows(date(2026, 2, 1), date(2026, 2, 10)), date(2026, 2, 1), date(2026, 2, 10))
+    assert store.missing_ranges("dockify", date(2026, 1, 1), date(2026, 1, 5)) == [
+        (date(2026, 1, 1), date(2026, 1, 31))
+    ]
+    assert store.missing_ranges("dockify", date(2026, 1, 20), date(2026, 2, 20)) == [
+        (date(2026, 1, 20), date(2026, 1, 31)),
+        (date(2026, 2, 11), date(2026, 2, 20))
+    ]
+    for start, end in store.missing_ranges("dockify", date(2026, 1, 20), date(2026, 2, 20)):
+        store.ingest("dockify", day_rows(start, end), start, end)
+    assert store.coverage("dockify") == (date(2026, 1, 20), date(2026, 2, 20))
+
+
+def test_empty_days_are_stored_as_zero(tmp_path):
+    store = make_store(tmp_path)
+    start, end = date(2026, 1, 1), date(2026, 1, 3)
+    store.ingest("dockify", [(date(2026, 1, 2), 7)], start, end)
+    assert store.daily_counts("dockify", start, end) == {date(2026, 1, 1): 0, date(2026, 1, 2): 1, date(2026, 1, 3): 0}
+
+
+def test_bucket_counts_match_day_set_unions(tmp_path):
+    store = make_store(tmp_path)
+    start, end = date(2026, 1, 5), date(2026, 2, 15)  # Monday 5 January to a Sunday
+    store.ingest("dockify", day_rows(start, end), start, end)
+
+    weeks = store.bucket_counts("dockify", start, end, "week")
+    assert [week["bucket"] for week in weeks[:2]] == ["2026-W02", "2026-W03"]
+    # Seven days of three users, shifting by one a day: nine distinct users a week
+    assert all(week["unique_users"] == 9 and week["complete"] for week in weeks)
+
+    days = store.bucket_counts("dockify", start, start + timedelta(days=2), "day")
+    assert [day["unique_users"] for day in days] == [3, 3, 3]
+
+    # A month cut by the range edges is a union of its stored days
+    months = store.bucket_counts("dockify", start, end, "month")
+    assert months[0]["start"] == start and months[0]["unique_users"] == store.distinct_users("dockify", start, date(2026, 1, 31))
+
+    # Days outside the coverage make a bucket incomplete
+    beyond = store.bucket_counts("dockify", end + timedelta(days=1), end + timedelta(days=7), "week")
+    assert not beyond[0]["complete"]
+
+
+def test_non_integer_ids_are_mapped(tmp_path):
+    store = make_store(tmp_path)
+    day = date(2026, 1, 1)
+    store.ingest("travel", [(day, "emp-1"), (day, "emp-2"), (day, "emp-1")], day, day)
+    assert store.distinct_users("travel", day, day) == 2
+
+
+def hour_rows(start: datetime, until: datetime):
+    """(day, hour, user) rows with one user per hour"""
+    rows = []
+    hour = start
+    while hour < until:
+        rows.append((hour.date(), hour.hour, hour.hour))
+        hour += timedelta(hours=1)
+    return rows
+
+
+def test_hourly_coverage_stays_contiguous(tmp_path):
+    store = make_store(tmp_path)
+    day = datetime.combine(date.today(), datetime.min.time())
+    store.ingest_hours("invoice", hour_rows(day, day + timedelta(hours=6)), day, day + timedelta(hours=6))
+    assert store.missing_hours("invoice", day, day + timedelta(hours=10)) == [
+        (day + timedelta(hours=6), day + timedelta(hours=10))
+    ]
+
+    # Hours after a gap are stored, but the gap is still reported missing
+    store.ingest_hours("invoice", hour_rows(day + timedelta(hours=8), day + timedelta(hours=10)),
+                       day + timedelta(hours=8), day + timedelta(hours=10))
+    assert store.missing_hours("invoice", day, day + timedelta(hours=10)) == [
+        (day + timedelta(hours=6), day + timedelta(hours=10))
+    ]
+    assert store.hourly_counts("invoice", day.date())[9] == 1
+
+
+def test_missing_hours_reach_back_overnight(tmp_path):
+    store = make_store(tmp_path)
+    today = datetime.combine(date.today(), datetime.min.time())
+    yesterday = today - timedelta(days=1)
+    store.ingest_hours("invoice", hour_rows(yesterday, yesterday + timedelta(hours=20)),
+                       yesterday, yesterday + timedelta(hours=20))
+    assert store.missing_hours("invoice", today, today + timedelta(hours=3)) == [
+        (yesterday + timedelta(hours=20), today + timedelta(hours=3))
+    ]
+
+
+def test_hourly_coverage_older_than_retention_is_ignored(tmp_path):
+    store = make_store(tmp_path)
+    today = datetime.combine(date.today(), datetime.min.time())
+    old = today - timedelta(days=ROLLUP_CONFIG["hourly_days"] + 5)
+    store.ingest_hours("invoice", [], old, old + timedelta(hours=4))
+    assert store.missing_hours("invoice", today, today + timedelta(hours=2)) == [
+        (today, today + timedelta(hours=2))
+    ]
+    store.ingest_hours("invoice", [], today, today + timedelta(hours=2))
+    assert store.missing_hours("invoice", today, today + timedelta(hours=2)) == []
+
+
+def test_sketches_are_built_at_ingest(tmp_path, monkeypatch):
+    store = RollupStore(str(tmp_path / "rollups.sqlite3"), sketch_precision=12)
+    start, end = date(2026, 1, 1), date(2026, 1, 10)
+    store.ingest("dockify", day_rows(start, end, users_per_day=50), start, end)
+
+    # Estimates come from the stored sketches alone, never from the ID arrays
+    monkeypatch.setattr("rollup_store.decode_ids", lambda blob: pytest.fail("decoded a day set"))
+    store._sets.clear()
+    sketches = store.day_sketches("dockify", start, end, 12)
+    assert sorted(sketches) == [start + timedelta(days=offset) for offset in range(10)]
+    assert abs(store.estimate_users("dockify", start, end, 12) - 59) <= 3
+
+    stats = rollup_window_stats(store, "dockify", "custom", end, start, end + timedelta(days=1), precision=12)
+    assert not stats["complete"] and stats["error_bound"]
+
+
+def test_days_without_a_sketch_are_sketched_once(tmp_path):
+    store = make_store(tmp_path)
+    start, end = date(2026, 1, 1), date(2026, 1, 3)
+    store.ingest("dockify", day_rows(start, end), start, end)
+    assert store.estimate_users("dockify", start, end, 10) == store.distinct_users("dockify", start, end)
+    (stored,) = store._conn.execute("SELECT COUNT(*) FROM daily_sketches WHERE precision = 10").fetchone()
+    assert stored == 3
+
+
+def test_seen_before_tracks_first_days(tmp_path):
+    store = make_store(tmp_path)
+    store.ingest("dockify", [(date(2026, 1, 10), 1), (date(2026, 1, 11), 2)], date(2026, 1, 10), date(2026, 1, 11))
+    assert store.seen_before("dockify", date(2026, 1, 11)).tolist() == [1]
+    # A backfill before the coverage moves first days earlier
+    store.ingest("dockify", [(date(2026, 1, 5), 2), (date(2026, 1, 5), 3)], date(2026, 1, 5), date(2026, 1, 9))
+    assert store.seen_before("dockify", date(2026, 1, 6)).tolist() == [2, 3]
+    assert store.seen_before("dockify", date(2026, 1, 12)).tolist() == [1, 2, 3]
+
+    # Stores from before user_first_seen rebuild it from their day sets once
+    store._conn.execute("DELETE FROM user_first_seen")
+    store._conn.commit()
+    reopened = RollupStore(store.path)
+    assert reopened.seen_before("dockify", date(2026, 1, 11)).tolist() == [1, 2, 3]
+    assert reopened.seen_before("dockify", date(2026, 1, 5)).tolist() == []
+
+
+def test_retention_reads_history_from_first_seen(tmp_path, monkeypatch):
+    store = make_store(tmp_path)
+    start, end = date(2025, 10, 6), date(2026, 1, 4)  # Monday to Sunday
+    store.ingest("dockify", day_rows(start, end), start, end)
+    store._sets.clear()
+
+    decoded = []
+    real_decode = rollup_store.decode_ids
+    monkeypatch.setattr(rollup_store, "decode_ids", lambda blob: decoded.append(blob) or real_decode(blob))
+    retention = rollup_retention(store, "dockify", date(2026, 1, 5), weeks=4, horizon=2)
+    # Only the four cohort weeks are decoded, not the history before them
+    assert len(decoded) == 28
+    # Three users a day shifting by one: each week brings seven new users
+    assert [cohort["users"] for cohort in retention["cohorts"]] == [7, 7, 7, 7]
+    assert retention["complete"]
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Unit tests for week/month bucketing and LTTB downsampling of synthetic trend series
+"""
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+
+# Add current directory to Python path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from config import TREND_CONFIG
+from trend_series import bucket_means, chart_points, lttb, trend_grain
+
+
+def points(start: date, values):
+    return [{"date": (start + timedelta(days=offset)).isoformat(), "unique_users": value}
+            for offset, value in enumerate(values)]
+
+
+def test_trend_grain():
+    assert trend_grain(30) == "day"
+    assert trend_grain(TREND_CONFIG["week_after_days"]) == "day"
+    assert trend_grain(TREND_CONFIG["week_after_days"] + 1) == "week"
+    assert trend_grain(TREND_CONFIG["month_after_days"] + 1) == "month"
+
+
+def test_bucket_means_by_week():
+    # Wednesday 7 January to Tuesday 13 January 2026, with Friday missing
+    days = np.array(["2026-01-07", "2026-01-08", "2026-01-10", "2026-01-11", "2026-01-12", "2026-01-13"],
+                    dtype="datetime64[D]")
+    values = np.array([10.0, 20.0, 30.0, 40.0, 6.0, 8.0])
+    starts, means = bucket_means(days, values, "week")
+    assert starts.astype(date).tolist() == [date(2026, 1, 5), date(2026, 1, 12)]
+    # The cut first week averages its five days in range, the missing Friday as zero
+    assert means.tolist() == [20.0, 7.0]
+
+
+def test_bucket_means_by_month():
+    days = np.array(["2026-01-30", "2026-01-31", "2026-02-01"], dtype="datetime64[D]")
+    starts, means = bucket_means(days, np.array([4.0, 6.0, 9.0]), "month")
+    assert starts.astype(date).tolist() == [date(2026, 1, 1), date(2026, 2, 1)]
+    assert means.tolist() == [5.0, 9.0]
+
+
+def test_lttb_keeps_ends_and_peaks():
+    y = np.sin(np.linspace(0, 6, 500))
+    y[137], y[402] = 5.0, -5.0
+    kept = lttb(np.arange(500, dtype=float), y, 40)
+    assert len(kept) == 40
+    assert kept[0] == 0 and kept[-1] == 499
+    assert np.all(np.diff(kept) > 0)
+    assert 137 in kept and 402 in kept
+
+
+def test_lttb_leaves_short_series_alone():
+    y = np.arange(10, dtype=float)
+    assert lttb(y, y, 10).tolist() == list(range(10))
+    assert lttb(y, y, 2).tolist() == list(range(10))
+
+
+def test_chart_points_sorts_and_keeps_daily_series():
+    series = points(date(2026, 1, 1), [5, 7, 6])
+    days, values = chart_points(list(reversed(series)), max_points=10)
+    assert days == [date(2026, 1, 1), date(2026, 1, 2), date(2026, 1, 3)]
+    assert values == [5.0, 7.0, 6.0]
+    assert chart_points([]) == ([], [])
+
+
+def test_chart_points_caps_long_series():
+    values = [20 + day % 7 for day in range(365)]
+    values[200] = 400
+    series = points(date(2025, 1, 1), values)
+
+    days, plotted = chart_points(series, "day", max_points=60)
+    assert len(days) == 60 and days[0] == date(2025, 1, 1) and days[-1] == date(2025, 12, 31)
+    assert 400 in plotted
+
+    weeks, means = chart_points(series, "week", max_points=60)
+    assert len(weeks) == 53 and all(week.weekday() == 0 for week in weeks)
+    assert max(means) > 60
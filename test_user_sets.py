@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the retention triangle over synthetic per-week user sets
+"""
+import random
+import sys
+from pathlib import Path
+
+# Add current directory to Python path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from user_sets import cohort_triangle, to_id_array
+
+
+def test_cohort_triangle():
+    weeks = [to_id_array(ids) for ids in ([1, 2, 3], [2, 3, 4], [3, 4, 5], [1, 5])]
+    sizes, retained = cohort_triangle(weeks, horizon=2)
+    # Cohorts: {1, 2, 3}, {4}, {5} and nobody new in the last week
+    assert sizes.tolist() == [3, 1, 1, 0]
+    assert retained.tolist() == [
+        [2, 1],
+        [1, 0],
+        [1, -1],
+        [-1, -1]
+    ]
+
+
+def test_seen_users_belong_to_no_cohort():
+    weeks = [to_id_array(ids) for ids in ([1, 2, 3], [1, 2], [1])]
+    sizes, retained = cohort_triangle(weeks, horizon=2, seen=to_id_array([1]))
+    assert sizes.tolist() == [2, 0, 0]
+    assert retained[0].tolist() == [1, 0]
+
+
+def test_empty_periods():
+    sizes, retained = cohort_triangle([to_id_array([]), to_id_array([])], horizon=3)
+    assert sizes.tolist() == [0, 0]
+    assert retained.tolist() == [[0, -1, -1], [-1, -1, -1]]
+
+
+def test_matches_set_intersections():
+    rng = random.Random(3)
+    weeks = [to_id_array(rng.sample(range(200), rng.randint(0, 80))) for _ in range(10)]
+    horizon = 4
+    sizes, retained = cohort_triangle(weeks, horizon)
+
+    seen = set()
+    for week, ids in enumerate(weeks):
+        cohort = set(ids.tolist()) - seen
+        seen |= cohort
+        assert sizes[week] == len(cohort)
+        for offset in range(1, horizon + 1):
+            expected = len(cohort & set(weeks[week + offset].tolist())) if week + offset < len(weeks) else -1
+            assert retained[week, offset - 1] == expected
@@ -0,0 +1,96 @@
+"""
+Trend Series - Week/month bucketing and LTTB downsampling of daily series for charts
+"""
+from datetime import date
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from config import TREND_CONFIG
+
+
+def trend_grain(days: int) -> str:
+    """Chart grain for a window of ``days``: daily, then weekly, then monthly averages"""
+    if days > TREND_CONFIG["month_after_days"]:
+        return "month"
+    if days > TREND_CONFIG["week_after_days"]:
+        return "week"
+    return "day"
+
+
+def bucket_means(days: np.ndarray, values: np.ndarray, grain: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Average daily value per ISO week or calendar month
+
+    ``days`` are datetime64[D] with the days between them counting as zero
+    (the trend queries return no row for days without activity); buckets at
+    the edges of the range average only the days inside it.
+
+    Returns:
+        (first day of each bucket as datetime64[D], mean per bucket)
+    """
+    first = days.min()
+    span = np.arange(first, days.max() + 1)
+    daily = np.zeros(len(span))
+    daily[(days - first).astype(np.int64)] = values
+    if grain == "week":
+        # 1970-01-01 was a Thursday: shift so Monday is weekday 0
+        keys = span - (span.astype(np.int64) + 3) % 7
+    else:
+        keys = span.astype("datetime64[M]").astype("datetime64[D]")
+    starts, bucket = np.unique(keys, return_inverse=True)
+    return starts, np.bincount(bucket, weights=daily) / np.bincount(bucket)
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of ``threshold`` points that keep
+    the visual shape of the series (peaks and dips survive, unlike plain
+    averaging or every-nth sampling)
+
+    The first and last points are always kept; every bucket in between
+    contributes the point forming the largest triangle with the previously
+    kept point and the average of the next bucket.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(np.int64) + 1
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for index in range(threshold - 2):
+        start, end = edges[index], edges[index + 1]
+        next_end = edges[index + 2] if index + 2 < len(edges) else n
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+        area = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        kept[index + 1] = previous
+    return kept
+
+
+def chart_points(points: List[Dict], grain: str = "day", max_points: int = None) -> Tuple[List[date], List[float]]:
+    """
+    Points of a get_daily_trends series to plot, at most ``max_points``
+
+    Daily series keep their points; weekly and monthly ones are averaged per
+    bucket (see bucket_means). Whatever is still over ``max_points`` is
+    thinned with lttb, so a chart costs the same to draw and store whatever
+    the length of the window.
+
+    Returns:
+        (day or bucket start, value) lists in date order
+    """
+    max_points = max_points or TREND_CONFIG["max_points"]
+    if not points:
+        return [], []
+    days = np.array([point['date'] for point in points], dtype="datetime64[D]")
+    values = np.array([point['unique_users'] for point in points], dtype=float)
+    order = np.argsort(days, kind="stable")
+    days, values = days[order], values[order]
+    if grain != "day":
+        days, values = bucket_means(days, values, grain)
+    kept = lttb(days.astype(np.int64).astype(float), values, max_points)
+    return days[kept].astype(date).tolist(), values[kept].tolist()
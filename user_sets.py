@@ -0,0 +1,162 @@
+"""
+User Sets - Compact per-day user-ID arrays and reporting windows
+"""
+import zlib
+from datetime import date, timedelta
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+# User IDs are stored as sorted int64 arrays. Non-integer IDs (e.g. emp_uid
+# strings) are mapped to sequential integers from this base upwards, well above
+# any real Telegram or database ID, so the two kinds can never collide.
+MAPPED_ID_BASE = 1 << 62
+
+EMPTY_IDS = np.empty(0, dtype=np.int64)
+
+WINDOWS = ("today", "week", "month", "rolling_7", "rolling_28", "rolling_90", "custom")
+
+GRAINS = ("day", "week", "month", "quarter")
+
+
+def encode_ids(ids: np.ndarray) -> bytes:
+    """Delta-encode and compress a sorted, unique int64 array"""
+    if len(ids) == 0:
+        return b""
+    deltas = np.diff(ids, prepend=np.int64(0)).astype("<i8")
+    return zlib.compress(deltas.tobytes(), 6)
+
+
+def decode_ids(blob: bytes) -> np.ndarray:
+    """Inverse of encode_ids"""
+    if not blob:
+        return EMPTY_IDS
+    return np.cumsum(np.frombuffer(zlib.decompress(blob), dtype="<i8"), dtype=np.int64)
+
+
+def to_id_array(values: Iterable[int]) -> np.ndarray:
+    """Sorted, unique int64 array from integer user IDs"""
+    return np.unique(np.fromiter(values, dtype=np.int64))
+
+
+def union_ids(arrays: Iterable[np.ndarray]) -> np.ndarray:
+    """Exact union of several ID arrays"""
+    arrays = [array for array in arrays if len(array)]
+    if not arrays:
+        return EMPTY_IDS
+    if len(arrays) == 1:
+        return arrays[0]
+    return np.unique(np.concatenate(arrays))
+
+
+def window_bounds(window: str, target_date: date, start: date = None, end: date = None) -> Tuple[date, date]:
+    """
+    Inclusive [start, end] days of a reporting window ending on target_date
+
+    "week" is the ISO week (Monday onwards), "month" the calendar month and
+    "rolling_N" the last N days including target_date. "custom" takes the
+    explicit start and end.
+    """
+    if window == "today":
+        return target_date, target_date
+    if window == "week":
+        return target_date - timedelta(days=target_date.weekday()), target_date
+    if window == "month":
+        return target_date.replace(day=1), target_date
+    if window.startswith("rolling_") and window in WINDOWS:
+        days = int(window.split("_")[1])
+        return target_date - timedelta(days=days - 1), target_date
+    if window == "custom":
+        if start is None or end is None or start > end:
+            raise ValueError("custom window needs start <= end")
+        return start, end
+    raise ValueError(f"Unknown window '{window}', expected one of {', '.join(WINDOWS)}")
+
+
+def bucket_bounds(day: date, grain: str) -> Tuple[date, date]:
+    """Inclusive [start, end] of the day / ISO week / month / quarter containing day"""
+    if grain == "day":
+        return day, day
+    if grain == "week":
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    if grain == "month":
+        start = day.replace(day=1)
+    elif grain == "quarter":
+        start = day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+    else:
+        raise ValueError(f"Unknown grain '{grain}', expected one of {', '.join(GRAINS)}")
+    months = 1 if grain == "month" else 3
+    month = start.month - 1 + months
+    following = date(start.year + month // 12, month % 12 + 1, 1)
+    return start, following - timedelta(days=1)
+
+
+def grain_buckets(start: date, end: date, grain: str) -> List[Tuple[date, date]]:
+    """Whole buckets of a grain covering [start, end]; the first and last may overhang it"""
+    if start > end:
+        raise ValueError("range needs start <= end")
+    buckets = []
+    day = start
+    while day <= end:
+        bucket = bucket_bounds(day, grain)
+        buckets.append(bucket)
+        day = bucket[1] + timedelta(days=1)
+    return buckets
+
+
+def bucket_label(start: date, grain: str) -> str:
+    """Short label of the bucket starting on start, e.g. 2026-W02, 2026-01 or 2026-Q1"""
+    if grain == "week":
+        year, week, _ = start.isocalendar()
+        return f"{year}-W{week:02d}"
+    if grain == "month":
+        return start.strftime("%Y-%m")
+    if grain == "quarter":
+        return f"{start.year}-Q{(start.month - 1) // 3 + 1}"
+    return start.isoformat()
+
+
+def cohort_triangle(period_sets: List[np.ndarray], horizon: int,
+                    seen: np.ndarray = EMPTY_IDS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Retention triangle over consecutive periods (e.g. ISO weeks)
+
+    Every user belongs to the cohort of the first period they are active in;
+    users in ``seen`` (active before the first period) belong to none.
+    Returns (sizes, retained): sizes[i] users in cohort i and retained[i, k - 1]
+    of them active again in period i + k for k = 1..horizon, or -1 where that
+    period is past the last one.
+
+    Cohort membership is looked up for every (user, period) activity pair at
+    once with searchsorted, so the whole triangle costs a few array passes
+    rather than one intersection per cell.
+    """
+    periods = len(period_sets)
+    cohorts = []
+    for ids in period_sets:
+        new = np.setdiff1d(ids, seen, assume_unique=True)
+        cohorts.append(new)
+        seen = union_ids((seen, new))
+    sizes = np.array([len(cohort) for cohort in cohorts], dtype=np.int64)
+
+    counts = np.zeros((periods, horizon + 1), dtype=np.int64)
+    if sizes.sum():
+        users = np.concatenate(cohorts)
+        first = np.repeat(np.arange(periods), sizes)
+        order = np.argsort(users, kind="stable")
+        users, first = users[order], first[order]
+
+        active = np.concatenate(period_sets)
+        period = np.repeat(np.arange(periods), [len(ids) for ids in period_sets])
+        position = np.minimum(np.searchsorted(users, active), len(users) - 1)
+        member = users[position] == active
+        cohort = first[position[member]]
+        offset = period[member] - cohort
+        kept = (offset >= 1) & (offset <= horizon)
+        np.add.at(counts, (cohort[kept], offset[kept]), 1)
+
+    retained = counts[:, 1:]
+    future = np.arange(periods)[:, None] + np.arange(1, horizon + 1)[None, :] >= periods
+    retained[future] = -1
+    return sizes, retained
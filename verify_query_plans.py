@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Verify that every collector query can use an index on its date column
+
+Runs EXPLAIN for each period and trend query in data_collector.py against
+the configured databases and fails (exit code 1) when a query has to read
+its table with a full scan:
+
+- PostgreSQL: the plan is built with enable_seqscan off, so a remaining
+  Seq Scan on the source table means no index path exists at all.
+- MySQL: an access type of ALL with no possible_keys fails. An ALL scan
+  where the optimizer had an index available (small tables, ranges that
+  cover most rows) is reported as a warning.
+
+Usage: python verify_query_plans.py [--date YYYY-MM-DD] [--days N]
+"""
+import argparse
+import json
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+# Add current directory to Python path
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from data_collector import (
+    DataCollector, PERIOD_QUERIES, TREND_QUERIES, period_params, trend_params
+)
+from schema_registry import schema_registry
+
+
+def _postgres_seq_scans(plan: dict, table: str) -> list:
+    """Seq Scan nodes on the given table anywhere in a JSON plan"""
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") == table:
+        found.append(plan)
+    for child in plan.get("Plans", []):
+        found.extend(_postgres_seq_scans(child, table))
+    return found
+
+
+def check_postgres(cur, sql: str, params: dict, table: str):
+    cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+    plan = cur.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    if _postgres_seq_scans(plan[0]["Plan"], table):
+        return "FAIL", f"Seq Scan on {table} even with enable_seqscan off"
+    return "PASS", "index path available"
+
+
+def check_mysql(cur, sql: str, params: dict, table: str):
+    cur.execute("EXPLAIN " + sql, params)
+    columns = [column[0] for column in cur.description]
+    for row in cur.fetchall():
+        entry = dict(zip(columns, row))
+        if entry.get("table") != table:
+            continue
+        if entry.get("type") == "ALL":
+            if not entry.get("possible_keys"):
+                return "FAIL", f"full table scan of {table}, no usable index"
+            return "WARN", f"optimizer chose a full scan of {table} (possible keys: {entry['possible_keys']})"
+        return "PASS", f"type={entry.get('type')} key={entry.get('key')}"
+    return "PASS", f"{table} not read"
+
+
+def verify(target_date: date, days: int) -> bool:
+    collector = DataCollector()
+    queries = []
+    for system, sql in PERIOD_QUERIES.items():
+        queries.append((system, "period", sql, period_params(target_date)))
+    for system, sql in TREND_QUERIES.items():
+        queries.append((system, "trend", sql, trend_params(target_date - timedelta(days=days), target_date)))
+
+    print(f"Query plan verification for {target_date}")
+    print("=" * 70)
+
+    failed = False
+    for system, kind, sql, params in queries:
+        config = collector.configs[system]
+        table = schema_registry.schemas[system]["table"]
+        # Dedicated connection so the session settings below never reach the pool
+        conn = collector.get_connection(system)
+        if not conn:
+            print(f"SKIP  {system:<9} {kind:<7} could not connect")
+            continue
+
+        try:
+            with conn.cursor() as cur:
+                schema = schema_registry.ensure(system, cur)
+                if schema["missing"] or not all(schema["optional"].values()):
+                    print(f"SKIP  {system:<9} {kind:<7} {table} lacks the columns this query needs")
+                    continue
+                if config["db_type"] == "postgresql":
+                    cur.execute("SET enable_seqscan = off")
+                    status, detail = check_postgres(cur, sql, params, table)
+                else:
+                    status, detail = check_mysql(cur, sql, params, table)
+        except Exception as e:
+            status, detail = "FAIL", f"EXPLAIN failed: {e}"
+        finally:
+            conn.close()
+
+        failed = failed or status == "FAIL"
+        print(f"{status:<5} {system:<9} {kind:<7} {detail}")
+
+    print("-" * 70)
+    print("❌ Full table scans found" if failed else "✅ All queries can use an index")
+    return not failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--date", type=date.fromisoformat, default=date.today())
+    parser.add_argument("--days", type=int, default=30, help="trend window to explain")
+    args = parser.parse_args()
+    sys.exit(0 if verify(args.date, args.days) else 1)
+
+
+if __name__ == "__main__":
+    main()